@@ -0,0 +1,169 @@
+import argparse, multiprocessing as mp, os, queue, shutil, sys, time, zlib
+from pathlib import Path
+
+import etag_cache
+import telemetry
+from state_store import STATE_DIR
+
+# ==========================================
+# 🚛 全量补录（backfill）：整库文件按 源 + 路径哈希 切成 N 片，N 个进程并行搬运，可断点续跑
+# ==========================================
+# python backfill.py --workers 8                 # 默认全部源
+# python backfill.py --sources twitter --reset   # 清掉进度日志从头来（哨兵照样挡住已入库的文件）
+# 协调进程：一次 git tree 请求列出整库 .json（不再逐目录 get_contents），减去进度日志里已完成的 sha，
+#          再按 processed_files 分批 in_ 查掉已登记的（每 100 个文件一次查询，而不是每个文件一次），剩下的按 crc32(path) % N 分片。
+# worker：spawn 出来的独立进程，自己建 GitHub / Supabase 客户端；每完成一个文件往自己的进度日志追加一行并 flush，
+#         被杀掉（Actions 超时）后重跑直接跳过日志里的文件。
+# worker 不落盘 processor 增量状态（24h 榜单 / 时序只该由增量 sync 维护，多进程各写一份也会互相覆盖）。
+# 协调进程每 BACKFILL_REPORT_SECONDS 汇总一次：文件进度、rows/s、ETA。
+
+WORKERS = int(os.environ.get("BACKFILL_WORKERS", 4))
+JOURNAL_DIR = Path(os.environ.get("BACKFILL_DIR") or STATE_DIR / "backfill")
+REF = os.environ.get("BACKFILL_REF", "main")
+REPORT_SECONDS = float(os.environ.get("BACKFILL_REPORT_SECONDS", 10))
+START_METHOD = os.environ.get("BACKFILL_START_METHOD", "spawn")  # fork 会把父进程的连接池带进子进程
+SEED_BATCH = 100
+
+# === 📋 1. 文件清单 ===
+def list_bank_files(sources):
+    """[(path, sha)]：优先一次递归 git tree；树太大被截断时退回逐目录遍历"""
+    import refinery
+    repo = refinery.repo()
+    tree = repo.get_git_tree(REF, recursive=True)
+    if not tree.raw_data.get("truncated"):
+        return sorted((e.path, e.sha) for e in tree.tree
+                      if e.type == "blob" and e.path.endswith(".json") and e.path.split('/')[0] in sources)
+    print("⚠️ git tree 被截断，退回逐目录遍历")
+    files, contents = [], [c for s in sources for c in repo.get_contents(s)]
+    while contents:
+        c = contents.pop(0)
+        if c.type == "dir": contents.extend(repo.get_contents(c.path))
+        elif c.name.endswith(".json"): files.append((c.path, c.sha))
+    return sorted(files)
+
+def read_journals():
+    """所有进度日志里已完成的 sha（不管上次是几个 worker 写的）"""
+    done = set()
+    for f in JOURNAL_DIR.glob("worker_*.tsv"):
+        with open(f, encoding='utf-8') as fh:
+            for line in fh:
+                parts = line.rstrip("\n").split("\t")
+                if len(parts) == 3: done.add(parts[0])  # 被杀时写了一半的行不算
+    return done
+
+def registered(shas):
+    """processed_files 里已登记的 sha，分批 in_ 查询"""
+    import refinery
+    found, shas = set(), list(shas)
+    for i in range(0, len(shas), SEED_BATCH):
+        res = refinery.db().table("processed_files").select("file_sha").in_("file_sha", shas[i:i + SEED_BATCH]).execute()
+        found.update(r["file_sha"] for r in res.data)
+    return found
+
+def shard(files, n):
+    """按 crc32(path) % n 分片，片内按 源 / 路径 排序（同源文件连续处理，processor 缓存更热）"""
+    shards = [[] for _ in range(n)]
+    for path, sha in files: shards[zlib.crc32(path.encode('utf-8')) % n].append((path, sha))
+    return [sorted(s) for s in shards]
+
+# === 🛠️ 2. worker ===
+def _worker(k, files, sources, q):
+    import refinery  # spawn 出来的进程：客户端都是自己的
+    telemetry.start(f"backfill_{k}")
+    procs = refinery.get_all_processors(sources)
+    JOURNAL_DIR.mkdir(parents=True, exist_ok=True)
+    try:
+        with open(JOURNAL_DIR / f"worker_{k}.tsv", 'a', encoding='utf-8') as journal:
+            for path, sha in files:
+                count = refinery.process_and_upload(path, sha, procs[path.split('/')[0]])
+                if count is None:
+                    q.put((k, 0, 0, 1))
+                    continue
+                journal.write(f"{sha}\t{count}\t{path}\n")
+                journal.flush()
+                q.put((k, count, 1, 0))
+    finally:
+        etag_cache.report(quiet=True)  # 各 worker 把自己碰过的条目合并落盘
+        telemetry.emit()
+        q.put((k, None, 0, 0))
+
+# === 🚦 3. 协调 ===
+def _fmt_eta(seconds):
+    if seconds is None: return "-"
+    m, s = divmod(int(seconds), 60)
+    h, m = divmod(m, 60)
+    return f"{h}h{m:02d}m" if h else f"{m}m{s:02d}s"
+
+def run(workers=WORKERS, sources=None, reset=False):
+    sources = sorted(sources or (f[:-3] for f in os.listdir("./processors") if f.endswith(".py") and not f.startswith("__")))
+    if reset: shutil.rmtree(JOURNAL_DIR, ignore_errors=True)
+    with telemetry.span("list") as sp:
+        files = list_bank_files(sources)
+        sp.add("files", len(files))
+    done = read_journals()
+    todo = [(p, s) for p, s in files if s not in done]
+    with telemetry.span("seed") as sp:
+        seen = registered({s for _, s in todo})
+        sp.add("skipped", len(seen))
+    todo = [(p, s) for p, s in todo if s not in seen]
+    print(f"🚛 银行 {len(files)} 个文件：进度日志已完成 {len(files) - len(todo) - len(seen)}，"
+          f"哨兵已登记 {len(seen)}，待补录 {len(todo)}（{workers} 个 worker）")
+    if not todo: return {"files": 0, "rows": 0, "errors": 0}
+
+    ctx = mp.get_context(START_METHOD)
+    q = ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(k, part, sources, q), name=f"backfill-{k}")
+             for k, part in enumerate(shard(todo, workers)) if part]
+    for p in procs: p.start()
+    t0 = last_report = time.time()
+    totals = {"files": 0, "rows": 0, "errors": 0}
+    running, idle = len(procs), 0
+
+    def report():
+        elapsed = time.time() - t0
+        finished = totals["files"] + totals["errors"]
+        rate = finished / elapsed if elapsed else 0
+        eta = (len(todo) - finished) / rate if rate else None
+        print(f"🚛 {finished}/{len(todo)} 文件 | {totals['rows']} 行 | "
+              f"{totals['rows'] / elapsed if elapsed else 0:.0f} rows/s | 失败 {totals['errors']} | ETA {_fmt_eta(eta)}")
+
+    while running:
+        try:
+            k, rows, ok, err = q.get(timeout=1)
+            idle = 0
+            if rows is None: running -= 1
+            else:
+                totals["files"] += ok
+                totals["rows"] += rows
+                totals["errors"] += err
+        except queue.Empty:
+            # worker 崩溃（没来得及发结束标记）：全部退出后再空等两轮就收工
+            idle = idle + 1 if not any(p.is_alive() for p in procs) else 0
+            if idle > 2: break
+        if time.time() - last_report >= REPORT_SECONDS:
+            last_report = time.time()
+            report()
+    report()
+    for p in procs: p.join()
+    crashed = [p.name for p in procs if p.exitcode]
+    if crashed: print(f"❌ worker 异常退出: {', '.join(crashed)}（重跑会从进度日志续上）")
+    telemetry.count("rows", totals["rows"])
+    return dict(totals, crashed=len(crashed))
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="全量补录：多进程分片搬运银行全部历史，可断点续跑")
+    ap.add_argument("--workers", type=int, default=WORKERS, help=f"worker 进程数（默认 {WORKERS}）")
+    ap.add_argument("--sources", help="逗号分隔，只补这些源，默认全部")
+    ap.add_argument("--reset", action="store_true", help="清空进度日志")
+    args = ap.parse_args(argv)
+    sources = {s.strip() for s in args.sources.split(",") if s.strip()} if args.sources else None
+    telemetry.start("backfill")
+    try:
+        with telemetry.span("backfill"):
+            stats = run(max(1, args.workers), sources, args.reset)
+    finally:
+        telemetry.emit()
+    return 1 if stats.get("errors") or stats.get("crashed") else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,142 @@
+import argparse, json, os, subprocess, sys, tempfile, time
+from datetime import datetime
+from pathlib import Path
+
+# ==========================================
+# 🏭 工厂吞吐基准：本地 LLM 桩 + 内存 raw_signals + 临时 git vault
+# ==========================================
+# python bench/bench_factory.py --latency-ms 400 --rate-429 0.02 --masters 3
+# 不花 SiliconFlow 余额、不连 Supabase；结果写成 JSON，方便跨 commit 对比。
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(ROOT))
+
+from synth import SOURCES, db_rows, load_processors
+from fake_supabase import FakeSupabase
+from llm_stub import LLMStub, StubConfig
+
+# 与 fetch_elite_signals 的各源 limit 对齐
+DEFAULT_ROWS = {"github": 100, "papers": 100, "twitter": 500, "reddit": 500, "polymarket": 800}
+
+MASTER_TEMPLATE = '''
+def audit(row, ask):
+    return ask("你是第 {i} 号基准大师。", row.get("full_text_formatted", "") + row.get("_drift_context", ""))
+'''
+
+def git(cwd, *args):
+    return subprocess.run(["git", *args], cwd=cwd, capture_output=True, text=True, check=True)
+
+def make_vault(tmp):
+    remote, vault = tmp / "remote.git", tmp / "vault"
+    git(tmp, "init", "-q", "--bare", "-b", "main", str(remote))
+    git(tmp, "clone", "-q", str(remote), str(vault))
+    git(vault, "-c", "user.name=bench", "-c", "user.email=bench@local", "commit", "-q", "--allow-empty", "-m", "init")
+    git(vault, "branch", "-M", "main")
+    git(vault, "push", "-q", "-u", "origin", "main")
+    return vault
+
+def make_masters(tmp, n):
+    path = tmp / "masters"
+    path.mkdir()
+    for i in range(n): (path / f"bench_master_{i}.py").write_text(MASTER_TEMPLATE.format(i=i), encoding='utf-8')
+    return path
+
+def percentile(values, q):
+    if not values: return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def git_sha():
+    try: return git(ROOT, "rev-parse", "--short", "HEAD").stdout.strip()
+    except Exception: return "unknown"
+
+def run(args):
+    tmp = Path(tempfile.mkdtemp(prefix="factory_bench_"))
+    os.environ.setdefault("SILICON_FLOW_KEY", "bench")
+    os.environ["FACTORY_WAL_PATH"] = str(tmp / "wal.jsonl")
+    if args.stream: os.environ["FACTORY_STREAM"] = "true"
+    from factory import UniversalFactory
+
+    procs = load_processors()
+    db = FakeSupabase()
+    rows = {}
+    for source in SOURCES:
+        rows[source] = db_rows(source, int(args.rows * DEFAULT_ROWS[source]), procs, seed=args.seed)
+        db.load("raw_signals", rows[source])
+
+    vault = make_vault(tmp)
+    masters = make_masters(tmp, args.masters)
+    config = StubConfig(args.latency, args.latency_ms, args.jitter, args.rate_429, args.tokens, args.token_ms, args.seed)
+
+    with LLMStub(config) as stub:
+        factory = UniversalFactory(masters_path=str(masters), db=db)
+        factory.api_url = stub.url
+
+        fetched, audit_lat = [], []
+        orig_fetch, orig_audit = factory.fetch_elite_signals, factory.audit_process
+        def fetch():
+            t0 = time.perf_counter()
+            out = orig_fetch()
+            fetched.append((len(out), time.perf_counter() - t0))
+            return out
+        def audit(row, processed_ids):
+            t0 = time.perf_counter()
+            out = orig_audit(row, processed_ids)
+            if out: audit_lat.append(time.perf_counter() - t0)
+            return out
+        factory.fetch_elite_signals, factory.audit_process = fetch, audit
+
+        t0 = time.perf_counter()
+        factory.process_and_ship(vault_path=str(vault))
+        wall = time.perf_counter() - t0
+
+    signals, fetch_s = fetched[0] if fetched else (0, 0.0)
+    journal = factory.journal.stats if factory.journal else {}
+    result = {
+        "commit": git_sha(),
+        "timestamp": datetime.now().isoformat(timespec='seconds'),
+        "config": {"rows_scale": args.rows, "masters": args.masters, "stream": args.stream, "latency": args.latency,
+                   "latency_ms": args.latency_ms, "jitter": args.jitter, "rate_429": args.rate_429,
+                   "tokens": args.tokens, "token_ms": args.token_ms, "seed": args.seed},
+        "rows_in_db": {s: len(r) for s, r in rows.items()},
+        "signals": signals,
+        "audited": len(audit_lat),
+        "wall_seconds": round(wall, 3),
+        "fetch_seconds": round(fetch_s, 3),
+        "signals_per_s": round(signals / wall, 3) if wall else None,
+        "llm_requests": stub.requests,
+        "llm_throttled": stub.throttled,
+        "requests_per_s": round(stub.requests / wall, 3) if wall else None,
+        "audit_latency_s": {q: (round(percentile(audit_lat, v), 3) if audit_lat else None)
+                            for q, v in (("p50", 0.5), ("p95", 0.95), ("p99", 0.99))},
+        "git": {"seconds": round(journal.get("git_seconds", 0.0), 3), "commits": journal.get("commits", 0),
+                "push_attempts": journal.get("push_attempts", 0), "share_of_wall": round(journal.get("git_seconds", 0.0) / wall, 4) if wall else None},
+        "db_calls": db.calls,
+    }
+    return result
+
+def main():
+    ap = argparse.ArgumentParser(description="UniversalFactory 端到端吞吐基准")
+    ap.add_argument("--rows", type=float, default=1.0, help="raw_signals 行数倍率（相对各源 fetch limit）")
+    ap.add_argument("--masters", type=int, default=3)
+    ap.add_argument("--stream", action="store_true")
+    ap.add_argument("--latency", default="lognormal", choices=["fixed", "uniform", "lognormal"])
+    ap.add_argument("--latency-ms", type=float, default=400)
+    ap.add_argument("--jitter", type=float, default=0.5)
+    ap.add_argument("--rate-429", type=float, default=0.0)
+    ap.add_argument("--tokens", type=int, default=200)
+    ap.add_argument("--token-ms", type=float, default=1)
+    ap.add_argument("--seed", type=int, default=7)
+    ap.add_argument("--out", help="结果 JSON 路径（默认 bench/results/factory_<commit>.json）")
+    args = ap.parse_args()
+
+    result = run(args)
+    out = Path(args.out) if args.out else BENCH_DIR / "results" / f"factory_{result['commit']}.json"
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(result, ensure_ascii=False, indent=2), encoding='utf-8')
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    print(f"📊 基准结果已写入 {out}")
+
+if __name__ == "__main__":
+    main()
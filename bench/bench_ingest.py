@@ -0,0 +1,82 @@
+import argparse, gc, json, sys, time, tracemalloc
+import multiprocessing as mp
+from pathlib import Path
+
+# ==========================================
+# 🧱 入库基准：dict 路径 vs 列式路径（process -> 写库请求体）的 CPU 与峰值内存
+# ==========================================
+# python bench/bench_ingest.py --sizes 100000,500000
+# dict:     process() + 注入 signal_type + JSON 编码（supabase insert 的请求体）
+# columnar: process_batches() + signal_type 常量列 + 每批 CSV 编码（PostgREST 批量请求体）
+# 每次测量都在新进程里跑：Arrow 的内存不走 Python 分配器，峰值 = tracemalloc 峰值 + Arrow 内存池峰值
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+sys.path.insert(0, str(BENCH_DIR))
+
+DEFAULT_SOURCES = "polymarket,twitter"
+
+def dict_path(mod, raw, path, source):
+    items = mod.process(raw, path)
+    for item in items:
+        item['signal_type'] = source
+        if 'raw_json' not in item: item['raw_json'] = item.copy()
+    return sum(len(json.dumps(items[i:i + 500])) for i in range(0, len(items), 500))
+
+def columnar_path(mod, raw, path, source):
+    import columnar
+    return sum(len(columnar.to_csv(columnar.with_constant(batch, "signal_type", source)))
+               for batch in mod.process_batches(raw, path))
+
+def _measure(args):
+    source, n, seed, mode, memory = args
+    import pyarrow as pa
+    from synth import RAW_PATHS, raw_for, load_processors
+    mod = load_processors()[source]
+    raw = raw_for(source, n, seed)
+    fn = dict_path if mode == "dict" else columnar_path
+    gc.collect()
+    if memory: tracemalloc.start()
+    t0, c0 = time.perf_counter(), time.process_time()
+    size = fn(mod, raw, RAW_PATHS[source], source)
+    wall, cpu = time.perf_counter() - t0, time.process_time() - c0
+    peak = None
+    if memory:
+        peak = (tracemalloc.get_traced_memory()[1] + pa.default_memory_pool().max_memory()) / 1024 / 1024
+        tracemalloc.stop()
+    return {"wall_s": round(wall, 3), "cpu_s": round(cpu, 3), "body_mb": round(size / 1024 / 1024, 1),
+            "peak_mb": round(peak, 1) if peak is not None else None}
+
+def run(source, n, seed, mode, memory):
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(1) as pool:
+        timing = pool.apply(_measure, ((source, n, seed, mode, False),))
+    if memory:
+        # 计时与测内存分开跑：tracemalloc 本身会拖慢 2-3 倍
+        with ctx.Pool(1) as pool:
+            timing["peak_mb"] = pool.apply(_measure, ((source, n, seed, mode, True),))["peak_mb"]
+    return timing
+
+def main():
+    ap = argparse.ArgumentParser(description="dict 路径 vs 列式路径的入库开销")
+    ap.add_argument("--sources", default=DEFAULT_SOURCES)
+    ap.add_argument("--sizes", default="100000")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--no-memory", action="store_true")
+    ap.add_argument("--out", help="结果 JSON 路径")
+    args = ap.parse_args()
+
+    results = {}
+    for source in args.sources.split(","):
+        for n in [int(x) for x in args.sizes.split(",")]:
+            r = {mode: run(source, n, args.seed, mode, not args.no_memory) for mode in ("dict", "columnar")}
+            results.setdefault(source, {})[str(n)] = r
+            d, c = r["dict"], r["columnar"]
+            line = f"📦 {source:<11} {n:>8,}: cpu {d['cpu_s']:.2f}s -> {c['cpu_s']:.2f}s (x{d['cpu_s'] / max(c['cpu_s'], 1e-9):.2f})"
+            if d["peak_mb"] is not None:
+                line += f" | peak {d['peak_mb']}MB -> {c['peak_mb']}MB"
+            print(line, flush=True)
+    if args.out: Path(args.out).write_text(json.dumps(results, indent=2), encoding='utf-8')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import argparse, gc, json, sys, time, tracemalloc
+from datetime import datetime
+from pathlib import Path
+
+# ==========================================
+# ⚙️ Processor 微基准：process() 行/秒 + get_hot_items() 端到端 + 峰值内存
+# ==========================================
+# python bench/bench_processors.py --sizes 10000,100000
+# python bench/bench_processors.py --compare            # 与 bench/baselines/processors.json 对比
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+from synth import SOURCES, RAW_PATHS, raw_for, load_processors
+from fake_supabase import FakeSupabase
+
+BASELINE = BENCH_DIR / "baselines" / "processors.json"
+
+def timed(fn, *args, memory=False):
+    gc.collect()
+    if memory: tracemalloc.start()
+    t0 = time.perf_counter()
+    out = fn(*args)
+    elapsed = time.perf_counter() - t0
+    peak = None
+    if memory:
+        peak = tracemalloc.get_traced_memory()[1] / 1024 / 1024
+        tracemalloc.stop()
+    return out, elapsed, peak
+
+def bench_one(mod, source, n, seed, memory, repeat):
+    raw = raw_for(source, n, seed)
+    path = RAW_PATHS[source]
+    best_proc, rows = None, None
+    for _ in range(repeat):
+        rows, t, _ = timed(mod.process, raw, path)
+        best_proc = t if best_proc is None else min(best_proc, t)
+
+    db = FakeSupabase()
+    db.load(source, rows)
+    best_hot = None
+    for _ in range(repeat):
+        report, t, _ = timed(mod.get_hot_items, db, source)
+        best_hot = t if best_hot is None else min(best_hot, t)
+
+    result = {
+        "rows": len(rows),
+        "process_s": round(best_proc, 4),
+        "process_rows_per_s": round(len(rows) / best_proc) if best_proc else None,
+        "hot_items_s": round(best_hot, 4),
+        "hot_items_rows_per_s": round(len(rows) / best_hot) if best_hot else None,
+        "report_rows": sum(len(v.get("rows", [])) if isinstance(v, dict) else len(v) for v in (report or {}).values()),
+    }
+    if memory:
+        # 计时与测内存分开跑：tracemalloc 本身会拖慢 2-3 倍
+        _, _, result["process_peak_mb"] = timed(mod.process, raw, path, memory=True)
+        _, _, result["hot_items_peak_mb"] = timed(mod.get_hot_items, db, source, memory=True)
+        result["process_peak_mb"] = round(result["process_peak_mb"], 1)
+        result["hot_items_peak_mb"] = round(result["hot_items_peak_mb"], 1)
+    del raw, rows, db
+    gc.collect()
+    return result
+
+def compare(current, baseline):
+    print("\n📈 与基线对比（>1 表示变快）:")
+    for source, sizes in current.items():
+        for n, r in sizes.items():
+            b = baseline.get(source, {}).get(n)
+            if not b: continue
+            sp = b["process_s"] / r["process_s"] if r["process_s"] else float('nan')
+            sh = b["hot_items_s"] / r["hot_items_s"] if r["hot_items_s"] else float('nan')
+            print(f"   {source:<11} {n:>8}: process x{sp:.2f} | get_hot_items x{sh:.2f}")
+
+def main():
+    ap = argparse.ArgumentParser(description="processors/ 热路径微基准（合成数据 + 内存版 supabase）")
+    ap.add_argument("--sources", default=",".join(SOURCES))
+    ap.add_argument("--sizes", default="10000,100000", help="逗号分隔，例如 10000,100000,1000000")
+    ap.add_argument("--seed", type=int, default=42)
+    ap.add_argument("--repeat", type=int, default=1)
+    ap.add_argument("--no-memory", action="store_true")
+    ap.add_argument("--out", help="结果 JSON 路径")
+    ap.add_argument("--write-baseline", action="store_true", help="把本次结果写成基线")
+    ap.add_argument("--compare", action="store_true", help="与已提交的基线对比")
+    args = ap.parse_args()
+
+    procs = load_processors()
+    results = {}
+    for source in args.sources.split(","):
+        for n in [int(x) for x in args.sizes.split(",")]:
+            print(f"⏱️ {source} @ {n:,} ...", flush=True)
+            r = bench_one(procs[source], source, n, args.seed, not args.no_memory, args.repeat)
+            results.setdefault(source, {})[str(n)] = r
+            print(f"   process {r['process_rows_per_s']:,} rows/s | get_hot_items {r['hot_items_s']:.3f}s"
+                  + (f" | peak {r['process_peak_mb']}MB / {r['hot_items_peak_mb']}MB" if "process_peak_mb" in r else ""))
+
+    payload = {"timestamp": datetime.now().isoformat(timespec='seconds'), "python": sys.version.split()[0],
+               "seed": args.seed, "results": results}
+    if args.out: Path(args.out).write_text(json.dumps(payload, indent=2), encoding='utf-8')
+    if args.write_baseline:
+        BASELINE.parent.mkdir(parents=True, exist_ok=True)
+        BASELINE.write_text(json.dumps(payload, indent=2), encoding='utf-8')
+        print(f"📌 基线已写入 {BASELINE}")
+    if args.compare and BASELINE.exists():
+        compare(results, json.loads(BASELINE.read_text(encoding='utf-8'))["results"])
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+import argparse, sys
+from pathlib import Path
+
+# ==========================================
+# 🔎 关键词引擎回归检查：KeywordMatcher 与原来逐词 `k in text` 的写法逐行比对
+# ==========================================
+# python bench/check_keywords.py --rows 20000
+# twitter.calculate_score_and_tag（话题 / 噪音 / 豁免 / VIP）与 polymarket.static_score（狙击词）
+# 在合成数据 + 手写边界用例上必须和旧实现一模一样；自动机走 pyahocorasick 与纯 Python DFA 两条路径都查。
+
+BENCH_DIR = Path(__file__).resolve().parent
+sys.path.insert(0, str(BENCH_DIR.parent))
+
+import keyword_engine
+from synth import RAW_PATHS, raw_for, load_processors
+
+# 评审里报过的回归 + 中文夹英文 / 复数 / VIP 前缀
+TWEETS = [
+    ("New tariffs on chips, elections ahead", "someone"),
+    ("比特币bitcoin大涨", "someone"),
+    ("Bonds and yields surge", "someone"),
+    ("The ETH merge is done", "VitalikButerin"),
+    ("Fed 降息 cut 50bps，美债yield走低", "RayDalio"),
+    ("generate impact react", "random_guy"),
+    ("This is a scam and a disgrace, but the fed will cut rates", "news_bot"),
+    ("pure noise: woke clown idiot", "news_bot"),
+]
+MARKETS = [
+    {"title": "BTC above $100k?", "question": "比特币btc年底", "vol24h": 10, "dayChange": 1},
+    {"title": "Fed decision", "question": "Will Warsh be nominated?", "vol24h": 10, "dayChange": 1},
+    {"title": "Goldman earnings", "question": "feds bitcoins", "vol24h": 10, "dayChange": 0},
+]
+
+def old_twitter(tw, item):
+    """user-035 之前的 calculate_score_and_tag"""
+    text = (item.get('full_text') or "").lower()
+    user = (item.get('user_name') or "")
+    base_score = ((item.get('retweets') or 0) * 5) + ((item.get('bookmarks') or 0) * 10) + (item.get('likes') or 0)
+    detected_topic, max_keyword_len = "General", 0
+    for topic, keywords in tw.TOPIC_RULES.items():
+        for k in keywords:
+            if k in text and len(k) > max_keyword_len: detected_topic, max_keyword_len = topic, len(k)
+    if detected_topic != "General": base_score = (base_score + 2000) * 1.5
+    else: base_score *= 0.5
+    if any(n in text for n in tw.NOISE_KEYWORDS) and not any(s in text for s in tw.MACRO_IMMUNITY):
+        base_score *= 0.1
+        detected_topic = "Politics"
+    if any(v.lower() in user.lower() for v in tw.VIP_AUTHORS): base_score += 5000
+    return base_score, detected_topic
+
+def old_sniper(pm, item):
+    text = (str(item.get('title')) + " " + str(item.get('question'))).lower()
+    return any(k in text for k in pm.SNIPERS) and "warsh" not in text
+
+def check(procs, rows):
+    tw, pm = procs["twitter"], procs["polymarket"]
+    tweets = tw.process(raw_for("twitter", rows), RAW_PATHS["twitter"])
+    tweets += [{"full_text": t, "user_name": u, "likes": 1, "retweets": 1, "bookmarks": 1} for t, u in TWEETS]
+    markets = pm.process(raw_for("polymarket", rows), RAW_PATHS["polymarket"]) + MARKETS
+    bad = 0
+    for item in tweets:
+        old, new = old_twitter(tw, item), tw.calculate_score_and_tag(item)
+        if old != new:
+            bad += 1
+            if bad <= 10: print(f"❌ twitter {item.get('full_text')!r} / {item.get('user_name')!r}: {old} -> {new}")
+    for item in markets:
+        hits = pm.SNIPER_MATCHER.match(str(item.get('title')) + " " + str(item.get('question')))
+        old, new = old_sniper(pm, item), ("sniper" in hits and "veto" not in hits)
+        if old != new:
+            bad += 1
+            if bad <= 10: print(f"❌ polymarket {item.get('title')!r} / {item.get('question')!r}: {old} -> {new}")
+    return len(tweets) + len(markets), bad
+
+def main():
+    ap = argparse.ArgumentParser(description="关键词引擎 vs 旧的逐词子串匹配")
+    ap.add_argument("--rows", type=int, default=20000)
+    args = ap.parse_args()
+    total_bad = 0
+    engines = ["pyahocorasick", "python"] if keyword_engine.ahocorasick is not None else ["python"]
+    for engine in engines:
+        if engine == "python": keyword_engine.ahocorasick = None  # 重新加载 processors，词库按纯 Python DFA 编译
+        n, bad = check(load_processors(), args.rows)
+        print(f"{'✅' if not bad else '❌'} {engine}: {n} 行，{bad} 行与旧实现不一致")
+        total_bad += bad
+    return 1 if total_bad else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+import argparse, os, sys, tempfile, uuid
+from pathlib import Path
+
+import pyarrow as pa
+
+# ==========================================
+# 🗃️ 存储后端一致性检查：同一组操作分别跑在各后端上，结果必须一致
+# ==========================================
+# python bench/conformance_storage.py                      # sqlite + 内存版 FakeSupabase
+# python bench/conformance_storage.py --backends supabase  # 线上（需要 SUPABASE_URL / SUPABASE_KEY）
+# 覆盖 storage.py 声明的全部操作；每次运行用唯一的 signal_type / file_sha 隔离，结束时删掉自己写的行，
+# 所以也可以直接对生产库跑。FakeSupabase 没有整表读写，跳过 insert_table / fetch_table 两项。
+
+BENCH_DIR = Path(__file__).resolve().parent
+ROOT = BENCH_DIR.parent
+sys.path.insert(0, str(ROOT))
+
+import storage
+from fake_supabase import FakeSupabase
+
+ROWS = [
+    {"repo_name": "a", "bj_time": "2026-01-01T10:00:00", "stars": 10, "yes_prob": 12.5,
+     "strategy_tags": ["TAIL_RISK", "MACRO"], "raw_json": {"k": 1, "nested": {"x": [1, 2]}}},
+    {"repo_name": "b", "bj_time": "2026-01-01T11:00:00", "stars": 30, "yes_prob": None,
+     "strategy_tags": [], "raw_json": {"k": 2}},
+    {"repo_name": "c", "bj_time": "2026-01-01T12:00:00", "stars": 20, "yes_prob": 99.0,
+     "strategy_tags": ["TECH"], "raw_json": {"k": 3, "text": "引号 \" 与 \\ 反斜杠"}},
+    {"repo_name": "d", "bj_time": None, "stars": 5, "yes_prob": 50.0,
+     "strategy_tags": None, "raw_json": {"k": 4}},
+    {"repo_name": "e", "bj_time": "2026-01-02T09:00:00", "stars": 0, "yes_prob": 0.0,
+     "strategy_tags": ["TAIL_RISK"], "raw_json": {"k": 5}},
+]
+
+class Checker:
+    def __init__(self, name):
+        self.name, self.failed, self.passed = name, [], 0
+
+    def __call__(self, label, got, expected):
+        if got == expected: self.passed += 1
+        else: self.failed.append(f"{label}: got {got!r}, expected {expected!r}")
+
+def names(res):
+    return [r.get("repo_name") for r in res.data]
+
+def run(backend, db):
+    c = Checker(backend)
+    tag = f"conformance_{uuid.uuid4().hex[:12]}"
+    sha = f"{tag}_sha"
+    ids = []
+    try:
+        t = lambda: db.table("raw_signals")
+        inserted = t().insert([dict(r, signal_type=tag) for r in ROWS]).execute().data
+        ids = [r["id"] for r in inserted]
+        c("insert 返回行数", len(inserted), len(ROWS))
+        c("insert 返回 id / created_at", all(r.get("id") is not None and r.get("created_at") for r in inserted), True)
+
+        rows = t().select("*").eq("signal_type", tag).order("repo_name").execute().data
+        c("eq 全量", [r["repo_name"] for r in rows], ["a", "b", "c", "d", "e"])
+        c("jsonb 往返", [r["raw_json"] for r in rows], [r["raw_json"] for r in ROWS])
+        c("数组往返", [r["strategy_tags"] for r in rows], [r["strategy_tags"] for r in ROWS])
+        c("整数 / 浮点 / NULL", [(r["stars"], r["yes_prob"]) for r in rows], [(r["stars"], r["yes_prob"]) for r in ROWS])
+
+        sel = t().select("repo_name, stars").eq("signal_type", tag).eq("repo_name", "c").execute().data
+        c("select 指定列", sel, [{"repo_name": "c", "stars": 20}])
+
+        q = lambda: t().select("repo_name").eq("signal_type", tag)
+        c("gt", sorted(names(q().gt("bj_time", "2026-01-01T10:30:00").execute())), ["b", "c", "e"])
+        c("gte", sorted(names(q().gte("bj_time", "2026-01-01T11:00:00").execute())), ["b", "c", "e"])
+        c("lt", sorted(names(q().lt("bj_time", "2026-01-01T11:00:00").execute())), ["a"])
+        c("lte", sorted(names(q().lte("stars", 10).execute())), ["a", "d", "e"])
+        c("neq", sorted(names(q().neq("repo_name", "a").execute())), ["b", "c", "d", "e"])
+        c("is_ null", names(q().is_("bj_time", "null").execute()), ["d"])
+        c("in_", sorted(names(q().in_("repo_name", ["a", "c", "zz"]).execute())), ["a", "c"])
+
+        # Postgres 默认：升序 NULL 在后，降序 NULL 在前
+        c("order desc + limit", names(q().order("bj_time", desc=True).limit(3).execute()), ["d", "e", "c"])
+        c("order asc", names(q().order("bj_time").execute()), ["a", "b", "c", "e", "d"])
+        c("order desc nullsfirst=False", names(q().order("bj_time", desc=True, nullsfirst=False).limit(3).execute()), ["e", "c", "b"])
+        c("order 数值", names(q().order("stars", desc=True).limit(2).execute()), ["b", "c"])
+        c("limit", len(q().limit(2).execute().data), 2)
+        cnt = t().select("id", count="exact").eq("signal_type", tag).gt("stars", 5).limit(1).execute()
+        c("count=exact 不受 limit 影响", (len(cnt.data), cnt.count), (1, 3))
+
+        pf = lambda: db.table("processed_files")
+        pf().upsert({"file_sha": sha, "file_path": "conformance/x.json", "engine": "github", "item_count": 1}).execute()
+        pf().upsert({"file_sha": sha, "file_path": "conformance/x.json", "engine": "github", "item_count": 7}).execute()
+        got = pf().select("file_sha, item_count").eq("file_sha", sha).execute().data
+        c("upsert 覆盖同键", got, [{"file_sha": sha, "item_count": 7}])
+
+        if hasattr(db, "insert_table"):
+            arrow = pa.table({"repo_name": ["x", "y"], "signal_type": [tag, tag], "stars": [1, 2],
+                              "bj_time": ["2026-01-03T00:00:00", "2026-01-03T01:00:00"],
+                              "raw_json": ['{"k": 10}', '{"k": 11}'],
+                              "strategy_tags": pa.array([["A", 'B"q'], None], type=pa.list_(pa.string()))})
+            db.insert_table("raw_signals", arrow)
+            rows = t().select("*").eq("signal_type", tag).in_("repo_name", ["x", "y"]).order("repo_name").execute().data
+            ids += [r["id"] for r in rows]
+            c("insert_table 行数", len(rows), 2)
+            c("insert_table jsonb 文本入库后是对象", [r["raw_json"] for r in rows], [{"k": 10}, {"k": 11}])
+            c("insert_table 数组列", [r["strategy_tags"] for r in rows], [["A", 'B"q'], None])
+            fetched = db.fetch_table("raw_signals", {"signal_type": f"eq.{tag}", "bj_time": "gt.2026-01-01T11:30:00"})
+            c("fetch_table 过滤", sorted(fetched.column("repo_name").to_pylist()), ["c", "e", "x", "y"])
+
+        t().update({"stars": 99, "topic": "T"}).eq("signal_type", tag).in_("repo_name", ["a", "d"]).execute()
+        got = t().select("repo_name, stars, topic, bj_time").eq("signal_type", tag).in_("repo_name", ["a", "d"]).order("repo_name").execute().data
+        c("update 只改给出的列", got, [{"repo_name": "a", "stars": 99, "topic": "T", "bj_time": "2026-01-01T10:00:00"},
+                                     {"repo_name": "d", "stars": 99, "topic": "T", "bj_time": None}])
+
+        t().delete().in_("id", ids).execute()
+        c("delete().in_ 后清空", t().select("id").eq("signal_type", tag).execute().data, [])
+        ids = []
+    except Exception as e:
+        c.failed.append(f"异常: {type(e).__name__}: {e}")
+    finally:
+        # 失败时也把自己写的行删掉
+        try:
+            if ids: db.table("raw_signals").delete().in_("id", ids).execute()
+            db.table("processed_files").delete().in_("file_sha", [sha]).execute()
+        except Exception as e:
+            c.failed.append(f"清理失败: {e}")
+    return c
+
+def make(backend):
+    if backend == "fake": return FakeSupabase()
+    if backend == "sqlite": return storage.SQLiteStorage(os.path.join(tempfile.mkdtemp(prefix="storage_conf_"), "db.sqlite"))
+    return storage.connect(backend)
+
+def main():
+    ap = argparse.ArgumentParser(description="存储后端一致性检查")
+    ap.add_argument("--backends", default="sqlite,fake", help="逗号分隔：sqlite / fake / supabase")
+    args = ap.parse_args()
+    ok = True
+    for backend in [b.strip() for b in args.backends.split(",") if b.strip()]:
+        c = run(backend, make(backend))
+        print(f"{'✅' if not c.failed else '❌'} {backend}: {c.passed} 项通过, {len(c.failed)} 项失败")
+        for f in c.failed: print(f"   - {f}")
+        ok &= not c.failed
+    sys.exit(0 if ok else 1)
+
+if __name__ == "__main__":
+    main()
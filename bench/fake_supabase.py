@@ -0,0 +1,151 @@
+import json, threading
+from datetime import datetime, timezone
+
+# ==========================================
+# 🧪 内存版 Supabase：只覆盖本仓库用到的查询链
+# ==========================================
+# table().select().eq().neq().gt().lt().in_().is_().order().limit().execute()
+# insert() / upsert() / update().eq() / delete().in_()，返回对象带 .data，与 supabase-py 的用法一致。
+
+class _Result:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+class _Query:
+    def __init__(self, db, table):
+        self.db, self.table = db, table
+        self.filters, self._order, self._limit = [], None, None
+        self.action, self.payload, self.columns = "select", None, "*"
+        self.on_conflict, self.count = None, None
+
+    # --- 动作 ---
+    def select(self, columns="*", count=None):
+        self.action, self.columns, self.count = "select", columns, count
+        return self
+
+    def insert(self, rows):
+        self.action, self.payload = "insert", rows
+        return self
+
+    def upsert(self, rows, on_conflict=None):
+        self.action, self.payload, self.on_conflict = "upsert", rows, on_conflict
+        return self
+
+    def update(self, values):
+        self.action, self.payload = "update", values
+        return self
+
+    def delete(self):
+        self.action = "delete"
+        return self
+
+    # --- 过滤 ---
+    def _f(self, op, col, val):
+        self.filters.append((op, col, val))
+        return self
+
+    def eq(self, col, val): return self._f("eq", col, val)
+    def neq(self, col, val): return self._f("neq", col, val)
+    def gt(self, col, val): return self._f("gt", col, val)
+    def gte(self, col, val): return self._f("gte", col, val)
+    def lt(self, col, val): return self._f("lt", col, val)
+    def lte(self, col, val): return self._f("lte", col, val)
+    def in_(self, col, vals): return self._f("in", col, list(vals))
+    def is_(self, col, val): return self._f("is", col, val)
+
+    def order(self, col, desc=False, nullsfirst=None):
+        self._order = (col, desc, desc if nullsfirst is None else nullsfirst)
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def _match(self, row):
+        for op, col, val in self.filters:
+            v = row.get(col)
+            # PostgREST 的 is.null / is.true / is.false；eq / neq 的 "null" 只是字符串
+            if op == "is":
+                if v is not {"null": None, "true": True, "false": False}.get(str(val).lower()): return False
+                continue
+            if op == "eq" and v != val: return False
+            if op == "neq" and v == val: return False
+            if op == "in" and v not in val: return False
+            if op in ("gt", "gte", "lt", "lte"):
+                if v is None: return False
+                if op == "gt" and not v > val: return False
+                if op == "gte" and not v >= val: return False
+                if op == "lt" and not v < val: return False
+                if op == "lte" and not v <= val: return False
+        return True
+
+    def execute(self):
+        db = self.db
+        with db.lock:
+            rows = db.tables.setdefault(self.table, [])
+            db.calls[self.action] = db.calls.get(self.action, 0) + 1
+            if self.action in ("insert", "upsert"):
+                payload = self.payload if isinstance(self.payload, list) else [self.payload]
+                # 走一遍 JSON 序列化，模拟 HTTP 往返的开销与类型
+                payload = json.loads(json.dumps(payload, default=str))
+                key = self.on_conflict or db.primary_keys.get(self.table)
+                out = []
+                for r in payload:
+                    if self.action == "upsert" and key and r.get(key) is not None:
+                        existing = next((x for x in rows if x.get(key) == r.get(key)), None)
+                        if existing is not None:
+                            existing.update(r)
+                            out.append(existing)
+                            continue
+                    db.next_id += 1
+                    r.setdefault("id", db.next_id)
+                    r.setdefault("created_at", datetime.now(timezone.utc).isoformat())
+                    rows.append(r)
+                    out.append(r)
+                return _Result(out)
+            matched = [r for r in rows if self._match(r)]
+            if self.action == "update":
+                values = json.loads(json.dumps(self.payload, default=str))
+                for r in matched: r.update(values)
+                return _Result([dict(r) for r in matched])
+            if self.action == "delete":
+                ids = {id(r) for r in matched}
+                db.tables[self.table] = [r for r in rows if id(r) not in ids]
+                return _Result(matched)
+            if self._order:
+                col, desc, nullsfirst = self._order
+                present = [r for r in matched if r.get(col) is not None]
+                missing = [r for r in matched if r.get(col) is None]
+                # 与 Postgres 一致：默认升序 NULL 在后，降序 NULL 在前；nullsfirst 显式指定时照办
+                present = sorted(present, key=lambda r: r[col], reverse=desc)
+                matched = missing + present if nullsfirst else present + missing
+            total = len(matched) if self.count else None
+            if self._limit is not None: matched = matched[: self._limit]
+            if self.columns and self.columns != "*":
+                cols = [c.strip() for c in self.columns.split(",")]
+                return _Result([{c: r.get(c) for c in cols} for r in matched], total)
+            return _Result([dict(r) for r in matched], total)
+
+class FakeSupabase:
+    """线程安全的内存表集合，table(name) 返回查询构建器"""
+
+    def __init__(self, primary_keys=None):
+        self.tables = {}
+        self.lock = threading.RLock()
+        self.next_id = 0
+        self.calls = {}
+        self.primary_keys = {"processed_files": "file_sha", **(primary_keys or {})}
+
+    def table(self, name):
+        return _Query(self, name)
+
+    def load(self, table, rows):
+        """直接灌数据（不计入调用次数）"""
+        with self.lock:
+            for r in rows:
+                self.next_id += 1
+                r = dict(r)
+                r.setdefault("id", self.next_id)
+                r.setdefault("created_at", datetime.now(timezone.utc).isoformat())
+                self.tables.setdefault(table, []).append(r)
@@ -0,0 +1,124 @@
+import json, random, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ==========================================
+# 🤖 本地 OpenAI 兼容桩服务：可控延迟分布 / 429 注入 / 响应体积
+# ==========================================
+# POST /v1/chat/completions，支持 stream=true（SSE）。输出确定性（按请求序号播种）。
+# SSE 的 Content-Type 不带 charset（与 SiliconFlow 一致），客户端要自己按 UTF-8 解。
+
+class StubConfig:
+    def __init__(self, latency="lognormal", latency_ms=800, jitter=0.5, rate_429=0.0,
+                 tokens=300, token_ms=5, seed=7, drop_rate=0.0):
+        self.latency = latency        # fixed | uniform | lognormal
+        self.latency_ms = latency_ms  # 首 token 前的中位延迟
+        self.jitter = jitter          # uniform: ±比例；lognormal: sigma
+        self.rate_429 = rate_429      # 随机返回 429 的比例
+        self.tokens = tokens          # 每次回复的 token 数
+        self.token_ms = token_ms      # 流式模式下每个 token 的间隔
+        self.seed = seed
+        self.drop_rate = drop_rate    # 流式模式下中途断流（不发 [DONE]）的比例
+
+    def first_byte_delay(self, rng):
+        base = self.latency_ms / 1000
+        if self.latency == "fixed": return base
+        if self.latency == "uniform": return max(0.0, base * rng.uniform(1 - self.jitter, 1 + self.jitter))
+        return base * rng.lognormvariate(0, self.jitter)
+
+def reply_tokens(n, rng):
+    words = ["宏观", "流动性", "预期差", "信号", "趋势", "风险", "alpha", "drift", "market", "policy"]
+    thought = [rng.choice(words) for _ in range(n // 2)]
+    output = [rng.choice(words) for _ in range(n - n // 2)]
+    return ["### Thought\n"] + [w + " " for w in thought] + ["\n### Output\n"] + [w + " " for w in output]
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args): pass
+
+    def do_POST(self):
+        stub = self.server.stub
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b"{}")
+        with stub.lock:
+            stub.requests += 1
+            rng = random.Random(f"{stub.config.seed}-{stub.requests}")
+        cfg = stub.config
+        if rng.random() < cfg.rate_429:
+            with stub.lock: stub.throttled += 1
+            return self._json(429, {"error": {"message": "rate limited", "type": "rate_limit"}})
+        time.sleep(cfg.first_byte_delay(rng))
+        n = min(cfg.tokens, int(body.get("max_tokens") or cfg.tokens))
+        toks = reply_tokens(n, rng)
+        if not body.get("stream"):
+            time.sleep(cfg.token_ms * n / 1000)
+            return self._json(200, {"id": "stub", "object": "chat.completion", "model": body.get("model"),
+                                    "choices": [{"index": 0, "message": {"role": "assistant", "content": "".join(toks)}, "finish_reason": "stop"}],
+                                    "usage": {"prompt_tokens": 0, "completion_tokens": n, "total_tokens": n}})
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        drop = len(toks) // 2 if rng.random() < cfg.drop_rate else None
+        if drop is not None:
+            with stub.lock: stub.dropped += 1
+        try:
+            for i, t in enumerate(toks):
+                if i == drop: break
+                chunk = {"choices": [{"index": 0, "delta": {"content": t}}]}
+                self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode())
+                self.wfile.flush()
+                time.sleep(cfg.token_ms / 1000)
+            if drop is None: self.wfile.write(b"data: [DONE]\n\n")
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # 客户端提前截断
+        self.close_connection = True
+
+    def _json(self, status, obj):
+        data = json.dumps(obj, ensure_ascii=False).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+class LLMStub:
+    """with LLMStub(StubConfig(...)) as stub: stub.url -> http://127.0.0.1:<port>/v1/chat/completions"""
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.config = config or StubConfig()
+        self.server = ThreadingHTTPServer((host, port), _Handler)
+        self.server.daemon_threads = True
+        self.server.stub = self
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.throttled = 0
+        self.dropped = 0
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1/chat/completions"
+
+    def __enter__(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="本地 OpenAI 兼容桩服务")
+    ap.add_argument("--port", type=int, default=8799)
+    ap.add_argument("--latency", default="lognormal", choices=["fixed", "uniform", "lognormal"])
+    ap.add_argument("--latency-ms", type=float, default=800)
+    ap.add_argument("--rate-429", type=float, default=0.0)
+    ap.add_argument("--tokens", type=int, default=300)
+    args = ap.parse_args()
+    with LLMStub(StubConfig(args.latency, args.latency_ms, rate_429=args.rate_429, tokens=args.tokens), port=args.port) as s:
+        print(f"🤖 LLM 桩服务已启动: {s.url}")
+        try: threading.Event().wait()
+        except KeyboardInterrupt: pass
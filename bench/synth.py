@@ -0,0 +1,133 @@
+import importlib.util, os, random, string
+from datetime import datetime, timedelta, timezone
+
+import scoring  # 调用方已把仓库根目录放进 sys.path
+
+# ==========================================
+# 🎲 合成数据：按各来源原始 JSON 形状生成（固定种子，可复现）
+# ==========================================
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCES = ["twitter", "polymarket", "reddit", "papers", "github"]
+
+WORDS = ("fed rate cut inflation bitcoin etf nvidia gpu tariff china taiwan llm openai deepseek "
+         "treasury yield bond recession election senate ukraine israel quantum fusion crispr "
+         "launch starship earnings buyback liquidity market volatility generate impact react "
+         "policy data model robot chip supply demand growth risk war peace trade deal").split()
+USERS = ["Karpathy", "Elon Musk", "Ray Dalio", "Lyn Alden", "Zerohedge", "Ian Bremmer", "Naval",
+         "random_guy", "crypto_whale", "news_bot", "Unusual Whales", "The Economist"]
+SUBS = ["wallstreetbets", "stocks", "economy", "options", "bitcoin", "technology", "worldnews", "science", "funny"]
+CATEGORIES = ["POLITICS", "GEOPOLITICS", "TECH", "FINANCE", "CRYPTO", "SCIENCE", "ECONOMY", "BUSINESS", "CLIMATE", "SPORTS"]
+STRATEGY_TAGS = ["TAIL_RISK", "MOMENTUM", "WHALE", "NEW_MARKET"]
+
+def sentence(rng, n):
+    return " ".join(rng.choice(WORDS) for _ in range(n))
+
+def _ts(rng, hours=24):
+    return datetime.now(timezone.utc) - timedelta(seconds=rng.randint(0, hours * 3600))
+
+def twitter_raw(rng, n):
+    out = []
+    for _ in range(n):
+        user = rng.choice(USERS)
+        tid = rng.randint(10**17, 10**18)
+        out.append({
+            "fullText": sentence(rng, rng.randint(8, 40)),
+            "createdAt": _ts(rng).strftime('%a %b %d %H:%M:%S +0000 %Y'),
+            "tweetUrl": f"https://x.com/{user.replace(' ', '')}/status/{tid}",
+            "tags": rng.sample(["AI", "MACRO", "CRYPTO", "GEO"], rng.randint(0, 2)),
+            "user": {"name": user, "screenName": user.replace(' ', '').lower(), "followersCount": rng.randint(100, 10**8)},
+            "metrics": {"likes": rng.randint(0, 50000), "retweets": rng.randint(0, 5000), "replies": rng.randint(0, 2000),
+                        "quotes": rng.randint(0, 500), "bookmarks": rng.randint(0, 3000), "viewCount": rng.randint(0, 10**7)},
+            "growth_views": rng.randint(0, 10**5), "growth_likes": rng.randint(0, 500),
+            "growth_retweets": rng.randint(0, 100), "growth_replies": rng.randint(0, 50),
+        })
+    return out
+
+def polymarket_raw(rng, n, markets=None):
+    markets = markets or max(1, n // 8)
+    out = []
+    for _ in range(n):
+        m = rng.randint(0, markets - 1)
+        yes = rng.uniform(0.5, 99.5)
+        out.append({
+            "eventTitle": f"Event {m // 3}: {sentence(random.Random(m // 3), 6)}",
+            "slug": f"event-{m // 3}",
+            "ticker": f"EV{m // 3}",
+            "question": f"Will {sentence(random.Random(m), 4)} happen?",
+            "prices": f"Yes: {yes:.1f}% | No: {100 - yes:.1f}%",
+            "category": CATEGORIES[m % len(CATEGORIES)],
+            "volume": f"{rng.uniform(1e3, 1e8):,.0f}",
+            "liquidity": f"${rng.uniform(1e3, 1e7):,.2f}",
+            "vol24h": f"{rng.uniform(0, 1e6):.2f}",
+            "dayChange": f"{rng.uniform(-20, 20):.2f}%",
+            "strategy_tags": rng.sample(STRATEGY_TAGS, rng.randint(0, 2)),
+            "updatedAt": _ts(rng).isoformat().replace('+00:00', 'Z'),
+        })
+    return out
+
+def reddit_raw(rng, n, per_sub=5):
+    """n 个帖子，打包成 timestamp -> data[] -> champions[] 的批次结构"""
+    out, made = [], 0
+    while made < n:
+        batch = {"timestamp": (_ts(rng) + timedelta(hours=8)).isoformat(), "data": []}
+        for sub in SUBS:
+            champs = []
+            for _ in range(min(per_sub, n - made)):
+                pid = ''.join(rng.choice(string.ascii_lowercase + string.digits) for _ in range(6))
+                champs.append({"title": sentence(rng, rng.randint(5, 14)), "url": f"https://reddit.com/r/{sub}/comments/{pid}",
+                               "summary": sentence(rng, 30), "score": rng.randint(0, 80000), "vibe": round(rng.uniform(-1, 1), 2)})
+                made += 1
+            if champs: batch["data"].append({"subreddit": sub, "champions": champs})
+            if made >= n: break
+        out.append(batch)
+    return out
+
+def papers_raw(rng, n):
+    items = [{
+        "title": f"{sentence(rng, 8).title()} #{rng.randint(0, n)}",
+        "journal": rng.choice(["Nature", "Science", "Cell", "arXiv", "PRL"]),
+        "type": rng.choice(["NUCLEAR", "EARLY", "General", "General"]),
+        "metrics": {"citations": rng.randint(0, 5000), "impact_factor": round(rng.uniform(0, 60), 1)},
+        "strategies": rng.sample(["BIO_REVOLUTION", "AI_CORE", "ENERGY"], rng.randint(0, 2)),
+        "url": f"https://doi.org/10.{rng.randint(1000, 9999)}/{rng.randint(0, 10**6)}",
+        "reason": sentence(rng, 12),
+    } for _ in range(n)]
+    return {"meta": {"scanned_at_bj": (_ts(rng) + timedelta(hours=8)).isoformat()}, "items": items}
+
+def github_raw(rng, n, repos=None):
+    repos = repos or max(1, n // 4)
+    items = []
+    for _ in range(n):
+        r = rng.randint(0, repos - 1)
+        items.append({"name": f"org{r % 97}/repo-{r}", "url": f"https://github.com/org{r % 97}/repo-{r}",
+                      "stars": int(10 ** rng.uniform(1, 5.5)), "tags": rng.sample(["AI_CORE", "VIRAL_GIANT", "TECH_ACCELERATOR"], rng.randint(0, 2))})
+    return {"meta": {"scanned_at_bj": (_ts(rng) + timedelta(hours=8)).isoformat()}, "items": items}
+
+GENERATORS = {"twitter": twitter_raw, "polymarket": polymarket_raw, "reddit": reddit_raw, "papers": papers_raw, "github": github_raw}
+RAW_PATHS = {"twitter": "twitter/bench.json", "polymarket": "polymarket/radar_bench.json", "reddit": "reddit/bench.json",
+             "papers": "papers/bench.json", "github": "github/bench.json"}
+
+def raw_for(source, n, seed=42):
+    return GENERATORS[source](random.Random(f"{source}-{seed}"), n)
+
+def load_processors():
+    """与 refinery.get_all_processors 相同的方式加载 processors/*.py（不触发 refinery 的客户端初始化）"""
+    procs = {}
+    proc_dir = os.path.join(ROOT, "processors")
+    for filename in sorted(os.listdir(proc_dir)):
+        if filename.endswith(".py") and not filename.startswith("__"):
+            name = filename[:-3]
+            spec = importlib.util.spec_from_file_location(f"mod_{name}", os.path.join(proc_dir, filename))
+            mod = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(mod)
+            procs[name] = mod
+    return procs
+
+def db_rows(source, n, procs, seed=42):
+    """原始 JSON -> processor.process() -> raw_signals 行（与 refinery.process_and_upload 一致）"""
+    rows = scoring.annotate(procs[source], procs[source].process(raw_for(source, n, seed), RAW_PATHS[source]))
+    for r in rows:
+        r['signal_type'] = source
+        if 'raw_json' not in r: r['raw_json'] = r.copy()
+    return rows
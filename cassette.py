@@ -0,0 +1,228 @@
+import atexit, base64, gzip, hashlib, json, os, threading, time
+from collections import deque
+from datetime import timedelta
+from pathlib import Path
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+from state_store import STATE_DIR
+
+# 只在 install() 真正打补丁时才导入（关闭时不给冷启动加成本）
+requests = httpx = None
+
+# ==========================================
+# 📼 录制 / 回放：把 Supabase、GitHub、LLM 的出站流量存成压缩磁带，离线按原速或缩放后的延迟重放
+# ==========================================
+# CASSETTE_MODE=record  真实请求照常发出，每次 请求 -> 响应（状态码、响应头、解码后的正文、耗时）追加进磁带
+# CASSETTE_MODE=replay  不碰网络，从磁带里取响应，按 耗时 x CASSETTE_LATENCY_SCALE 睡眠（0 = 不睡）
+# 在传输层打补丁：requests 的 HTTPAdapter.send（PyGithub / LLM / 列式通道）和 httpx 的 HTTPTransport（supabase 客户端），
+# 调用方代码不用改。请求头（Authorization / apikey）不落盘；回放时凭据用占位值，不需要任何真实密钥。
+# 匹配：先按 方法 + 路径 + 排序后的查询串 + 请求体哈希 精确匹配（同键多次按录制顺序依次取），
+# 取不到时退回 方法 + 路径（查询串里带当前时间的 since / created_at 游标每次都不一样），按录制顺序取下一条未用过的；
+# 都取空时重复该路径最后一条，完全没录到的请求按网络错误抛出，结束时打印未命中数。
+# 流式请求（LLM SSE）录制时会读完整个响应；回放时首包按录制的首包耗时，正文按行均匀摊开剩余耗时。
+
+MODE = os.environ.get("CASSETTE_MODE", "off").lower()
+CASSETTE_DIR = Path(os.environ.get("CASSETTE_DIR") or STATE_DIR / "cassettes")
+LATENCY_SCALE = float(os.environ.get("CASSETTE_LATENCY_SCALE", 1.0))
+VERSION = 1
+
+# 回放时缺失的凭据用占位值补上（refinery 导入时就会校验 / 建客户端）
+REPLAY_ENV = {"GH_PAT": "replay", "SUPABASE_URL": "https://replay.supabase.co", "SUPABASE_KEY": "replay",
+              "SILICON_FLOW_KEY": "replay"}
+# 正文已经是解码后的字节，这几个头留着会让客户端再解一次 / 校验长度
+_DROP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "set-cookie"}
+
+_lock = threading.Lock()
+_state = {"name": None, "path": None, "entries": [], "t0": None, "installed": False, "closed": False}
+_replay = {"entries": [], "exact": {}, "loose": {}, "last": {}, "used": set()}
+_stats = {"recorded": 0, "replayed": 0, "missed": 0}
+_orig = {}
+
+def cassette_path(name):
+    return Path(os.environ.get("CASSETTE_PATH") or CASSETTE_DIR / f"{name}.jsonl.gz")
+
+def _body_bytes(body):
+    if body is None: return b""
+    if isinstance(body, str): return body.encode('utf-8')
+    if isinstance(body, (bytes, bytearray)): return bytes(body)
+    return repr(body).encode('utf-8')  # 生成器 / 文件对象之类，只求同一段代码两次运行一致
+
+def _keys(method, url, body):
+    parts = urlsplit(url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    loose = f"{method.upper()} {parts.path}"
+    exact = f"{loose}?{query}#{hashlib.sha1(_body_bytes(body)).hexdigest()[:16]}"
+    return exact, loose
+
+def _encode(content):
+    try: return {"body": content.decode('utf-8')}
+    except UnicodeDecodeError: return {"body_b64": base64.b64encode(content).decode('ascii')}
+
+def _decode(entry):
+    if "body_b64" in entry: return base64.b64decode(entry["body_b64"])
+    return (entry.get("body") or "").encode('utf-8')
+
+def _headers(headers):
+    return {k: v for k, v in headers.items() if k.lower() not in _DROP_HEADERS}
+
+# ---------- 录制 ----------
+def _record(method, url, body, t0, ttfb, status=None, reason=None, headers=None, content=b"", error=None):
+    exact, loose = _keys(method, url, body)
+    entry = {"exact": exact, "loose": loose, "method": method.upper(), "url": url,
+             "at": round(t0 - _state["t0"], 4), "ttfb": round(ttfb, 4), "elapsed": round(time.perf_counter() - t0, 4)}
+    if error is not None: entry["error"] = error
+    else: entry.update(status=status, reason=reason, headers=_headers(headers), **_encode(content))
+    with _lock:
+        _state["entries"].append(entry)
+        _stats["recorded"] += 1
+
+def _record_send(self, request, stream=False, **kwargs):
+    t0 = time.perf_counter()
+    try: res = _orig["requests"](self, request, stream=stream, **kwargs)
+    except Exception as e:
+        _record(request.method, request.url, request.body, t0, time.perf_counter() - t0, error=f"{type(e).__name__}: {e}")
+        raise
+    ttfb = time.perf_counter() - t0
+    content = res.content  # 流式响应也读完：之后 iter_lines 从内存里迭代
+    _record(request.method, request.url, request.body, t0, ttfb, res.status_code, res.reason, res.headers, content)
+    return res
+
+def _record_httpx(self, request):
+    request.read()
+    t0 = time.perf_counter()
+    try: res = _orig["httpx"](self, request)
+    except Exception as e:
+        _record(request.method, str(request.url), request.content, t0, time.perf_counter() - t0, error=f"{type(e).__name__}: {e}")
+        raise
+    ttfb = time.perf_counter() - t0
+    try: content = res.read()
+    finally: res.close()
+    _record(request.method, str(request.url), request.content, t0, ttfb, res.status_code, res.reason_phrase, res.headers, content)
+    # 录制与回放走同一个构造，两种模式下调用方看到的响应一致
+    return httpx.Response(res.status_code, headers=_headers(res.headers), content=content, request=request)
+
+# ---------- 回放 ----------
+def _load(path):
+    entries = []
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        header = json.loads(f.readline() or "{}")
+        if header.get("version") != VERSION: raise ValueError(f"磁带版本 {header.get('version')} 与 {VERSION} 不符")
+        for line in f:
+            if line.strip(): entries.append(json.loads(line))
+    return entries
+
+def _index(entries):
+    _replay["entries"] = entries
+    for i, e in enumerate(entries):
+        _replay["exact"].setdefault(e["exact"], deque()).append(i)
+        _replay["loose"].setdefault(e["loose"], deque()).append(i)
+
+def _take(method, url, body):
+    exact, loose = _keys(method, url, body)
+    used = _replay["used"]
+    with _lock:
+        for key, index in ((exact, _replay["exact"]), (loose, _replay["loose"])):
+            q = index.get(key)
+            while q and q[0] in used: q.popleft()
+            if q:
+                i = q.popleft()
+                used.add(i)
+                _replay["last"][loose] = i
+                _stats["replayed"] += 1
+                return _replay["entries"][i]
+        i = _replay["last"].get(loose)
+        if i is not None:
+            _stats["replayed"] += 1
+            return _replay["entries"][i]
+        _stats["missed"] += 1
+    return None
+
+def _sleep(seconds):
+    if LATENCY_SCALE > 0 and seconds > 0: time.sleep(seconds * LATENCY_SCALE)
+
+class _PacedBody:
+    """流式回放的 raw：按行吐出正文，剩余耗时均匀摊在每行之间（首 token 延迟与吞吐都接近录制时）"""
+
+    def __init__(self, content, seconds):
+        self.lines = content.splitlines(keepends=True) or [b""]
+        self.gap = seconds / len(self.lines)
+
+    def stream(self, chunk_size=None, decode_content=True):
+        for line in self.lines:
+            _sleep(self.gap)
+            yield line
+
+    def read(self, amt=None, **kwargs):
+        return b"".join(self.stream())
+
+    def close(self): pass
+    def release_conn(self): pass
+
+def _replay_send(self, request, stream=False, **kwargs):
+    entry = _take(request.method, request.url, request.body)
+    if entry is None: raise requests.exceptions.ConnectionError(f"📼 磁带里没有 {request.method} {request.url}", request=request)
+    _sleep(entry["ttfb"] if stream else entry["elapsed"])
+    if "error" in entry: raise requests.exceptions.ConnectionError(f"📼 {entry['error']}", request=request)
+    res = requests.Response()
+    res.status_code, res.reason = entry["status"], entry.get("reason")
+    res.headers = requests.structures.CaseInsensitiveDict(entry["headers"])
+    res.encoding = requests.utils.get_encoding_from_headers(res.headers)
+    res.url, res.request, res.connection = request.url, request, self
+    res.elapsed = timedelta(seconds=entry["elapsed"])
+    content = _decode(entry)
+    if stream: res.raw = _PacedBody(content, max(entry["elapsed"] - entry["ttfb"], 0))
+    else: res._content, res._content_consumed = content, True
+    return res
+
+def _replay_httpx(self, request):
+    request.read()
+    entry = _take(request.method, str(request.url), request.content)
+    if entry is None: raise httpx.ConnectError(f"📼 磁带里没有 {request.method} {request.url}", request=request)
+    _sleep(entry["elapsed"])
+    if "error" in entry: raise httpx.ConnectError(f"📼 {entry['error']}", request=request)
+    return httpx.Response(entry["status"], headers=entry["headers"], content=_decode(entry), request=request)
+
+# ---------- 入口 ----------
+def install(name):
+    """按 CASSETTE_MODE 给传输层打补丁；off 时什么都不做。必须在创建任何客户端 / 发出第一个请求之前调用"""
+    global requests, httpx
+    if MODE not in ("record", "replay") or _state["installed"]: return False
+    import requests
+    try: import httpx  # supabase / postgrest 的传输层
+    except ImportError: httpx = None
+    HTTPAdapter = requests.adapters.HTTPAdapter
+    path = cassette_path(name)
+    _state.update(name=name, path=path, t0=time.perf_counter(), installed=True)
+    _orig["requests"] = HTTPAdapter.send
+    if httpx is not None: _orig["httpx"] = httpx.HTTPTransport.handle_request
+    if MODE == "record":
+        HTTPAdapter.send = _record_send
+        if httpx is not None: httpx.HTTPTransport.handle_request = _record_httpx
+        print(f"📼 录制模式：出站请求写入 {path}")
+    else:
+        _index(_load(path))
+        for k, v in REPLAY_ENV.items(): os.environ.setdefault(k, v)
+        HTTPAdapter.send = _replay_send
+        if httpx is not None: httpx.HTTPTransport.handle_request = _replay_httpx
+        print(f"📼 回放模式：{len(_replay['entries'])} 条请求来自 {path}（延迟 x{LATENCY_SCALE}）")
+    atexit.register(close)
+    return True
+
+def close():
+    """录制模式把磁带写盘（原子替换）；两种模式都打印统计。可重复调用"""
+    if not _state["installed"] or _state["closed"]: return None
+    with _lock:
+        entries, stats = list(_state["entries"]), dict(_stats)
+        _state["closed"] = True
+    path = _state["path"]
+    if MODE == "record":
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with gzip.open(tmp, 'wt', encoding='utf-8') as f:
+            f.write(json.dumps({"version": VERSION, "name": _state["name"], "recorded_at": time.time()}) + "\n")
+            for e in entries: f.write(json.dumps(e, ensure_ascii=False, separators=(',', ':')) + "\n")
+        os.replace(tmp, path)
+        print(f"📼 磁带已保存：{stats['recorded']} 条请求 -> {path}")
+    else:
+        print(f"📼 回放统计：命中 {stats['replayed']} / 未命中 {stats['missed']}")
+    return stats
@@ -0,0 +1,108 @@
+import math, os, re, threading
+from datetime import datetime, timedelta
+
+from state_store import load_state, save_state
+
+# ==========================================
+# 📏 数值变动闸门：只有实质性变动才重新送审
+# ==========================================
+# polymarket / github 的格式化内容里带价格、流动性、星数，任何一次跳动都会换 ref_id。
+# 这里记住每个 topic_id 上次审计时的快照，只有越过阈值才放行，并把变动量喂给漂移上下文。
+# 快照带"最后一次出现"的日期，落盘时丢掉 GATE_KEEP_DAYS 天没再出现的 topic（已结算的盘口、不再上榜的仓库）。
+
+POLY_PRICE_POINTS = float(os.environ.get("GATE_POLY_PRICE_POINTS", 3.0))        # Yes 概率变动（百分点）
+POLY_LIQUIDITY_PCT = float(os.environ.get("GATE_POLY_LIQUIDITY_PCT", 25.0))     # 流动性变动（%）
+GITHUB_BUCKETS_PER_DECADE = float(os.environ.get("GATE_GITHUB_BUCKETS_PER_DECADE", 4))  # 星数对数分桶密度
+
+KEEP_DAYS = int(os.environ.get("GATE_KEEP_DAYS", 14))
+STATE_NAME = "change_gate.json"
+_YES_RE = re.compile(r"(?:Yes|Up)\s*:\s*([\d.]+)\s*%", re.I)
+
+def parse_num(val):
+    try: return float(str(val).replace(',', '').replace('$', '').replace('%', ''))
+    except: return None
+
+def yes_price(row):
+    """Yes/Up 概率（百分点）：直接读入库时解析好的 yes_prob，没有该列的老数据才回退到正则"""
+    if row.get('yes_prob') is not None: return float(row['yes_prob'])
+    m = _YES_RE.search(str(row.get('prices') or ''))
+    return float(m.group(1)) if m else None
+
+def star_bucket(stars):
+    if not stars or stars <= 0: return 0
+    return int(math.floor(math.log10(stars) * GITHUB_BUCKETS_PER_DECADE))
+
+def snapshot(source, row):
+    if source == 'polymarket':
+        return {"price": yes_price(row), "liquidity": parse_num(row.get('liquidity'))}
+    if source == 'github':
+        return {"stars": parse_num(row.get('stars'))}
+    return None
+
+def material_delta(source, prev, curr):
+    """返回 (是否实质变动, 变动描述)"""
+    notes, material = [], False
+    if source == 'polymarket':
+        p0, p1 = prev.get('price'), curr.get('price')
+        if p0 is not None and p1 is not None:
+            notes.append(f"Yes 概率 {p0:.1f}% -> {p1:.1f}% ({p1 - p0:+.1f}pt)")
+            material |= abs(p1 - p0) >= POLY_PRICE_POINTS
+        elif p0 != p1: material = True
+        l0, l1 = prev.get('liquidity'), curr.get('liquidity')
+        if l0 and l1 is not None:
+            pct = (l1 - l0) / l0 * 100
+            notes.append(f"流动性 ${l0:,.0f} -> ${l1:,.0f} ({pct:+.1f}%)")
+            material |= abs(pct) >= POLY_LIQUIDITY_PCT
+        elif bool(l0) != bool(l1): material = True
+    elif source == 'github':
+        s0, s1 = prev.get('stars') or 0, curr.get('stars') or 0
+        notes.append(f"Stars {s0:,.0f} -> {s1:,.0f} ({s1 - s0:+,.0f})")
+        material = star_bucket(s0) != star_bucket(s1)
+    return material, "；".join(notes)
+
+class ChangeGate:
+    """按 topic_id 记录上次送审快照，线程安全"""
+
+    def __init__(self, base=None):
+        self.base = base
+        self._lock = threading.Lock()
+        self.snapshots = load_state(STATE_NAME, {}, base) or {}
+        today = self._today()
+        for snap in self.snapshots.values(): snap.setdefault("day", today)  # 老状态没有日期：从今天开始计
+        self.counters = {}  # source -> {"gated": n, "passed": n}
+
+    def check(self, source, topic_id, row):
+        """返回 (是否放行, 变动描述)；不受闸门管控的来源直接放行"""
+        curr = snapshot(source, row)
+        if curr is None: return True, ""
+        with self._lock:
+            prev = self.snapshots.get(topic_id)
+            c = self.counters.setdefault(source, {"gated": 0, "passed": 0})
+            if prev is None:
+                c["passed"] += 1
+                return True, ""
+            prev["day"] = self._today()
+            material, delta = material_delta(source, prev, curr)
+            c["passed" if material else "gated"] += 1
+            return material, delta
+
+    def commit(self, source, topic_id, row):
+        """审计成功后记录新快照"""
+        curr = snapshot(source, row)
+        if curr is None: return
+        curr["day"] = self._today()
+        with self._lock: self.snapshots[topic_id] = curr
+
+    def report(self):
+        return ", ".join(f"{s}: 放行 {c['passed']} / 拦截 {c['gated']}" for s, c in self.counters.items()) or "无受控信号"
+
+    @staticmethod
+    def _today():
+        return datetime.now().strftime('%Y%m%d')
+
+    def save(self):
+        cutoff = (datetime.now() - timedelta(days=KEEP_DAYS)).strftime('%Y%m%d')
+        with self._lock:
+            self.snapshots = {k: v for k, v in self.snapshots.items() if v.get("day", "") >= cutoff}
+            data = dict(self.snapshots)
+        return save_state(STATE_NAME, data, self.base)
@@ -0,0 +1,141 @@
+import io, json, os
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+import pyarrow.parquet as pq
+import requests
+
+# ==========================================
+# 🧱 列式入库通道：processor 直接填 Arrow 列，整批 CSV 写库 / 整表 Parquet 归档
+# ==========================================
+# process_batches() 按批产出 Arrow 表，refinery 边产出边写库，内存里只留一批。
+# 每个源一份 schema；raw_json 这类嵌套对象存成 JSON 文本，
+# 标量列表（strategy_tags / outcomes / outcome_probs）用 Arrow list 列，写库时转成 Postgres 数组字面量。
+# 没有 process_batches() 的 processor 走 from_rows() 适配器，老的 list-of-dict 路径保持可用。
+
+COLUMNAR_ENABLED = os.environ.get("REFINERY_COLUMNAR", "true").lower() == "true"
+BULK_ROWS = int(os.environ.get("REFINERY_BULK_ROWS", 5000))
+
+def schema(fields):
+    return pa.schema([pa.field(name, typ) for name, typ in fields])
+
+# json.dumps 带参数时每次都会新建 encoder；逐行调用用这个预建好的
+dumps = json.JSONEncoder(ensure_ascii=False).encode
+
+def to_json(val):
+    """嵌套值 -> JSON 文本（字符串原样保留，与 dict 路径写库的结果一致）"""
+    if val is None or isinstance(val, str): return val
+    return dumps(val)
+
+def batched(items, size=None):
+    """按批切分输入：processor 每批填完就 flush()，内存里最多只有一批的 Python 对象"""
+    size = size or BULK_ROWS
+    for i in range(0, len(items), size): yield items[i:i + size]
+
+class ColumnBuilder:
+    """按 schema 逐列追加：appenders() 返回每列的 list.append，循环里不再构造 dict"""
+
+    def __init__(self, schema):
+        self.schema = schema
+        self.columns = [[] for _ in schema]
+
+    def appenders(self):
+        return [col.append for col in self.columns]
+
+    def __len__(self):
+        return len(self.columns[0]) if self.columns else 0
+
+    def flush(self):
+        """把已追加的行转成 pa.Table 并原地清空（appenders 依然有效）"""
+        arrays = []
+        for field, col in zip(self.schema, self.columns):
+            try: arrays.append(pa.array(col, type=field.type))
+            except (pa.ArrowInvalid, pa.ArrowTypeError, TypeError, OverflowError):
+                # 脏数据（如 "1,234"）不丢行：整列降级成文本，交给数据库按列类型转换
+                arrays.append(pa.array([None if v is None else str(v) for v in col], type=pa.string()))
+            col.clear()
+        return pa.Table.from_arrays(arrays, names=self.schema.names)
+
+def concat(batches):
+    """多批合成一张表；某批因脏数据降级成文本的列，其余批同列也转成文本"""
+    batches = [b for b in batches if b.num_rows]
+    if not batches: return pa.table({})
+    fields = {}
+    for b in batches:
+        for f in b.schema:
+            if fields.setdefault(f.name, f.type) != f.type: fields[f.name] = pa.string()
+    target = pa.schema([pa.field(n, t) for n, t in fields.items()])
+    return pa.concat_tables([b.cast(target) if b.schema != target else b for b in batches])
+
+def from_rows(rows):
+    """dict 路径的适配器：嵌套值转 JSON 文本后按列建表"""
+    if not rows: return pa.table({})
+    names = list(dict.fromkeys(k for r in rows for k in r))
+    cols = {}
+    for name in names:
+        col = [r.get(name) for r in rows]
+        if any(isinstance(v, (dict, list)) for v in col): col = [to_json(v) for v in col]
+        try: cols[name] = pa.array(col)
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            cols[name] = pa.array([None if v is None else str(v) for v in col], type=pa.string())
+    return pa.table(cols)
+
+def to_rows(table):
+    """列式 -> list-of-dict（给只认 dict 的老调用方）"""
+    return table.to_pylist()
+
+def with_constant(table, name, value):
+    """追加一列常量（如 signal_type），已有同名列则覆盖"""
+    col = pa.array([value] * table.num_rows, type=pa.string())
+    if name in table.column_names: return table.set_column(table.column_names.index(name), name, col)
+    return table.append_column(name, col)
+
+def _pg_array(chunk):
+    """list 列 -> Postgres 数组字面量 {"a","b"}（元素加引号并转义 \\ 和 "），整列向量化"""
+    values = pc.list_flatten(chunk).cast(pa.string())
+    values = pc.replace_substring(pc.replace_substring(values, "\\", "\\\\"), '"', '\\"')
+    quoted = pc.binary_join_element_wise('"', values, '"', "")
+    # 切片后的 offsets 不从 0 开始：对齐到 list_flatten 的结果
+    offsets = pc.subtract(chunk.offsets, chunk.offsets[0])
+    joined = pc.binary_join(pa.ListArray.from_arrays(offsets, quoted), ",")
+    literal = pc.binary_join_element_wise("{", joined, "}", "")
+    return pc.if_else(chunk.is_null(), pa.scalar(None, pa.string()), literal)
+
+def to_csv(table):
+    """PostgREST 批量 CSV：首行列名，有效值一律加引号，未加引号的 NULL 表示空值"""
+    for k, field in enumerate(table.schema):
+        if pa.types.is_list(field.type):
+            col = pa.chunked_array([_pg_array(c) for c in table.column(k).chunks], type=pa.string())
+            table = table.set_column(k, field.name, col)
+    buf = io.BytesIO()
+    pacsv.write_csv(table, buf, pacsv.WriteOptions(null_string="NULL", quoting_style="all_valid"))
+    return buf.getvalue()
+
+def _rest(url, key, table_name):
+    return f"{url.rstrip('/')}/rest/v1/{table_name}", {"apikey": key, "Authorization": f"Bearer {key}"}
+
+def insert_table(url, key, table_name, table, batch_rows=None):
+    """整批写库：每 batch_rows 行一个 POST（一条 INSERT），不经过逐行 dict / JSON"""
+    endpoint, headers = _rest(url, key, table_name)
+    headers.update({"Content-Type": "text/csv", "Prefer": "return=minimal"})
+    step = batch_rows or BULK_ROWS
+    for i in range(0, table.num_rows, step):
+        res = requests.post(endpoint, data=to_csv(table.slice(i, step)), headers=headers, timeout=120)
+        if res.status_code >= 300: raise RuntimeError(f"bulk insert {table_name} {res.status_code}: {res.text[:200]}")
+    return table.num_rows
+
+def fetch_table(url, key, table_name, params):
+    """按 PostgREST 过滤条件整表拉取为 Arrow（Accept: text/csv），嵌套列保持 JSON 文本"""
+    endpoint, headers = _rest(url, key, table_name)
+    headers["Accept"] = "text/csv"
+    res = requests.get(endpoint, params={"select": "*", **params}, headers=headers, timeout=300)
+    if res.status_code >= 300: raise RuntimeError(f"fetch {table_name} {res.status_code}: {res.text[:200]}")
+    if not res.content.strip(): return pa.table({})
+    # PostgREST 导出 CSV 时 NULL 是空字段
+    return pacsv.read_csv(io.BytesIO(res.content), parse_options=pacsv.ParseOptions(newlines_in_values=True),
+                          convert_options=pacsv.ConvertOptions(strings_can_be_null=True))
+
+def to_parquet(table):
+    buf = io.BytesIO()
+    pq.write_table(table, buf, compression='snappy')
+    return buf.getvalue()
@@ -0,0 +1,169 @@
+import argparse, hashlib, hmac, json, os, signal, sys, threading, time
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import telemetry
+import cassette
+from state_store import load_state, save_state
+
+# 📼 录制 / 回放要赶在建客户端之前装上
+cassette.install("daemon")
+
+import pipeline
+
+# ==========================================
+# 🫀 常驻模式：一个进程长期运行，客户端 / processor 注册表 / 哨兵缓存 / 大师当日记忆一直是热的
+# ==========================================
+# python daemon.py                               # 每 60s 看一次银行；战报 / 收割每小时、工厂每 2 小时
+# python daemon.py --stages sync,report          # 不跑工厂 / 收割
+# 每轮交给 pipeline.run：输入没变的阶段照样靠指纹跳过，空转的轮询只花取指纹的几次请求。
+# 有新提交时 sync 只看上次巡检之后（往前留一段重叠）的提交，已登记过的文件走进程内哨兵缓存，不再查库。
+# DAEMON_PORT 非 0 时开本地 HTTP 端点：POST /notify（银行的 push webhook）立即唤醒一轮 sync，GET /health 返回状态。
+# SIGTERM / SIGINT：跑完当前这一轮再退出，退出前落盘 processor 状态、节拍表和遥测。
+
+POLL_SECONDS = float(os.environ.get("DAEMON_POLL_SECONDS", 60))
+CADENCES = {  # 阶段 -> 最短间隔（秒），0 = 不跑
+    "sync": POLL_SECONDS,
+    "report": float(os.environ.get("DAEMON_REPORT_SECONDS", 3600)),
+    "harvest": float(os.environ.get("DAEMON_HARVEST_SECONDS", 3600)),
+    "factory": float(os.environ.get("DAEMON_FACTORY_SECONDS", 7200)),
+}
+SYNC_OVERLAP = timedelta(minutes=float(os.environ.get("DAEMON_SYNC_OVERLAP_MINUTES", 60)))  # 提交时间与推送时间可能有差
+HOST = os.environ.get("DAEMON_HOST", "127.0.0.1")
+PORT = int(os.environ.get("DAEMON_PORT", 0))
+SECRET = os.environ.get("DAEMON_SECRET", "")
+STATE_NAME = "daemon_state.json"
+
+class Daemon:
+    def __init__(self, stages, sources=None):
+        self.stages = [n for n in pipeline.STAGES if n in stages and CADENCES.get(n)]
+        self.ctx = pipeline.Context(sources)
+        self.state = load_state(STATE_NAME, {}, base=pipeline.PIPELINE_STATE_DIR) or {}
+        self.last = self.state.setdefault("last", {})  # 阶段 -> 上次触发时间（epoch），重启后沿用节拍
+        self.status = {}
+        self.wake, self.stop = threading.Event(), threading.Event()
+        self.notified = False
+        self.started = time.time()
+        self.server = None
+
+    def due(self):
+        now = time.time()
+        due = [n for n in self.stages if now - self.last.get(n, 0) >= CADENCES[n]]
+        if self.notified and "sync" in self.stages and "sync" not in due: due.insert(0, "sync")
+        return [n for n in pipeline.STAGES if n in due]
+
+    def next_wait(self):
+        now = time.time()
+        return max(1.0, min([self.last.get(n, 0) + CADENCES[n] - now for n in self.stages] or [POLL_SECONDS]))
+
+    def tick(self):
+        due = self.due()
+        if not due: return {}
+        self.notified = False
+        t0 = time.time()
+        synced = self.state.get("synced_at")
+        self.ctx.since = datetime.fromtimestamp(synced, timezone.utc) - SYNC_OVERLAP if synced else None
+        status = pipeline.run(due, self.ctx, quiet=True)
+        # blocked 的阶段下一轮就重试，其余按节拍等
+        for n, st in status.items():
+            if st != "blocked": self.last[n] = t0
+        if status.get("sync") in ("ok", "skipped"): self.state["synced_at"] = t0
+        self.status.update(status)
+        self.checkpoint()
+        if any(st != "skipped" for st in status.values()): telemetry.emit()
+        return status
+
+    def checkpoint(self):
+        self.state["updated"] = datetime.now(pipeline.BJ).isoformat(timespec='seconds')
+        save_state(STATE_NAME, self.state, base=pipeline.PIPELINE_STATE_DIR)
+
+    def notify(self):
+        self.notified = True
+        self.wake.set()
+
+    def request_stop(self, *_):
+        self.stop.set()
+        self.wake.set()
+
+    def health(self):
+        return {"up_s": round(time.time() - self.started), "stages": self.stages, "status": self.status,
+                "last": self.last, "synced_at": self.state.get("synced_at")}
+
+    def run_forever(self, once=False):
+        signal.signal(signal.SIGTERM, self.request_stop)
+        signal.signal(signal.SIGINT, self.request_stop)
+        if PORT and not once: self.server = serve(self)
+        telemetry.start("daemon")
+        print(f"🫀 常驻模式启动：{', '.join(f'{n}/{int(CADENCES[n])}s' for n in self.stages)}")
+        try:
+            while not self.stop.is_set():
+                try: self.tick()
+                except Exception as e:
+                    telemetry.error(e)
+                    print(f"❌ 本轮异常（下一轮继续）: {e}")
+                if once: break
+                self.wake.wait(self.next_wait())
+                self.wake.clear()
+        finally:
+            self.shutdown()
+
+    def shutdown(self):
+        print("🛑 常驻进程退出：落盘状态...")
+        if self.server: self.server.shutdown()
+        self.ctx.persist()
+        self.checkpoint()
+        telemetry.emit()
+        cassette.close()
+
+# === 📮 本地 HTTP 端点 ===
+class _Handler(BaseHTTPRequestHandler):
+    def _reply(self, code, data):
+        body = json.dumps(data, ensure_ascii=False).encode('utf-8')
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _authorized(self, body):
+        if not SECRET: return True
+        if hmac.compare_digest(self.headers.get("X-Daemon-Token", ""), SECRET): return True
+        # GitHub webhook：X-Hub-Signature-256 = sha256=HMAC(secret, body)
+        sig = "sha256=" + hmac.new(SECRET.encode(), body, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(self.headers.get("X-Hub-Signature-256", ""), sig)
+
+    def do_GET(self):
+        if self.path.split("?")[0] == "/health": self._reply(200, self.server.owner.health())
+        else: self._reply(404, {"error": "not found"})
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        if self.path.split("?")[0] != "/notify": return self._reply(404, {"error": "not found"})
+        if not self._authorized(body): return self._reply(401, {"error": "unauthorized"})
+        self.server.owner.notify()
+        self._reply(202, {"queued": "sync"})
+
+    def log_message(self, *args): pass
+
+def serve(owner):
+    server = ThreadingHTTPServer((HOST, PORT), _Handler)
+    server.daemon_threads = True
+    server.owner = owner
+    threading.Thread(target=server.serve_forever, name="daemon-http", daemon=True).start()
+    print(f"📮 通知端点：http://{HOST}:{server.server_address[1]}/notify")
+    return server
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="常驻模式：热客户端 + 轮询银行，按节拍触发 report / harvest / factory")
+    ap.add_argument("--stages", default=",".join(pipeline.STAGES), help="逗号分隔，要常驻调度的阶段")
+    ap.add_argument("--sources", help="逗号分隔，只处理这些源，默认全部")
+    ap.add_argument("--once", action="store_true", help="只跑一轮（调试用）")
+    args = ap.parse_args(argv)
+    stages = {s.strip() for s in args.stages.split(",") if s.strip()}
+    unknown = stages - set(pipeline.STAGES)
+    if unknown: sys.exit(f"❌ 未知阶段: {', '.join(sorted(unknown))}")
+    sources = {s.strip() for s in args.sources.split(",") if s.strip()} if args.sources else None
+    Daemon(stages, sources).run_forever(once=args.once)
+
+if __name__ == "__main__":
+    main()
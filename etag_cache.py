@@ -0,0 +1,219 @@
+import atexit, base64, hashlib, os, threading, time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+import telemetry
+from state_store import load_state, save_state
+
+# 只在 install() 真正打补丁时才导入
+requests = None
+
+# ==========================================
+# 🏷️ GitHub 条件请求缓存：按 URL 记住 ETag / Last-Modified，下次带 If-None-Match，304 从本地取正文
+# ==========================================
+# 每小时为拿 sha 的 get_contents(report_path)、增量 sync 反复展开的同一批提交、全量扫描反复列的同一批目录，
+# 内容没变时 GitHub 回 304 —— 带认证的 304 不扣 rate limit，正文也不用再传一遍。
+# 在传输层打补丁（requests 的 HTTPAdapter.send，PyGithub 就走这里），只拦 GITHUB_CACHE_HOSTS 上的 GET，调用方代码不用改。
+# 键 = URL（查询串排序）+ Accept + 凭据指纹（GitHub 按 Accept / Authorization 给不同的表示与 ETag；凭据本身不落盘）。
+# 只缓存列表 / 元数据（目录列表、提交、树、仓库信息）：单个文件的正文（/contents/ 下的文件对象、raw、git blob）
+# 每个 sha 只会被 sync / backfill 取一次，存下来只占地方，直接放行。
+# 内存与落盘都是 LRU：条数超过 GITHUB_CACHE_MAX_ENTRIES 或正文总量超过 GITHUB_CACHE_MAX_MB 淘汰最久没用的；
+# 单个正文超过 GITHUB_CACHE_MAX_BODY_KB 不缓存。
+# 落盘时先读回盘上的版本再合并本进程碰过的条目（backfill 多个进程各自落盘，互不覆盖）。
+# 每轮结束 report()：条件请求命中率 + 剩余额度（X-RateLimit-*），打印并返回给 pipeline 记进运行记录。
+
+ENABLED = os.environ.get("GITHUB_CACHE_ENABLED", "true").lower() == "true"
+HOSTS = {h.strip() for h in os.environ.get("GITHUB_CACHE_HOSTS", "api.github.com").split(",") if h.strip()}
+MAX_ENTRIES = int(os.environ.get("GITHUB_CACHE_MAX_ENTRIES", 5000))
+MAX_BODY = int(os.environ.get("GITHUB_CACHE_MAX_BODY_KB", 256)) * 1024
+MAX_BYTES = int(float(os.environ.get("GITHUB_CACHE_MAX_MB", 16)) * 1024 * 1024)
+STATE_NAME = "github_etag_cache.json.gz"
+VERSION = 1
+
+# 正文存的是解码后的字节，这几个头留着会让客户端再解一次 / 校验长度
+_DROP_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "set-cookie"}
+_CONDITIONAL = ("If-None-Match", "If-Modified-Since")
+
+_lock = threading.Lock()
+_state = {"installed": False, "closed": False, "entries": None, "bytes": 0, "dirty": set()}
+_run = {}  # 本轮（上次 report 以来）的计数
+_rate = {}  # resource -> {"limit", "remaining", "reset"}，取最新一次响应头
+_orig = {}
+
+def _reset_run():
+    _run.update(requests=0, conditional=0, hits=0, stored=0, bytes_saved=0)
+
+_reset_run()
+
+def _size(entry):
+    return len(entry.get("body") or entry.get("body_b64") or "")
+
+def _prune(entries):
+    """按最近使用裁到 MAX_ENTRIES 条 / MAX_BYTES 字节（entries 已按 used 从旧到新排好），返回剩余字节数"""
+    total = sum(_size(e) for e in entries.values())
+    while entries and (len(entries) > MAX_ENTRIES or total > MAX_BYTES):
+        _, e = entries.popitem(last=False)
+        total -= _size(e)
+    return total
+
+def _entries():
+    """调用方持有 _lock"""
+    if _state["entries"] is None:
+        state = load_state(STATE_NAME, None)
+        raw = state["entries"] if state and state.get("version") == VERSION else {}
+        entries = OrderedDict(sorted(raw.items(), key=lambda kv: kv[1].get("used", 0)))
+        _state["bytes"] = _prune(entries)
+        _state["entries"] = entries
+    return _state["entries"]
+
+def _touch(key, entry):
+    """调用方持有 _lock：放进 / 挪到 LRU 末尾，超出预算时淘汰最旧的"""
+    entries = _entries()
+    old = entries.pop(key, None)
+    if old is not None: _state["bytes"] -= _size(old)
+    entry["used"] = time.time()
+    entries[key] = entry
+    _state["bytes"] += _size(entry)
+    _state["dirty"].add(key)
+    while len(entries) > MAX_ENTRIES or _state["bytes"] > MAX_BYTES:
+        k, e = entries.popitem(last=False)
+        _state["bytes"] -= _size(e)
+        _state["dirty"].discard(k)
+
+def _is_blob(request, content=None):
+    """单个文件的正文：raw 媒体类型、git blob、contents API 的文件对象（带扩展名的路径；看到正文时：目录列表是 JSON 数组）"""
+    path = urlsplit(request.url).path
+    if "/git/blobs/" in path or "raw" in (request.headers.get("Accept") or ""): return True
+    if "/contents/" not in path: return False
+    if "." in path.rsplit("/", 1)[-1]: return True
+    return content is not None and content.lstrip()[:1] == b"{"
+
+def _key(request):
+    parts = urlsplit(request.url)
+    query = urlencode(sorted(parse_qsl(parts.query, keep_blank_values=True)))
+    auth = hashlib.sha1((request.headers.get("Authorization") or "").encode('utf-8')).hexdigest()[:12]
+    return f"{parts.netloc}{parts.path}?{query}|{request.headers.get('Accept', '')}|{auth}"
+
+def _cacheable(request, stream):
+    if stream or request.method != "GET": return False
+    if urlsplit(request.url).hostname not in HOSTS or _is_blob(request): return False
+    return not any(h in request.headers for h in _CONDITIONAL)  # 调用方自己在做条件请求（PyGithub 的 update()）
+
+def _track_rate(headers):
+    remaining = headers.get("X-RateLimit-Remaining")
+    if remaining is None: return
+    try:
+        info = {"limit": int(headers.get("X-RateLimit-Limit") or 0), "remaining": int(remaining),
+                "reset": int(headers.get("X-RateLimit-Reset") or 0)}
+    except ValueError: return
+    with _lock: _rate[headers.get("X-RateLimit-Resource") or "core"] = info
+
+def _store(key, request, res):
+    etag, modified = res.headers.get("ETag"), res.headers.get("Last-Modified")
+    if res.status_code != 200 or not (etag or modified): return
+    if "no-store" in (res.headers.get("Cache-Control") or ""): return
+    content = res.content
+    if len(content) > MAX_BODY or _is_blob(request, content): return
+    entry = {"etag": etag, "modified": modified, "reason": res.reason,
+             "headers": {k: v for k, v in res.headers.items() if k.lower() not in _DROP_HEADERS}}
+    try: entry["body"] = content.decode('utf-8')
+    except UnicodeDecodeError: entry["body_b64"] = base64.b64encode(content).decode('ascii')
+    with _lock:
+        _touch(key, entry)
+        _run["stored"] += 1
+
+def _from_entry(entry, res):
+    """304 -> 照缓存的正文拼回一个 200；响应头用缓存的，再叠上 304 带回来的新鲜头（额度 / 日期 / ETag）"""
+    content = base64.b64decode(entry["body_b64"]) if "body_b64" in entry else entry.get("body", "").encode('utf-8')
+    hit = requests.Response()
+    hit.status_code, hit.reason = 200, entry.get("reason") or "OK"
+    hit.headers = requests.structures.CaseInsensitiveDict(entry["headers"])
+    hit.headers.update({k: v for k, v in res.headers.items() if k.lower() not in _DROP_HEADERS})
+    hit.encoding = requests.utils.get_encoding_from_headers(hit.headers)
+    hit.url, hit.request, hit.connection, hit.elapsed = res.url, res.request, res.connection, res.elapsed
+    hit._content, hit._content_consumed = content, True
+    return hit, len(content)
+
+def _send(self, request, stream=False, **kwargs):
+    send = _orig["requests"]
+    if not _cacheable(request, stream):
+        res = send(self, request, stream=stream, **kwargs)
+        if urlsplit(request.url).hostname in HOSTS: _track_rate(res.headers)
+        return res
+    key = _key(request)
+    with _lock:
+        entry = _entries().get(key)
+        _run["requests"] += 1
+    telemetry.count("github_requests")
+    if entry:
+        if entry.get("etag"): request.headers["If-None-Match"] = entry["etag"]
+        if entry.get("modified"): request.headers["If-Modified-Since"] = entry["modified"]
+    res = send(self, request, stream=stream, **kwargs)
+    _track_rate(res.headers)
+    if entry:
+        with _lock: _run["conditional"] += 1
+    if res.status_code == 304:
+        if not entry:
+            # 没发条件头却拿到 304（回放磁带 / 中途被淘汰）：去掉条件头重取一次
+            for h in _CONDITIONAL: request.headers.pop(h, None)
+            return send(self, request, stream=stream, **kwargs)
+        hit, size = _from_entry(entry, res)
+        with _lock:
+            _touch(key, entry)
+            _run["hits"] += 1
+            _run["bytes_saved"] += size
+        telemetry.count("github_304")
+        return hit
+    _store(key, request, res)
+    return res
+
+# ---------- 入口 ----------
+def install():
+    """给 requests 的传输层打补丁；在创建 GitHub 客户端之前调用（refinery.repo() 里），重复调用是空操作"""
+    global requests
+    if not ENABLED or _state["installed"]: return False
+    import requests
+    HTTPAdapter = requests.adapters.HTTPAdapter
+    _orig["requests"] = HTTPAdapter.send  # 📼 磁带已装上时包在它外面：录到的是条件请求与 304
+    HTTPAdapter.send = _send
+    _state["installed"] = True
+    atexit.register(close)
+    return True
+
+def save():
+    """把本进程碰过的条目合并进盘上的版本，按最近使用裁到 MAX_ENTRIES / MAX_BYTES"""
+    with _lock:
+        if not _state["dirty"]: return None
+        mine = {k: _state["entries"][k] for k in _state["dirty"] if k in _state["entries"]}
+        _state["dirty"] = set()
+    disk = load_state(STATE_NAME, None)
+    merged = disk["entries"] if disk and disk.get("version") == VERSION else {}
+    merged.update(mine)
+    merged = OrderedDict(sorted(merged.items(), key=lambda kv: kv[1].get("used", 0)))
+    _prune(merged)
+    try: return save_state(STATE_NAME, {"version": VERSION, "entries": merged, "rate": dict(_rate)})
+    except OSError as e: print(f"⚠️ GitHub 条件请求缓存落盘失败: {e}")
+
+def report(quiet=False):
+    """本轮（上次 report 以来）的命中率与剩余额度；顺带落盘。没发过 GitHub 请求时返回 None"""
+    if not _state["installed"]: return None
+    with _lock:
+        run, rate = dict(_run), {k: dict(v) for k, v in _rate.items()}
+        _reset_run()
+    save()
+    if not run["requests"]: return None
+    run["hit_rate"] = round(run["hits"] / run["requests"], 3)
+    core = rate.get("core")
+    if core: run["rate"] = dict(core, reset_at=datetime.fromtimestamp(core["reset"], timezone.utc).isoformat(timespec='seconds'))
+    if not quiet:
+        budget = f"剩余额度 {core['remaining']}/{core['limit']}（{run['rate']['reset_at']} 重置）" if core else "剩余额度未知"
+        print(f"🏷️ GitHub 条件请求：{run['hits']}/{run['requests']} 命中 304（{run['hit_rate']:.0%}），"
+              f"省下 {run['bytes_saved'] / 1024:.1f} KB；{budget}")
+    return run
+
+def close():
+    """进程退出前最后一次 report + 落盘。可重复调用"""
+    if not _state["installed"] or _state["closed"]: return None
+    _state["closed"] = True
+    return report()
@@ -1,23 +1,55 @@
 import pandas as pd
-import hashlib, json, os, requests, subprocess, time, sys
+import hashlib, json, os, requests, subprocess, time, sys, threading
 from pathlib import Path
 from datetime import datetime, timezone, timedelta
 from concurrent.futures import ThreadPoolExecutor
-from supabase import create_client
 import importlib.util
+from vault_journal import VaultJournal
+from teachings_store import TeachingsStore, TeachingsReader, jsonl_export_enabled
+from near_dup import NearDupIndex
+from change_gate import ChangeGate
+from market_series import MarketSeries, market_key, momentum_boost
+from star_series import StarSeries
+from triage import Triage, CASCADE_ENABLED
+import telemetry
+import cassette
+import storage
+import scoring
+
+# 🏷️ Twitter / Reddit / Polymarket 的分数入库时已写进 rank_score（各 processor 的 rank()，VIP 名单也在那边）：
+# 服务端按分数取前 N x POOL 条，取回后只做时间相关的部分（新鲜度衰减、盘口动量）
+RANK_WINDOW_HOURS = float(os.environ.get("FACTORY_RANK_WINDOW_HOURS", 24))
+RANK_HALF_LIFE_HOURS = float(os.environ.get("FACTORY_RANK_HALF_LIFE_HOURS", 12))
+RANK_POOL = int(os.environ.get("FACTORY_RANK_POOL", 3))  # 超取倍数：去重 / 衰减后还能凑满 N
 
 class UniversalFactory:
-    def __init__(self, masters_path="masters"):
+    def __init__(self, masters_path="masters", db=None):
         self.masters_path = Path(masters_path)
+        self.db = db  # 可注入的数据库客户端（基准测试 / 本地运行），缺省时按环境变量连 Supabase
         self.masters = self._load_masters()
+        self.routes = self._build_routes()
+        self.route_stats = {name: {"called": 0, "skipped": 0} for name in self.masters}
+        self._stats_lock = threading.Lock()
+        self.stream = os.environ.get("FACTORY_STREAM") == "true"
+        self.llm_stats = {}  # tag(大师名/模型) -> [(ttft, total, tokens, stopped)]
         self.api_key = os.environ.get("SILICON_FLOW_KEY") 
         self.api_url = "https://api.siliconflow.cn/v1/chat/completions"
+        # 连接复用：审计线程池 20 并发，连接池同样大小（TLS 握手只做一次）
+        self.http = requests.Session()
+        self.http.mount("https://", requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=20))
         self.supabase_url = os.environ.get("SUPABASE_URL")
         self.supabase_key = os.environ.get("SUPABASE_KEY")
         self.v3_model = "deepseek-ai/DeepSeek-V3.2"
         self.vault_path = None
+        self.journal = None
+        self.near_dup = None
+        self.change_gate = None
+        self.fetch_failed = False  # fetch_elite_signals 吞掉的异常：与"确实没有新信号"区分开
+        self._span = None  # process_and_ship 的 span，线程池里的审计 / LLM 调用挂在它下面
         self.memory = {} 
+        self._day_ids = None  # (day_str, ids)：常驻进程里当天只从磁盘建一次，之后随审计增量维护
 
+    @telemetry.timed("load_masters")
     def _load_masters(self):
         masters = {}
         if not self.masters_path.exists(): return masters
@@ -30,43 +62,110 @@ class UniversalFactory:
                 spec.loader.exec_module(module)
                 if hasattr(module, 'audit'): masters[name] = module
                 print(f"✅ 已加载 Master: {name}")
-            except: pass
+            except Exception as e:
+                telemetry.error(e)
+                print(f"⚠️ Master {file_path.name} 加载失败: {e}")
         return masters
 
+    def _build_routes(self):
+        """🧭 路由索引：大师可选声明 SOURCES / CATEGORIES / TAGS / accepts(row)，未声明的照旧全量接收"""
+        routes = {"*": []}
+        for name, mod in self.masters.items():
+            sources = getattr(mod, 'SOURCES', None)
+            if not sources:
+                routes["*"].append(name)
+                continue
+            for src in sources: routes.setdefault(str(src).lower(), []).append(name)
+        declared = len(self.masters) - len(routes["*"])
+        if declared: print(f"🧭 路由索引：{declared} 位大师声明了来源，{len(routes['*'])} 位全量接收")
+        return routes
+
+    def route_masters(self, row, source):
+        """只返回愿意接收该信号的大师（保持加载顺序）；CATEGORIES / TAGS 只在信号带有该字段时生效"""
+        candidates = set(self.routes.get(source, [])) | set(self.routes["*"])
+        category = str(row.get('category') or '').upper()
+        tags = set()
+        for key in ('strategy_tags', 'topics', 'strategies'):
+            val = row.get(key)
+            if isinstance(val, str):
+                try: val = json.loads(val)
+                except: val = [val]
+            if isinstance(val, list): tags.update(str(t).upper() for t in val)
+
+        picked = []
+        for name, mod in self.masters.items():
+            if name not in candidates: continue
+            cats = getattr(mod, 'CATEGORIES', None)
+            if cats and category and category not in {str(c).upper() for c in cats}: continue
+            wanted = getattr(mod, 'TAGS', None)
+            if wanted and tags and not tags & {str(t).upper() for t in wanted}: continue
+            accepts = getattr(mod, 'accepts', None)
+            if callable(accepts):
+                try:
+                    if not accepts(row): continue
+                except: continue
+            picked.append(name)
+
+        with self._stats_lock:
+            for name in self.masters:
+                self.route_stats[name]["called" if name in picked else "skipped"] += 1
+        return picked
+
+    def route_report(self):
+        skipped = sum(v["skipped"] for v in self.route_stats.values())
+        detail = ", ".join(f"{n}: -{v['skipped']}" for n, v in self.route_stats.items() if v["skipped"])
+        return f"避免 {skipped} 次大师调用" + (f" ({detail})" if detail else "")
+
     def build_day_memory(self, vault_path):
         """🧠 跨时区记忆同步：锁定今日已审计的哈希，省钱核心"""
         day_str = datetime.now().strftime('%Y%m%d')
+        if self._day_ids and self._day_ids[0] == day_str: return self._day_ids[1]
         instructions_dir = vault_path / "instructions"
         if not instructions_dir.exists(): return set()
         
         day_processed_ids = set()
+        self.memory = {}
         print(f"🧐 正在加载今日全天（2小时步进）记忆...")
+
+        def remember(data): self.remember(data, day_processed_ids)
+
+        # 1. 压缩分段（新格式）
+        try:
+            for data in TeachingsReader(instructions_dir).iter_records(day_str): remember(data)
+        except Exception as e: print(f"⚠️ 压缩分段读取失败: {e}")
+
+        # 2. 纯 JSONL（旧格式 / 导出开关）
         for f in instructions_dir.glob(f"teachings_{day_str}_*.jsonl"):
             try:
                 with open(f, 'r', encoding='utf-8') as f_in:
                     for line in f_in:
-                        try:
-                            data = json.loads(line)
-                            tid, m, rid = data.get('topic_id'), data.get('master'), data.get('ref_id')
-                            if tid and m:
-                                if tid not in self.memory: self.memory[tid] = {}
-                                self.memory[tid][m] = data.get('output', "")
-                            if rid: day_processed_ids.add(rid)
+                        try: remember(json.loads(line))
                         except: continue
             except: pass
         print(f"✅ 记忆构建：锁定 {len(day_processed_ids)} 个历史哈希")
+        self._day_ids = (day_str, day_processed_ids)
         return day_processed_ids
 
+    def remember(self, data, processed_ids):
+        tid, m, rid = data.get('topic_id'), data.get('master'), data.get('ref_id')
+        if tid and m:
+            if tid not in self.memory: self.memory[tid] = {}
+            self.memory[tid][m] = data.get('output', "")
+        if rid: processed_ids.add(rid)
+
+    @telemetry.timed("fetch_elite_signals")
     def fetch_elite_signals(self):
         """🌟 严格保留你的原装权重 50/60/30/80"""
+        self.fetch_failed = False
         try:
-            supabase = create_client(self.supabase_url, self.supabase_key)
+            supabase = self.db or storage.connect(url=self.supabase_url, key=self.supabase_key)
             print("💎 启动 2 小时一度精锐筛选...")
 
             # === 1. GitHub 信号独立处理 (保底 20 条) ===
             print("💎 正在获取 GitHub 信号...")
             # 这里的 limit 改成了 100，多抓点更保险
             github_raw = supabase.table("raw_signals").select("*").eq("signal_type", "github").order("created_at", desc=True).limit(100).execute().data or []
+            telemetry.count("api_calls"); telemetry.count("rows.github", len(github_raw))
             
             unique_github = {}
             for r in github_raw:
@@ -75,13 +174,19 @@ class UniversalFactory:
                 if name and name not in unique_github:
                     unique_github[name] = r
             
-            github_picks = list(unique_github.values())[:20]  # 稳拿 20 条
+            # ⭐ refinery 维护的星数时序：按星速排（稳定排序，没有历史的 repo 保持按入库时间的先后）
+            candidates = list(unique_github.values())
+            vel, _ = StarSeries().velocity(list(unique_github))
+            vel = [v if v == v else float('-inf') for v in vel]
+            order = sorted(range(len(candidates)), key=vel.__getitem__, reverse=True)
+            github_picks = [candidates[k] for k in order][:20]  # 稳拿 20 条
             print(f"✅ GitHub 独立处理完成：获 {len(github_picks)} 条")
 
             # === 2. Paper 信号独立处理 (保底 30 条) ===
             print("💎 正在获取 Paper 信号...")
             # 这里的 limit 也改成了 100
             paper_raw = supabase.table("raw_signals").select("*").eq("signal_type", "papers").order("created_at", desc=True).limit(100).execute().data or []
+            telemetry.count("api_calls"); telemetry.count("rows.papers", len(paper_raw))
             
             unique_paper = {}
             for r in paper_raw:
@@ -100,57 +205,59 @@ class UniversalFactory:
             paper_picks = list(unique_paper.values())[:30]  # 稳拿 30 条
             print(f"✅ Paper 独立处理完成：获 {len(paper_picks)} 条")
 
-            # === 3. Twitter (VIP 权重) - 保持原样 ===
+            since = (datetime.now(timezone.utc) - timedelta(hours=RANK_WINDOW_HOURS)).isoformat()
+            def ranked(source, n):
+                rows = supabase.table("raw_signals").select("*").eq("signal_type", source).gte("created_at", since) \
+                    .order("rank_score", desc=True, nullsfirst=False).limit(n * RANK_POOL).execute().data or []
+                telemetry.count("api_calls"); telemetry.count(f"rows.{source}", len(rows))
+                return rows
+
+            # === 3. Twitter (入库分数 x 新鲜度衰减，同一条推文的多次快照只留分数最高的) ===
             print("💎 正在获取 Twitter 信号...")
-            tw_raw = supabase.table("raw_signals").select("*").eq("signal_type", "twitter").order("created_at", desc=True).limit(500).execute().data or []
-            vip_list = ['Karpathy', 'Musk', 'Vitalik', 'LeCun', 'Dalio', 'Naval', 'Sama', 'PaulG']
-            def score_twitter(row):
-                rt, bm, like = row.get('retweets',0), row.get('bookmarks',0), row.get('likes',0)
-                user = str(row.get('user_name', '')).lower()
-                score = (rt * 5) + (bm * 10) + like
-                if any(v.lower() in user for v in vip_list):
-                    score += 10000 if (rt > 10 or like > 50) else 500
-                return score
-            for r in tw_raw: r['_rank'] = score_twitter(r)
-            tw_picks = sorted(tw_raw, key=lambda x:x['_rank'], reverse=True)[:60]
+            tw_raw = ranked("twitter", 60)
+            unique_tw = {r.get('url') or r.get('id'): r for r in reversed(tw_raw)}
+            tw_picks = sorted(scoring.decayed(list(unique_tw.values()), RANK_HALF_LIFE_HOURS), key=lambda x:x['_rank'], reverse=True)[:60]
             print(f"✅ Twitter 处理完成：获 {len(tw_picks)} 条")
 
-            # === 4. Reddit (Vibe 权重) - 保持原样 ===
+            # === 4. Reddit (入库分数 x 新鲜度衰减，按 url 去重) ===
             print("💎 正在获取 Reddit 信号...")
-            rd_raw = supabase.table("raw_signals").select("*").eq("signal_type", "reddit").order("created_at", desc=True).limit(500).execute().data or []
-            unique_rd = {r.get('url'): r for r in rd_raw if r.get('url')}
-            def score_reddit(row): return (row.get('score') or 0) * (1 + abs(float(row.get('vibe') or 0)))
-            rd_picks = sorted(unique_rd.values(), key=score_reddit, reverse=True)[:30]
+            rd_raw = ranked("reddit", 30)
+            unique_rd = {r.get('url'): r for r in reversed(rd_raw) if r.get('url')}  # 同一帖子留分数最高的快照
+            rd_picks = sorted(scoring.decayed(list(unique_rd.values()), RANK_HALF_LIFE_HOURS), key=lambda x:x['_rank'], reverse=True)[:30]
             print(f"✅ Reddit 处理完成：获 {len(rd_picks)} 条")
 
-            # === 5. Polymarket (Tail_Risk 权重) - 保持原样 ===
+            # === 5. Polymarket (入库分数 x 盘口动量，按 slug 去重) ===
             print("💎 正在获取 Polymarket 信号...")
-            poly_raw = supabase.table("raw_signals").select("*").eq("signal_type", "polymarket").order("created_at", desc=True).limit(800).execute().data or []
+            poly_raw = ranked("polymarket", 80)
             unique_poly = {}
             for p in poly_raw:
-                raw = p.get('raw_json')
-                if isinstance(raw, str):
-                    try: raw = json.loads(raw)
-                    except: raw = {}
-                p['_parsed'] = raw
-                slug = p.get('slug') or raw.get('slug')
+                # slug / strategy_tags / liquidity 都是入库时写好的列，raw_json 只给缺 slug 的老数据兜底
+                slug = p.get('slug')
+                if not slug:
+                    raw = p.get('raw_json')
+                    if isinstance(raw, str):
+                        try: raw = json.loads(raw)
+                        except: raw = {}
+                    slug = raw.get('slug') if isinstance(raw, dict) else None
                 if slug:
                     curr_liq = float(p.get('liquidity') or 0)
                     if slug not in unique_poly or curr_liq > float(unique_poly[slug].get('liquidity',0)):
                         unique_poly[slug] = p
-            def score_poly(row):
-                raw, liq = row['_parsed'], float(row.get('liquidity') or 0)
-                if 'TAIL_RISK' in raw.get('strategy_tags', []): return 10000000 + liq
-                if any(x in str(row.get('category','')).upper() for x in ['ECONOMY', 'TECH']): return 5000000 + liq
-                return 1000000 + liq
-            poly_picks = sorted(unique_poly.values(), key=score_poly, reverse=True)[:80]
+            # 📈 refinery 维护的盘口时序：Yes 概率跳动的 |z| 放大入库分数（与战报同一口径）
+            picks = list(unique_poly.values())
+            boosts = momentum_boost(MarketSeries().zscores([market_key(p) for p in picks]))
+            scores = [float(p.get('rank_score') or 0) * float(b) for p, b in zip(picks, boosts)]
+            poly_picks = [picks[k] for k in sorted(range(len(picks)), key=scores.__getitem__, reverse=True)[:80]]
             print(f"✅ Polymarket 处理完成：获 {len(poly_picks)} 条")
 
             return github_picks + paper_picks + tw_picks + rd_picks + poly_picks
         except Exception as e:
+            telemetry.error(e)
+            self.fetch_failed = True
             print(f"⚠️ 筛选异常: {e}"); return []
 
-    def audit_process(self, row, processed_ids):
+    def format_signal(self, row):
+        """统一信号格式：返回 (topic_id, source, content)，ref_id 就是 content 的哈希"""
         topic_id = row.get('url') or row.get('slug') or row.get('repo_name') or "unknown"
         source = row.get('signal_type', 'unknown').lower()
         
@@ -163,29 +270,89 @@ class UniversalFactory:
             parts.append(f"论文: {row.get('title')} | 期刊: {row.get('journal')}")
             parts.append(f"引用: {row.get('citations')} | 摘要: {row.get('full_text')}")
         elif source in ['twitter', 'reddit']:
-            parts.append(f"用户: {row.get('user_name') or row.get('subreddit')} | Score: {row.get('_rank',0)}")
+            # 只放入库时的静态分：衰减后的 _rank 每次运行都不同，会让 ref_id（内容哈希）跟着变、去重失效
+            parts.append(f"用户: {row.get('user_name') or row.get('subreddit')} | Score: {int(row.get('rank_score') or 0)}")
             parts.append(f"内容: {row.get('full_text') or row.get('title')}")
         else: # Polymarket
-            raw = row.get('_parsed') or row.get('raw_json') or {}
+            prices = row.get('prices') or " / ".join(
+                f"{n}: {p:.1f}%" for n, p in zip(row.get('outcomes') or [], row.get('outcome_probs') or []))
             parts.append(f"预测: {row.get('title')} | 问题: {row.get('question')}")
-            parts.append(f"价格: {row.get('prices') or raw.get('outcome_prices')} | 流动性: ${raw.get('liquidity')}")
+            parts.append(f"价格: {prices} | 流动性: ${row.get('liquidity')}")
+
+        return topic_id, source, "\n".join(parts)
+
+    @staticmethod
+    def signal_key(row, source):
+        """标识文本：不含分数 / 价格 / 星数这类会抖动的数字，近似去重跨 topic 时按其中的数字区分不同市场（行权价、日期、bps）"""
+        if source == 'polymarket': return f"{row.get('title')} {row.get('question')}"
+        return f"{row.get('title') or ''} {row.get('full_text') or ''}"
 
-        content = "\n".join(parts)
+    def triage_signals(self, signals, processed_ids, state_dir, day_str):
+        """🪜 级联模式：小模型批量初筛，只把过线 + 每源保底的信号交给 V3"""
+        items = []
+        for row in signals:
+            topic_id, source, content = self.format_signal(row)
+            ref_id = hashlib.sha256(content.encode()).hexdigest()
+            if ref_id not in processed_ids: items.append((row, ref_id, topic_id, source, content))
+        triage = Triage(self.call_ai, base=state_dir)
+        kept, log = triage.run(items)
+        log_path = state_dir / f"triage_{day_str}.jsonl"
+        log_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(log_path, 'a', encoding='utf-8') as f:
+            for entry in log: f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        self.journal.track(log_path.relative_to(self.vault_path))
+        self.journal.track(triage.save().relative_to(self.vault_path))
+        print(f"🪜 级联初筛：{triage.report(max(1, len(self.masters)))}")
+        return kept
+
+    def audit_process(self, row, processed_ids):
+        with telemetry.span("audit", parent=self._span) as sp:
+            results = self._audit_process(row, processed_ids)
+            sp.add("teachings", len(results))
+        return results
+
+    def _audit_process(self, row, processed_ids):
+        topic_id, source, content = self.format_signal(row)
         ref_id = hashlib.sha256(content.encode()).hexdigest()
         
         # 核心去重：如果今天审过，直接跳过，不花 API 钱
         if ref_id in processed_ids: return []
 
+        # 数值闸门：polymarket / github 只有实质性变动才重新送审
+        delta, material = "", False
+        if self.change_gate:
+            passed, delta = self.change_gate.check(source, topic_id, row)
+            if not passed:
+                processed_ids.add(ref_id)
+                return []
+            material = bool(delta)
+
+        # 近似去重：转推 / 重发 / 微小价格抖动，挂到已审计的 topic_id 上
+        if self.near_dup:
+            canonical = self.near_dup.claim(source, content, topic_id, ref_id, skip_topic=topic_id if material else None,
+                                            key=self.signal_key(row, source))
+            if canonical:
+                processed_ids.add(ref_id)
+                return []
+
         results = []
-        def ask_v3(s, u):
-            st, r = self.call_ai(self.v3_model, s, u)
-            if st == "SUCCESS" and "### Output" in r:
-                return r.split("### Output")[0].replace("### Thought","").strip(), r.split("### Output")[1].strip()
-            return "Audit", r
+        def make_ask(name, mod):
+            # 每位大师可选声明 MAX_TOKENS / STOP_MARKERS，流式模式下据此提前截断
+            max_tokens = getattr(mod, 'MAX_TOKENS', None)
+            stop_markers = getattr(mod, 'STOP_MARKERS', None)
+            def ask_v3(s, u):
+                st, r = self.call_ai(self.v3_model, s, u, max_tokens=max_tokens, stop_markers=stop_markers, tag=name)
+                if st == "SUCCESS" and "### Output" in r:
+                    return r.split("### Output")[0].replace("### Thought","").strip(), r.split("### Output")[1].strip()
+                return "Audit", r
+            return ask_v3
 
-        for name, mod in self.masters.items():
+        for name in self.route_masters(row, source):
+            mod = self.masters[name]
+            ask_v3 = make_ask(name, mod)
             prev_opinion = self.memory.get(topic_id, {}).get(name)
             drift_context = f"\n\n[历史记忆]：此前观点：'{prev_opinion}'。数据变动若触发逻辑反转，请在 Output 开头标记 [DRIFT_DETECTED]。" if prev_opinion else ""
+            if delta: drift_context += f"\n\n[数值变动]：自上次审计以来 {delta}。"
             try:
                 if hasattr(mod, 'audit'):
                     row['_drift_context'] = drift_context
@@ -197,10 +364,18 @@ class UniversalFactory:
                             "drift": "[DRIFT_DETECTED]" in o,
                             "source": source, "thought": t, "output": o
                         }, ensure_ascii=False))
-            except: continue
+            except Exception as e:
+                telemetry.error(e)
+                continue
+        # 没有产出（大师全部报错 / 空输出）：指纹和数值快照都不落，重试时照常送审
+        if results and self.change_gate: self.change_gate.commit(source, topic_id, row)
+        if not results and self.near_dup: self.near_dup.release(source, ref_id)
         return results
 
+    @telemetry.timed("process_and_ship")
     def process_and_ship(self, vault_path="vault"):
+        """返回 {"signals", "teachings", "errors"}：筛选异常、最终推送失败各记一个错误（pipeline 据此记 partial，下一轮不跳过）"""
+        self._span = telemetry.current()
         self.vault_path = Path(vault_path)
         (self.vault_path / "instructions").mkdir(parents=True, exist_ok=True)
         
@@ -210,86 +385,139 @@ class UniversalFactory:
         now = datetime.now()
         day_str = now.strftime('%Y%m%d')
         hour_str = now.strftime('%H')
-        output_file = self.vault_path / "instructions" / f"teachings_{day_str}_{hour_str}.jsonl"
+        output_rel = f"instructions/teachings_{day_str}_{hour_str}.jsonl"
 
         # 2. 筛选
         signals = self.fetch_elite_signals()
-        if not signals: return
-
-        # 3. 审计并实时锁定 ID
-        batch_size = 50
-        for i in range(0, len(signals), batch_size):
-            chunk = signals[i : i + batch_size]
-            with ThreadPoolExecutor(max_workers=20) as executor:
-                res = list(executor.map(lambda r: self.audit_process(r, processed_ids), chunk))
-            
-            added = []
-            for r_list in res:
-                if r_list:
-                    added.extend(r_list)
-                    # 实时存入，防止同一批次内由于 Supabase 延迟导致的重复
-                    for r_json in r_list: processed_ids.add(json.loads(r_json).get('ref_id'))
-            
-            if added:
-                with open(output_file, 'a', encoding='utf-8') as f:
-                    f.write('\n'.join(added) + '\n')
-                self.git_push_assets()
+        if not signals: return {"signals": 0, "teachings": 0, "errors": int(self.fetch_failed)}
+        teachings = 0
+
+        # 3. 审计并实时锁定 ID（结果只写本地 WAL，git 由后台线程负责）
+        state_dir = self.vault_path / "factory_state"
+        self.near_dup = NearDupIndex(day_str, base=state_dir)
+        self.change_gate = ChangeGate(base=state_dir)
+        store = TeachingsStore(self.vault_path / "instructions")
+        self.journal = VaultJournal(self.vault_path, store=store, export_jsonl=jsonl_export_enabled()).start()
+        try:
+            if CASCADE_ENABLED: signals = self.triage_signals(signals, processed_ids, state_dir, day_str)
+            batch_size = 50
+            for i in range(0, len(signals), batch_size):
+                chunk = signals[i : i + batch_size]
+                with ThreadPoolExecutor(max_workers=20) as executor:
+                    res = list(executor.map(lambda r: self.audit_process(r, processed_ids), chunk))
+
+                added = []
+                for r_list in res:
+                    if r_list:
+                        added.extend(r_list)
+                        # 实时存入，防止同一批次内由于 Supabase 延迟导致的重复
+                        for r_json in r_list: self.remember(json.loads(r_json), processed_ids)
 
-    def call_ai(self, model, sys_prompt, usr_prompt):
+                if added: self.journal.append(output_rel, added)
+                teachings += len(added)
+        finally:
+            self.journal.track(self.near_dup.save().relative_to(self.vault_path))
+            print(f"👯 近似去重：折叠 {self.near_dup.collapsed} 条重复信号")
+            self.journal.track(self.change_gate.save().relative_to(self.vault_path))
+            print(f"📏 数值闸门：{self.change_gate.report()}")
+            print(f"🧭 大师路由：{self.route_report()}")
+            if self.llm_stats: print(f"⏱️ LLM 延迟遥测：\n{self.llm_report()}")
+            pushed = self.git_push_assets()
+        return {"signals": len(signals), "teachings": teachings, "errors": int(self.fetch_failed) + int(pushed is False)}
+
+    def call_ai(self, model, sys_prompt, usr_prompt, temperature=0.7, max_tokens=None, stop_markers=None, tag=None):
+        with telemetry.span("llm", parent=self._span) as sp:
+            st, text = self._call_ai(model, sys_prompt, usr_prompt, temperature, max_tokens, stop_markers, tag)
+            sp.add("calls")
+            if st != "SUCCESS": sp.error()
+        return st, text
+
+    def _call_ai(self, model, sys_prompt, usr_prompt, temperature=0.7, max_tokens=None, stop_markers=None, tag=None):
         headers = {"Authorization": f"Bearer {self.api_key}", "Content-Type": "application/json"}
-        payload = {"model": model, "messages": [{"role": "system", "content": sys_prompt}, {"role": "user", "content": usr_prompt}], "temperature": 0.7}
+        payload = {"model": model, "messages": [{"role": "system", "content": sys_prompt}, {"role": "user", "content": usr_prompt}], "temperature": temperature}
+        if max_tokens: payload["max_tokens"] = int(max_tokens)
+        if self.stream: return self._call_ai_stream(payload, headers, stop_markers, tag or model)
+        t0 = time.perf_counter()
         try:
-            res = requests.post(self.api_url, json=payload, headers=headers, timeout=60).json()
-            return "SUCCESS", res['choices'][0]['message']['content']
+            res = self.http.post(self.api_url, json=payload, headers=headers, timeout=60).json()
+            text = res['choices'][0]['message']['content']
+            self._record_llm(tag or model, None, time.perf_counter() - t0, (res.get('usage') or {}).get('completion_tokens'), False)
+            return "SUCCESS", text
         except: return "ERROR", "AI_FAIL"
 
+    def _call_ai_stream(self, payload, headers, stop_markers, tag):
+        """🌊 流式消费 SSE：记录首 token 延迟与吞吐，命中大师声明的 stop marker 立即断开
+        流没等到 [DONE] / finish_reason / stop marker 就断了 = 半截回复，按失败处理（不落成审计）"""
+        payload = dict(payload, stream=True)
+        t0 = time.perf_counter()
+        ttft, chunks, text, stopped, done = None, 0, "", False, False  # chunks 近似 token 数（SSE 基本一帧一 token）
+        longest = max((len(m) for m in stop_markers or []), default=0)
+        try:
+            with self.http.post(self.api_url, json=payload, headers=headers, stream=True, timeout=(10, 60)) as res:
+                if res.status_code != 200: return "ERROR", "AI_FAIL"
+                res.encoding = "utf-8"  # text/event-stream 不带 charset 时 requests 会按 ISO-8859-1 解，中文全乱
+                for line in res.iter_lines(decode_unicode=True):
+                    if not line or not line.startswith("data:"): continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        done = True
+                        break
+                    try:
+                        choice = json.loads(data)['choices'][0]
+                        delta = (choice.get('delta') or {}).get('content') or ""
+                    except: continue
+                    if choice.get('finish_reason'): done = True
+                    if not delta: continue
+                    if ttft is None: ttft = time.perf_counter() - t0
+                    chunks += 1
+                    scan_from = max(0, len(text) - longest)
+                    text += delta
+                    if not stop_markers: continue
+                    # 只在 Output 段开始之后检查截断标记，避免 Thought 里的同名字符串误伤
+                    out_at = text.find("### Output")
+                    if out_at < 0: continue
+                    start = max(scan_from, out_at + len("### Output"))
+                    hits = [i for i in (text.find(m, start) for m in stop_markers) if i >= 0]
+                    if hits:
+                        text, stopped = text[:min(hits)], True
+                        break
+        except Exception: pass
+        if not (done or stopped) or not text: return "ERROR", "AI_FAIL"
+        self._record_llm(tag, ttft, time.perf_counter() - t0, chunks, stopped)
+        return "SUCCESS", text
+
+    def _record_llm(self, tag, ttft, total, tokens, stopped):
+        telemetry.count("tokens", tokens or 0)
+        with self._stats_lock:
+            self.llm_stats.setdefault(tag, []).append((ttft, total, tokens or 0, stopped))
+
+    def llm_report(self):
+        """⏱️ 每位大师的延迟遥测：p50/p95 总耗时、平均首 token、tokens/s、提前截断次数"""
+        lines = []
+        with self._stats_lock: stats = {k: list(v) for k, v in self.llm_stats.items()}
+        for tag, rows in stats.items():
+            totals = sorted(r[1] for r in rows)
+            ttfts = [r[0] for r in rows if r[0] is not None]
+            tokens, seconds = sum(r[2] for r in rows), sum(r[1] for r in rows)
+            p = lambda q: totals[min(len(totals) - 1, int(q * len(totals)))]
+            lines.append(f"   {tag}: {len(rows)} 次 | p50 {p(0.5):.1f}s p95 {p(0.95):.1f}s | "
+                         f"TTFT {sum(ttfts) / len(ttfts) if ttfts else 0:.2f}s | {tokens / seconds if seconds else 0:.1f} tok/s | "
+                         f"截断 {sum(1 for r in rows if r[3])}")
+        return "\n".join(lines)
+
+    @telemetry.timed("git_push_assets")
     def git_push_assets(self):
-        """防御型推送：解决身份未知、未提交更改以及远程拒绝问题"""
-        if not self.vault_path: return
-        cwd = self.vault_path
-        
-        # === 🛡️ 新增：自愈逻辑 ===
-        # 检查是否存在僵尸 rebase 锁，如果有，先杀掉
-        rebase_dir = cwd / ".git" / "rebase-merge"
-        if rebase_dir.exists():
-            print("🚑 检测到僵尸 Rebase 锁，正在执行战地急救...")
-            subprocess.run(["git", "rebase", "--abort"], cwd=cwd)
-            if rebase_dir.exists(): # 如果 abort 失败，直接物理删除
-                import shutil
-                shutil.rmtree(rebase_dir)
-        # =======================
-
-        # 1. 强制注入身份
-        subprocess.run(["git", "config", "user.email", "bot@factory.com"], cwd=cwd)
-        subprocess.run(["git", "config", "user.name", "Cognitive Bot"], cwd=cwd)
-        # 解决 pull 时的 rebase 策略警告
-        subprocess.run(["git", "config", "pull.rebase", "true"], cwd=cwd)
-
-        # 2. 【顺序调整】先 add 和 commit，把你的 1000 多条数据存进本地仓库
-        subprocess.run(["git", "add", "."], cwd=cwd)
-        
-        # 检查是否有东西可以 commit
-        diff_status = subprocess.run(["git", "diff", "--cached", "--quiet"], cwd=cwd)
-        if diff_status.returncode == 0:
-            print("💤 没有发现新资产，跳过同步。")
-            return
-
-        # 3. 执行 Commit
-        commit_msg = f"🧠 Cognitive Audit: {datetime.now().strftime('%H:%M:%S')}"
-        subprocess.run(["git", "commit", "-m", commit_msg], cwd=cwd)
-
-        # 4. 【同步远程】此时再 pull --rebase，Git 就能顺畅地把远程改动接在你的 commit 之后
-        print("🔄 正在通过 rebase 同步远程仓库...")
-        subprocess.run(["git", "pull", "origin", "main", "--rebase"], cwd=cwd)
-
-        # 5. 最终推送
-        push_res = subprocess.run(["git", "push", "origin", "main"], cwd=cwd, capture_output=True, text=True)
-        
-        if push_res.returncode == 0:
-            print("🚀 认知资产已成功同步至中央银行。")
-        else:
-            print(f"❌ 最终推送失败: {push_res.stderr}")
+        """收尾推送：最终刷盘 + 一次有界重试的 rebase/push（只暂存本轮写过的 instructions/ 路径）
+        返回 True = 已推送 / 无需推送，False = 推送失败（本地提交保留），None = vault 不是 git 仓库"""
+        if not self.journal: return None
+        pushed = self.journal.close()
+        return pushed if self.journal.is_repo else None
 
 if __name__ == "__main__":
-    factory = UniversalFactory()
-    factory.process_and_ship()
+    cassette.install("factory")
+    telemetry.start("factory")
+    try:
+        factory = UniversalFactory()
+        factory.process_and_ship()
+    finally:
+        telemetry.emit()
@@ -0,0 +1,23 @@
+import re
+from datetime import datetime
+
+# ==========================================
+# 🕰️ ISO 时间解析：兼容 Python 3.9 的 datetime.fromisoformat
+# ==========================================
+# 3.9 只认 3 / 6 位小数秒和 +HH:MM 时区；Postgres / PostgREST 的 created_at 会去掉小数末尾的 0
+# （"…:05.12345+00:00"）、时区也可能是 "+00" / "+0000"，直接解析会 ValueError，调用方再静默当成缺失。
+# 这里先把小数秒补齐 / 截到 6 位、时区补成 +HH:MM，再交给 fromisoformat。
+
+_TAIL_RE = re.compile(r"(?<=[T ])(\d{2}:\d{2}(?::\d{2})?)(?:\.(\d+))?(?:([+-])(\d{2}):?(\d{2})?)?$")
+
+def parse_iso(ts):
+    """ISO 字符串 -> datetime（是否带时区照原样）；解析不了返回 None"""
+    if not ts: return None
+    s = str(ts).strip().replace('Z', '+00:00')
+    m = _TAIL_RE.search(s)
+    if m:
+        frac = f".{(m.group(2) + '000000')[:6]}" if m.group(2) is not None else ""
+        tz = f"{m.group(3)}{m.group(4)}:{m.group(5) or '00'}" if m.group(3) else ""
+        s = s[:m.start()] + m.group(1) + frac + tz
+    try: return datetime.fromisoformat(s)
+    except ValueError: return None
@@ -0,0 +1,130 @@
+# ==========================================
+# 🔎 多模式关键词引擎：Aho-Corasick 自动机，一次扫描命中所有词库
+# ==========================================
+# 词库在 import 时编译一次；扫描时每个字符只做一次 dict 查表。
+# 默认是子串匹配（与原来的 `k in text` 逐条判断结果一致："tariff" 命中 "tariffs"、"bitcoin" 命中 "比特币bitcoin大涨"、
+# VIP "Vitalik" 命中 "VitalikButerin"）。word_boundary=True 时要求关键词两侧不是 ASCII 字母数字：
+# 中文等非 ASCII 字符算边界，词尾允许跟复数 s / es。
+# 装了 pyahocorasick（C 实现）就用它跑自动机，否则退回纯 Python DFA，结果一致。
+
+try:
+    import ahocorasick
+except ImportError:
+    ahocorasick = None
+
+_PLURALS = ("s", "es")
+
+def _is_word(ch):
+    return ch.isascii() and (ch.isalnum() or ch == "_")
+
+def _bounded(t, start, end):
+    """t[start:end] 两侧是否是单词边界（右侧允许复数后缀）"""
+    if start > 0 and _is_word(t[start - 1]): return False
+    if end >= len(t) or not _is_word(t[end]): return True
+    return any(t.startswith(p, end) and (end + len(p) >= len(t) or not _is_word(t[end + len(p)])) for p in _PLURALS)
+
+class KeywordMatcher:
+    """groups: {label: [keyword, ...]}，label 的顺序即并列时的优先级"""
+
+    def __init__(self, groups, word_boundary=False):
+        self.word_boundary = word_boundary
+        self.labels = list(groups)
+        self.keywords = []      # kid -> keyword
+        self.keyword_labels = []  # kid -> [label_idx, ...]
+        kid_of = {}
+        for li, label in enumerate(self.labels):
+            for kw in groups[label]:
+                k = kw.lower()
+                if not k: continue
+                if k not in kid_of:
+                    kid_of[k] = len(self.keywords)
+                    self.keywords.append(k)
+                    self.keyword_labels.append([])
+                if li not in self.keyword_labels[kid_of[k]]: self.keyword_labels[kid_of[k]].append(li)
+        self._build()
+
+    def _build(self):
+        # 1. Trie
+        goto, out = [{}], [[]]
+        for kid, kw in enumerate(self.keywords):
+            s = 0
+            for ch in kw:
+                nxt = goto[s].get(ch)
+                if nxt is None:
+                    nxt = len(goto)
+                    goto[s][ch] = nxt
+                    goto.append({})
+                    out.append([])
+                s = nxt
+            out[s].append(kid)
+        # 2. BFS 求失败指针，并把 goto 补全成 DFA（扫描时无需回溯）
+        fail = [0] * len(goto)
+        delta = [dict(g) for g in goto]
+        queue = list(goto[0].values())
+        head = 0
+        while head < len(queue):
+            s = queue[head]; head += 1
+            out[s] = out[s] + out[fail[s]]
+            for ch, t in goto[s].items():
+                f = fail[s]
+                while f and ch not in goto[f]: f = fail[f]
+                fail[t] = goto[f][ch] if ch in goto[f] and goto[f][ch] != t else 0
+                queue.append(t)
+            # 继承失败状态的转移
+            for ch, t in delta[fail[s]].items():
+                if ch not in delta[s]: delta[s][ch] = t
+        self._delta = delta
+        self._out = [tuple(o) for o in out]
+        self._automaton = None
+        if ahocorasick is not None and self.keywords:
+            a = ahocorasick.Automaton()
+            for kid, kw in enumerate(self.keywords): a.add_word(kw, (kid, len(kw)))
+            a.make_automaton()
+            self._automaton = a
+
+    def find_all(self, text):
+        """返回所有命中 [(kid, start, end)]，包括重叠命中"""
+        if not text: return []
+        t = text.lower()
+        wb, hits = self.word_boundary, []
+        if self._automaton is not None:
+            for last, (kid, size) in self._automaton.iter(t):
+                start, end = last + 1 - size, last + 1
+                if wb and not _bounded(t, start, end): continue
+                hits.append((kid, start, end))
+            return hits
+        delta, out, kws = self._delta, self._out, self.keywords
+        s = 0
+        for i, ch in enumerate(t):
+            s = delta[s].get(ch, 0)
+            if out[s]:
+                end = i + 1
+                for kid in out[s]:
+                    start = end - len(kws[kid])
+                    if wb and not _bounded(t, start, end): continue
+                    hits.append((kid, start, end))
+        return hits
+
+    def match(self, text):
+        """{label: [命中的关键词（按出现顺序去重）]}，只包含有命中的 label"""
+        result = {}
+        for kid, _, _ in self.find_all(text):
+            for li in self.keyword_labels[kid]:
+                words = result.setdefault(self.labels[li], [])
+                if self.keywords[kid] not in words: words.append(self.keywords[kid])
+        return result
+
+    def contains(self, text, label=None):
+        for kid, _, _ in self.find_all(text):
+            if label is None or self.labels.index(label) in self.keyword_labels[kid]: return True
+        return False
+
+    def longest(self, hits, labels=None):
+        """在 match() 的结果里挑最长关键词所属的 label；并列时按 label 声明顺序。返回 (label, keyword) 或 (None, None)"""
+        best, best_key = (None, None), None
+        for li, label in enumerate(self.labels):
+            if labels is not None and label not in labels: continue
+            for kw in hits.get(label, ()):
+                key = (len(kw), -li)
+                if best_key is None or key > best_key: best, best_key = (label, kw), key
+        return best
@@ -0,0 +1,138 @@
+import json, os, time
+
+from market_series import to_epoch
+from state_store import load_state, save_state
+
+# ==========================================
+# 🏁 滚动 24h 榜单：入库时增量维护"窗口内去重后的候选"，出报告时不再回扫整窗
+# ==========================================
+# 每个源一份：键 / 取胜列与 processor 里 ranking.dedup 的参数一致（by 为空 = 保留第一次出现）。
+# 每个键只留"可能成为代表行"的快照：若已有快照活得不比它短（bj_time 不早）且不输给它，它永远轮不到，直接丢弃。
+# 于是代表行在过期后会自动换成窗口里的下一名，结果与 24h 全量去重一致；
+# 最终的 Top-K / 配额 / 互斥仍由 get_hot_items 原来的排名代码完成，只是输入从整窗原始行变成了去重后的候选。
+# 覆盖不满一个窗口（新建 / 状态丢失 / 入库时出错被作废）时 rows() 返回 None，调用方回退到查库。
+# 水位 files：榜单见过的、已登记进 processed_files 的本源文件数。入库后没落盘就挂了的一轮、另开进程的 backfill
+# 会让库里的登记数多出来，而这些文件的哨兵已登记、不会再被 observe —— sync 开始时 reconcile() 对不上就作废重来，
+# rows() 对不上就回退查库，不拿缺了行的榜单出报告。
+
+VERSION = 2
+ENABLED = os.environ.get("LEADERBOARD_ENABLED", "true").lower() == "true"
+WINDOW_HOURS = float(os.environ.get("LEADERBOARD_WINDOW_HOURS", 24))
+
+class Leaderboard:
+    def __init__(self, name, key, by=None, default=None, base=None):
+        self.source = name  # = processed_files.engine
+        self.name = f"leaderboard_{name}.json.gz"
+        self.key, self.by, self.default = key, by, default
+        self.base = base
+        self._state = None  # 首次使用时加载
+
+    def _fresh(self, files=None):
+        return {"version": VERSION, "since": time.time(), "seq": 0, "keys": {}, "files": files}
+
+    def _load(self):
+        if self._state is None:
+            state = load_state(self.name, None, self.base)
+            self._state = state if state and state.get("version") == VERSION else self._fresh()
+        return self._state
+
+    def invalidate(self):
+        """清空并从现在起重新累积（满一个窗口之前都回退查库）；水位照旧往上数"""
+        self._state = self._fresh(self._state.get("files") if self._state else None)
+
+    def _db_files(self, db):
+        res = db.table("processed_files").select("file_sha", count="exact").eq("engine", self.source).limit(1).execute()
+        return res.count
+
+    def reconcile(self, db):
+        """sync 开始前对水位：库里的登记数与榜单见过的不一致 -> 作废重来（新建的榜单直接记下当前登记数）"""
+        state = self._load()
+        try: count = self._db_files(db)
+        except Exception as e:
+            print(f"⚠️ 榜单 {self.name} 水位查询失败，已作废: {e}")
+            self._state = self._fresh()
+            return False
+        if state["files"] is not None and state["files"] != count:
+            print(f"⚠️ 榜单 {self.name} 水位不一致（榜单 {state['files']} / 库里 {count} 个文件），已作废")
+            self.invalidate()
+        self._state["files"] = count
+        return True
+
+    def checkpoint(self):
+        """refinery 每登记一个文件（processed_files）调用一次，在 observe 之后"""
+        state = self._load()
+        if state["files"] is not None: state["files"] += 1
+
+    def _key(self, row):
+        k = self.key(row) if callable(self.key) else row.get(self.key)
+        if not k: return None
+        return k if isinstance(k, str) else json.dumps(k, ensure_ascii=False, default=str)
+
+    def observe(self, rows, now=None):
+        """登记一批刚入库的行（dict 列表或 Arrow 表），返回登记条数；出错时作废整个榜单而不是留下缺口"""
+        try:
+            if hasattr(rows, "column_names"):
+                rows = rows.drop([c for c in ("raw_json",) if c in rows.column_names]).to_pylist()
+            state = self._load()
+            cutoff = (now or time.time()) - WINDOW_HOURS * 3600
+            keys, added = state["keys"], 0
+            for r in rows:
+                ts = to_epoch(r.get('bj_time'))
+                if ts is None or ts <= cutoff: continue
+                k = self._key(r)
+                if k is None: continue
+                seq = state["seq"]
+                state["seq"] += 1
+                entry = keys.setdefault(k, {"order": [], "best": []})
+                # order：决定键的先后（窗口内第一次出现）；bj_time 不晚于已有快照的新快照不会更早出现
+                order = entry["order"]
+                if not order or order[-1][0] < ts: order.append([ts, seq])
+                value = r.get(self.by) if self.by else 0
+                if value is None: value = self.default
+                best = entry["best"]
+                # best：并列时先到的赢，所以已有快照 bj_time 不早且取值不小即可支配新快照
+                if any(b[0] >= ts and b[2] >= value for b in best): continue
+                best[:] = [b for b in best if not (b[0] <= ts and b[2] < value)]
+                best.append([ts, seq, value, {c: v for c, v in r.items() if c != 'raw_json'}])
+                added += 1
+            return added
+        except Exception as e:
+            print(f"⚠️ 榜单 {self.name} 增量更新失败，已作废: {e}")
+            self.invalidate()
+            return 0
+
+    def _expire(self, now=None):
+        state = self._load()
+        cutoff = (now or time.time()) - WINDOW_HOURS * 3600
+        keys = state["keys"]
+        for k in list(keys):
+            entry = keys[k]
+            entry["order"] = [o for o in entry["order"] if o[0] > cutoff]
+            entry["best"] = [b for b in entry["best"] if b[0] > cutoff]
+            if not entry["best"]: del keys[k]
+        return state, cutoff
+
+    def rows(self, db=None, now=None):
+        """窗口内每个键的代表行（按键第一次出现的顺序）；榜单不可用、或水位与库里（db 给出时）对不上时返回 None"""
+        if not ENABLED: return None
+        state, cutoff = self._expire(now)
+        if state["since"] > cutoff: return None
+        if db is not None:
+            try: count = self._db_files(db)
+            except Exception: return None
+            if state["files"] is None or state["files"] != count:
+                print(f"⚠️ 榜单 {self.name} 水位不一致（榜单 {state['files']} / 库里 {count} 个文件），回退查库")
+                return None
+        reps = []
+        for entry in state["keys"].values():
+            rep = max(entry["best"], key=lambda b: (b[2], -b[1]))
+            first = entry["order"][0][1] if entry["order"] else rep[1]
+            reps.append((first, rep[3]))
+        reps.sort(key=lambda x: x[0])
+        # 返回副本：排名代码会往行里写 _score 之类的临时列
+        return [dict(row) for _, row in reps]
+
+    def save(self, now=None):
+        if self._state is None: return None
+        self._expire(now)
+        return save_state(self.name, self._state, self.base)
@@ -0,0 +1,235 @@
+import math, os, time
+from datetime import datetime, timedelta, timezone
+import numpy as np
+
+from isotime import parse_iso
+from state_store import load_state, save_state
+
+# ==========================================
+# 📈 盘口时序环形缓冲：每个市场一圈定长数组，入库时增量追加
+# ==========================================
+# RingSeries：每个键保留最近 capacity 个快照 (时间, 若干数值字段)，
+# 所有键共用几块矩阵（行 = 键，列 = 环形槽位），状态以 .npz 落盘，下次运行接着追加。
+# MarketSeries：polymarket 每个市场（slug_question）的 (Yes 概率, 流动性, 24h 成交量)；
+# github 的星数序列见 star_series.py。
+# 相邻快照的差分维护滚动和 / 平方和：追加一个点、挤掉最老的点都是 O(1)，
+# z 分数与区间变动量都不用回扫历史；同一时间戳或更早的快照（重放 / 全量补录）直接忽略。
+
+CAPACITY = int(os.environ.get("MARKET_SERIES_CAPACITY", 72))            # 小时级快照约 3 天
+RETENTION_HOURS = float(os.environ.get("MARKET_SERIES_RETENTION_HOURS", 168))  # 超过 7 天没更新的市场落盘时剔除
+MIN_SAMPLES = int(os.environ.get("MARKET_SERIES_MIN_SAMPLES", 6))      # 差分样本不足时 z 分数按 0 处理
+SERIES_DIR = os.environ.get("MARKET_SERIES_DIR")                        # 默认跟随 REFINERY_STATE_DIR
+MOMENTUM_WEIGHT = float(os.environ.get("MARKET_MOMENTUM_WEIGHT", 0.5))  # 分数 x (1 + w * min(|z|, cap))
+MOMENTUM_Z_CAP = float(os.environ.get("MARKET_MOMENTUM_Z_CAP", 5.0))
+STATE_NAME = "market_series.npz"
+
+FIELDS = ("price", "liquidity", "vol24h")
+PRICE, LIQUIDITY, VOL24H = range(len(FIELDS))
+_BJ = timezone(timedelta(hours=8))
+
+def market_key(row):
+    """与 polymarket.get_hot_items 的快照去重键一致"""
+    return f"{row.get('slug')}_{row.get('question')}"
+
+def momentum_boost(z):
+    """Yes 概率最近一步跳动越反常，分数放大越多；z=0 时恰好 x1"""
+    return 1 + MOMENTUM_WEIGHT * np.minimum(np.abs(z), MOMENTUM_Z_CAP)
+
+def to_epoch(ts):
+    """bj_time（ISO，不带时区时按北京时间）-> 秒"""
+    if ts is None: return None
+    if isinstance(ts, (int, float)): return float(ts)
+    dt = parse_iso(ts)
+    if dt is None: return None
+    if dt.tzinfo is None: dt = dt.replace(tzinfo=_BJ)
+    return dt.timestamp()
+
+def _num(val):
+    try: return float(val)
+    except (TypeError, ValueError): return math.nan
+
+class RingSeries:
+    """定长环形时序的通用部分；子类给出 FIELDS / STATE_NAME / CAPACITY"""
+    FIELDS = FIELDS
+    STATE_NAME = STATE_NAME
+    CAPACITY = CAPACITY
+
+    def __init__(self, capacity=None, base=None):
+        self.base = base = base or SERIES_DIR
+        state = load_state(self.STATE_NAME, None, base)
+        if state and state["val"].shape[2] == len(self.FIELDS) \
+                and int(state["ts"].shape[1]) == (capacity or int(state["ts"].shape[1])):
+            self.capacity = int(state["ts"].shape[1])
+            self.keys = [str(k) for k in state["keys"]]
+            self.ts, self.val = state["ts"], state["val"].astype(np.float64)
+            self.head, self.count = state["head"].astype(np.int64), state["count"].astype(np.int64)
+        else:
+            self.capacity = capacity or self.CAPACITY
+            self.keys = []
+            self.ts = np.zeros((0, self.capacity))
+            self.val = np.zeros((0, self.capacity, len(self.FIELDS)))
+            self.head = np.zeros(0, dtype=np.int64)
+            self.count = np.zeros(0, dtype=np.int64)
+        self.index = {k: i for i, k in enumerate(self.keys)}
+        self.size = len(self.keys)
+        self._rebuild()
+
+    # ---------- 存储 ----------
+    def _chronological(self):
+        """各键按时间顺序的槽位下标 (n, cap) 与有效掩码"""
+        n, cap = self.size, self.capacity
+        start = (self.head[:n] - self.count[:n]) % cap
+        slots = (start[:, None] + np.arange(cap)) % cap
+        return slots, np.arange(cap) < self.count[:n, None]
+
+    def _rebuild(self):
+        """从环形数组重算滚动和（加载时一次，之后全部增量维护）"""
+        n = len(self.keys)
+        self.sums = np.zeros((len(self.ts), len(self.FIELDS)))
+        self.sumsq = np.zeros_like(self.sums)
+        self.last_d = np.zeros_like(self.sums)
+        if not n: return
+        slots, valid = self._chronological()
+        vals = np.take_along_axis(self.val[:n], slots[:, :, None], axis=1)
+        d = np.nan_to_num(np.diff(vals, axis=1))
+        d[~valid[:, 1:]] = 0
+        self.sums[:n], self.sumsq[:n] = d.sum(axis=1), (d * d).sum(axis=1)
+        last = np.maximum(self.count[:n] - 2, 0)
+        self.last_d[:n] = d[np.arange(n), last] if self.capacity > 1 else 0
+
+    def _row(self, key):
+        i = self.index.get(key)
+        if i is not None: return i
+        if self.size == len(self.ts):
+            # 行数翻倍扩容，均摊 O(1)
+            grow = max(64, len(self.ts))
+            self.ts = np.concatenate([self.ts, np.zeros((grow, self.capacity))])
+            self.val = np.concatenate([self.val, np.zeros((grow, self.capacity, len(self.FIELDS)))])
+            for name in ("head", "count"):
+                setattr(self, name, np.concatenate([getattr(self, name), np.zeros(grow, dtype=np.int64)]))
+            for name in ("sums", "sumsq", "last_d"):
+                setattr(self, name, np.concatenate([getattr(self, name), np.zeros((grow, len(self.FIELDS)))]))
+        i = self.index[key] = self.size
+        self.keys.append(key)
+        self.size += 1
+        return i
+
+    def append(self, key, ts, *values):
+        """追加一个快照（values 与 FIELDS 一一对应）；不晚于该键最新时间戳的点忽略，返回是否写入"""
+        if ts is None: return False
+        i, cap = self._row(key), self.capacity
+        c, h = self.count[i], self.head[i]
+        v = np.array([_num(x) for x in values])
+        if c:
+            last = (h - 1) % cap
+            if ts <= self.ts[i, last]: return False
+            # 缺值沿用上一个快照
+            v = np.where(np.isnan(v), self.val[i, last], v)
+            d = np.nan_to_num(v - self.val[i, last])
+            if c == cap:
+                # 挤掉最老的点：它和下一个点之间的差分移出窗口
+                ed = np.nan_to_num(self.val[i, (h + 1) % cap] - self.val[i, h])
+                self.sums[i] -= ed
+                self.sumsq[i] -= ed * ed
+            self.sums[i] += d
+            self.sumsq[i] += d * d
+            self.last_d[i] = d
+        self.ts[i, h], self.val[i, h] = ts, v
+        self.head[i] = (h + 1) % cap
+        self.count[i] = min(c + 1, cap)
+        return True
+
+    def save(self, now=None):
+        """落盘；超过 RETENTION_HOURS 没更新的键顺手剔除"""
+        n = self.size
+        if not n: return None
+        latest = self.ts[np.arange(n), (self.head[:n] - 1) % self.capacity]
+        keep = latest >= (now or time.time()) - RETENTION_HOURS * 3600
+        data = {
+            "keys": np.array([k for k, ok in zip(self.keys, keep) if ok], dtype=str),
+            "ts": self.ts[:n][keep], "val": self.val[:n][keep].astype(np.float32),
+            "head": self.head[:n][keep].astype(np.int32), "count": self.count[:n][keep].astype(np.int32),
+        }
+        return save_state(self.STATE_NAME, data, self.base)
+
+    # ---------- 查询 ----------
+    def _value_at(self, i, target, f):
+        """该键在 target 时刻（含）之前最近一个快照的值；历史不够长时返回 None"""
+        slot = self._slot_at(i, target)
+        return None if slot is None else self.val[i, slot, f]
+
+    def _slot_at(self, i, target):
+        """target 时刻（含）之前最近一个快照的槽位；环形槽位按时间有序，二分查找，代价只取决于固定的 capacity"""
+        c, cap = int(self.count[i]), self.capacity
+        start = (int(self.head[i]) - c) % cap
+        lo, hi = 0, c
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.ts[i, (start + mid) % cap] <= target: lo = mid + 1
+            else: hi = mid
+        if not lo: return None
+        return (start + lo - 1) % cap
+
+    def delta(self, key, field=0, hours=1.0):
+        """最新值 - hours 小时前的值；没有足够历史时返回 None"""
+        i = self.index.get(key)
+        if i is None or self.count[i] < 2: return None
+        last = (self.head[i] - 1) % self.capacity
+        past = self._value_at(i, self.ts[i, last] - hours * 3600, field)
+        if past is None or np.isnan(past): return None
+        return float(self.val[i, last, field] - past)
+
+    def rate(self, key, field=0, hours=6.0, offset=0.0):
+        """(offset 小时前) 往前 hours 小时内的每小时变化量，按两端快照的实际时间差折算；历史不够时返回 None"""
+        i = self.index.get(key)
+        if i is None or self.count[i] < 2: return None
+        end_t = self.ts[i, (self.head[i] - 1) % self.capacity] - offset * 3600
+        end = self._slot_at(i, end_t)
+        start = self._slot_at(i, end_t - hours * 3600)
+        if end is None or start is None or end == start: return None
+        dt = (self.ts[i, end] - self.ts[i, start]) / 3600
+        dv = self.val[i, end, field] - self.val[i, start, field]
+        return None if np.isnan(dv) else float(dv / dt)
+
+    def zscores(self, keys, field=0):
+        """最近一步差分相对窗口内差分分布的 z 分数（批量、向量化）；样本不足或无波动时为 0"""
+        idx = np.array([self.index.get(k, -1) for k in keys], dtype=np.int64)
+        z = np.zeros(len(idx))
+        ok = idx >= 0
+        if not ok.any(): return z
+        rows = idx[ok]
+        n = (self.count[rows] - 1).astype(float)
+        enough = n >= MIN_SAMPLES
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = self.sums[rows, field] / n
+            var = self.sumsq[rows, field] / n - mean * mean
+            zz = (self.last_d[rows, field] - mean) / np.sqrt(var)
+        z[ok] = np.where(enough & (var > 1e-12), zz, 0)
+        return np.nan_to_num(z)
+
+class MarketSeries(RingSeries):
+    """polymarket 每个市场的 (Yes 概率, 流动性, 24h 成交量)"""
+
+    def update(self, rows):
+        """入库的一批 polymarket 行（dict 或 Arrow 表），返回写入的快照数"""
+        if hasattr(rows, "column_names"):
+            cols = rows.select([c for c in ("slug", "question", "bj_time", "yes_prob", "liquidity", "vol24h")
+                                if c in rows.column_names]).to_pydict()
+            n = rows.num_rows
+            rows = [{k: v[j] for k, v in cols.items()} for j in range(n)]
+        added = 0
+        for r in rows:
+            added += self.append(market_key(r), to_epoch(r.get('bj_time')), r.get('yes_prob'),
+                                 r.get('liquidity'), r.get('vol24h'))
+        return added
+
+    def momentum(self, key):
+        """单个市场的动量摘要（给报告 / 审计上下文用）"""
+        d6, d12 = self.delta(key, VOL24H, 6), self.delta(key, VOL24H, 12)
+        return {
+            "price_1h": self.delta(key, PRICE, 1), "price_6h": self.delta(key, PRICE, 6),
+            "liquidity_6h": self.delta(key, LIQUIDITY, 6),
+            # 成交量加速度：最近 6h 的增量 - 再往前 6h 的增量
+            "vol_accel": None if d6 is None or d12 is None else d6 - (d12 - d6),
+            "z_price": float(self.zscores([key])[0]),
+        }
@@ -0,0 +1,105 @@
+import hashlib, os, re, threading
+
+from state_store import load_state, save_state
+
+# ==========================================
+# 👯 近似重复抑制：SimHash 指纹 + 分段桶索引
+# ==========================================
+# 转推/引用推、重复发帖的 reddit、价格只动了 0.1% 的 polymarket 都会生成新的 ref_id，
+# 这里按 (source, day) 维护 64 位 SimHash，海明距离 <= 阈值即视为同一信号，直接挂到已审计的 topic_id 上。
+# 指纹不看数字（价格/星数抖动不算新信号），但数字也是区分不同市场的唯一线索（"BTC above $100k" vs "$110k"、
+# "cut 25 bps" vs "50 bps"）：跨 topic 折叠还要求标识文本（推文正文 / 市场标题+问题）里的数字完全一致，
+# 只有同一 topic 的快照之间才忽略数字。
+
+SIMHASH_BITS = 64
+BANDS = 4  # 64 位切 4 段，海明距离 <= 3 时必有一段完全相同
+DEFAULT_THRESHOLD = int(os.environ.get("NEAR_DUP_THRESHOLD", 3))  # 超过 3 时分段桶只能保证近似召回
+
+_URL_RE = re.compile(r"https?://\S+")
+_RT_RE = re.compile(r"\b(?:rt|qt)\s+@\w+:?")
+_NUM_RE = re.compile(r"\d+(?:[.,]\d+)*")
+_TOKEN_RE = re.compile(r"[\w$#@]+", re.UNICODE)
+
+def normalize(text):
+    """去掉链接、RT 前缀和所有数字（价格/星数的小幅抖动不算新信号）"""
+    t = (text or "").lower()
+    t = _URL_RE.sub(" ", t)
+    t = _RT_RE.sub(" ", t)
+    t = _NUM_RE.sub("0", t)
+    return _TOKEN_RE.findall(t)
+
+def numbers(text):
+    """标识文本里出现的数字（去重排序后拼成串），跨 topic 折叠时必须一致"""
+    t = _RT_RE.sub(" ", _URL_RE.sub(" ", (text or "").lower()))
+    return " ".join(sorted(set(_NUM_RE.findall(t))))
+
+def simhash(text):
+    tokens = normalize(text)
+    # 中文等无空格文本按字符二元组切，英文按词三元组
+    if len(tokens) < 3: tokens = [t[i:i + 2] for t in tokens for i in range(max(1, len(t) - 1))]
+    shingles = [" ".join(tokens[i:i + 3]) for i in range(max(1, len(tokens) - 2))]
+    weights = [0] * SIMHASH_BITS
+    for sh in shingles:
+        h = int.from_bytes(hashlib.blake2b(sh.encode(), digest_size=8).digest(), 'big')
+        for b in range(SIMHASH_BITS):
+            weights[b] += 1 if (h >> b) & 1 else -1
+    return sum(1 << b for b in range(SIMHASH_BITS) if weights[b] > 0)
+
+class NearDupIndex:
+    """按 source 分桶的 SimHash 索引，一天一个状态文件"""
+
+    def __init__(self, day_str, base=None, threshold=DEFAULT_THRESHOLD):
+        self.name = f"simhash_{day_str}.json"
+        self.base = base
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.entries = {}  # source -> [[fingerprint, topic_id, ref_id, numbers], ...]
+        self._bands = {}   # (source, band_no, band_value) -> [entry_idx, ...]
+        self.collapsed = 0
+        state = load_state(self.name, {}, base) or {}
+        for source, rows in state.get("entries", {}).items():
+            # 旧格式没有 numbers：只能与同一 topic 的快照折叠
+            for fp, tid, rid, *nums in rows: self._add(source, int(fp, 16), tid, rid, nums[0] if nums else None)
+
+    def _band_keys(self, source, fp):
+        width = SIMHASH_BITS // BANDS
+        return [(source, b, (fp >> (b * width)) & ((1 << width) - 1)) for b in range(BANDS)]
+
+    def _add(self, source, fp, topic_id, ref_id, nums):
+        rows = self.entries.setdefault(source, [])
+        rows.append([fp, topic_id, ref_id, nums])
+        for key in self._band_keys(source, fp): self._bands.setdefault(key, []).append(len(rows) - 1)
+
+    def claim(self, source, text, topic_id, ref_id, skip_topic=None, key=None):
+        """已有近似信号时返回其 topic_id；否则登记当前信号并返回 None
+        skip_topic: 不与该 topic 自身的旧快照比较（数值闸门已判定为实质变动时使用）
+        key: 标识文本（默认 text），跨 topic 折叠要求其中的数字与对方一致"""
+        fp, nums = simhash(text), numbers(text if key is None else key)
+        with self._lock:
+            rows = self.entries.get(source, [])
+            seen = set()
+            for band in self._band_keys(source, fp):
+                for idx in self._bands.get(band, []):
+                    if idx in seen: continue
+                    seen.add(idx)
+                    other_fp, other_tid, _, other_nums = rows[idx]
+                    if other_fp is None: continue  # 已 release
+                    if skip_topic is not None and other_tid == skip_topic: continue
+                    if other_tid != topic_id and other_nums != nums: continue
+                    if bin(fp ^ other_fp).count("1") <= self.threshold:
+                        self.collapsed += 1
+                        return other_tid
+            self._add(source, fp, topic_id, ref_id, nums)
+            return None
+
+    def release(self, source, ref_id):
+        """撤回 claim 登记的指纹（审计没产出结果时调用，否则当天重试会撞上自己的登记而永远不审）"""
+        with self._lock:
+            for row in self.entries.get(source, []):
+                if row[2] == ref_id: row[0] = None
+
+    def save(self):
+        with self._lock:
+            data = {"entries": {s: [[f"{fp:016x}", tid, rid, nums] for fp, tid, rid, nums in rows if fp is not None]
+                                for s, rows in self.entries.items()}}
+        return save_state(self.name, data, self.base)
@@ -0,0 +1,244 @@
+import argparse, os, sys, threading, time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+
+import telemetry
+import cassette
+import etag_cache
+from state_store import load_state, save_state
+
+# 📼 录制 / 回放要赶在建客户端之前装上（refinery 导入时再装一次是空操作）
+cassette.install("pipeline")
+
+import refinery
+
+# ==========================================
+# 🧭 流水线：refinery 与 factory 的各阶段按 输入 / 输出 声明成一张 DAG
+# ==========================================
+# python pipeline.py run                       # 全部阶段
+# python pipeline.py run report --no-deps      # 只跑 report（默认会自动带上上游 sync）
+# python pipeline.py status                    # 各阶段上次的状态 / 指纹
+# 依赖由 输出 -> 输入 推出（sync 产出 raw_signals，report / factory 读它）；互不依赖的阶段并发（harvest 与 sync 同时开跑）。
+# 每个阶段开跑前（上游都结束后）给它的输入取指纹：银行各源目录的最新提交、raw_signals 最新 created_at、当前小时、收割日期，
+# 连同 --sources / --full-scan 与上次成功时相同就跳过；任何一项取不到时照常跑。
+# 状态每个阶段结束就落盘：中途崩溃 / 超时后重跑，已完成的阶段靠指纹跳过，只补没完成的。
+# 阶段内部吞掉的错误（单个文件 / 单个源失败）记为 partial：下游照常跑，但不算成功，下次不跳过；抛出异常记为 failed，下游 blocked。
+
+PIPELINE_STATE_DIR = os.environ.get("PIPELINE_STATE_DIR") or None  # None = REFINERY_STATE_DIR
+STATE_NAME = "pipeline_state.json"
+MAX_WORKERS = int(os.environ.get("PIPELINE_WORKERS", 4))
+KEEP_RUNS = 20
+FACTORY_MASTERS_PATH = os.environ.get("FACTORY_MASTERS_PATH", "masters")
+FACTORY_VAULT_PATH = os.environ.get("FACTORY_VAULT_PATH", "../vault")
+BJ = timezone(timedelta(hours=8))
+
+# === 🔎 1. 资源指纹 ===
+def _source_names(ctx):
+    if ctx.sources: return sorted(ctx.sources)
+    return sorted(f[:-3] for f in os.listdir("./processors") if f.endswith(".py") and not f.startswith("__"))
+
+def _head(path):
+    for commit in refinery.repo().get_commits(path=path): return commit.sha
+    return ""
+
+def bank_heads(ctx):
+    """按源目录取最新提交：战报 / 归档也提交到银行，用整库 HEAD 的话 sync 永远不会跳过"""
+    return {s: _head(s) for s in _source_names(ctx)}
+
+def latest_signal(ctx):
+    res = refinery.db().table("raw_signals").select("created_at") \
+        .order("created_at", desc=True, nullsfirst=False).limit(1).execute()
+    return res.data[0]["created_at"] if res.data else ""
+
+RESOURCES = {
+    "bank": bank_heads,
+    "raw_signals": latest_signal,
+    "hour": lambda ctx: datetime.now(BJ).strftime('%Y%m%d%H'),  # 战报按小时一个文件
+    "harvest_day": lambda ctx: (datetime.now() - timedelta(days=7)).strftime('%Y%m%d'),  # 与收割的 cutoff 同一天
+}
+
+# === 🧩 2. 阶段声明 ===
+class Stage:
+    def __init__(self, name, fn, inputs=(), outputs=(), params=(), group="refinery"):
+        self.name, self.fn = name, fn
+        self.inputs, self.outputs, self.params = tuple(inputs), tuple(outputs), tuple(params)
+        self.group = group  # 遥测的 run 名：只跑一组时沿用 refinery / factory
+        self.deps = ()
+
+class Context:
+    """各阶段共享：processor 模块只加载一次（sync 的 observe 和 report 的 get_hot_items 要看到同一份增量状态）。
+    常驻模式下同一个 Context 跨轮复用，processor 注册表和工厂（大师插件、当日记忆）一直是热的"""
+
+    def __init__(self, sources=None, full_scan=False):
+        self.sources, self.full_scan = sources, full_scan
+        self.since = None  # sync 增量窗口起点，None = 最近 24 小时
+        self._procs = self._factory = None
+        self._lock = threading.Lock()
+
+    def procs(self):
+        with self._lock:
+            if self._procs is None: self._procs = refinery.get_all_processors(self.sources)
+            return self._procs
+
+    def factory(self):
+        with self._lock:
+            if self._factory is None:
+                from factory import UniversalFactory
+                self._factory = UniversalFactory(masters_path=FACTORY_MASTERS_PATH, db=refinery.db())
+            return self._factory
+
+    def persist(self):
+        """落盘已加载 processor 的增量状态（常驻进程退出时）"""
+        for name, config in (self._procs or {}).items():
+            if hasattr(config["module"], "persist"):
+                try: config["module"].persist()
+                except Exception as e: print(f"⚠️ {name} 状态落盘失败: {e}")
+
+    def params(self, names):
+        values = {"sources": sorted(self.sources) if self.sources else None, "full_scan": self.full_scan}
+        return {k: values[k] for k in names}
+
+def run_sync(ctx): return refinery.sync_bank_to_sql(ctx.procs(), full_scan=ctx.full_scan, since=ctx.since)
+def run_report(ctx): return refinery.generate_hot_reports(ctx.procs())
+def run_harvest(ctx): return refinery.perform_grand_harvest({})  # harvest 不需要 processor 模块
+
+def run_factory(ctx):
+    if not os.environ.get("SILICON_FLOW_KEY"): raise RuntimeError("未检测到 SILICON_FLOW_KEY 环境变量")
+    return ctx.factory().process_and_ship(vault_path=FACTORY_VAULT_PATH)
+
+STAGES = {s.name: s for s in [
+    Stage("sync", run_sync, inputs=["bank"], outputs=["raw_signals"], params=["sources", "full_scan"]),
+    Stage("report", run_report, inputs=["raw_signals", "hour"], outputs=["reports"], params=["sources"]),
+    Stage("harvest", run_harvest, inputs=["harvest_day"], outputs=["archive"]),
+    Stage("factory", run_factory, inputs=["raw_signals"], outputs=["vault"], group="factory"),
+]}
+
+# 依赖 = 产出自己输入的阶段（声明顺序即拓扑序）
+for _s in STAGES.values():
+    _s.deps = tuple(p.name for p in STAGES.values() if p is not _s and set(p.outputs) & set(_s.inputs))
+
+def select(names=None, with_deps=True):
+    unknown = set(names or ()) - set(STAGES)
+    if unknown: raise ValueError(f"未知阶段: {', '.join(sorted(unknown))}")
+    picked = set()
+    def visit(name):
+        if name in picked: return
+        picked.add(name)
+        if with_deps:
+            for d in STAGES[name].deps: visit(d)
+    for name in names or STAGES: visit(name)
+    return [n for n in STAGES if n in picked]
+
+# === ⚙️ 3. 执行 ===
+def fingerprint(stage, ctx):
+    inputs = {}
+    with telemetry.span(f"inputs.{stage.name}") as sp:
+        for name in stage.inputs:
+            try: inputs[name] = RESOURCES[name](ctx)
+            except (Exception, SystemExit) as e:
+                sp.error(e)
+                inputs[name] = None
+                print(f"⚠️ [{stage.name}] 输入 {name} 取指纹失败，照常执行: {e}")
+    return {"inputs": inputs, "params": ctx.params(stage.params)}
+
+def run(targets, ctx, force=False, quiet=False):
+    """按依赖调度 targets，返回 {阶段: ok / partial / skipped / failed / blocked}。quiet：不打印跳过的阶段（常驻轮询用）"""
+    state = load_state(STATE_NAME, {}, base=PIPELINE_STATE_DIR) or {}
+    last = state.setdefault("stages", {})
+    state.setdefault("runs", [])
+    record = {"id": datetime.now(BJ).strftime('%Y%m%d_%H%M%S'), "targets": targets, "stages": {}}
+    lock = threading.Lock()
+    status = {}
+
+    def finish(name, st, info=None):
+        with lock:
+            status[name] = record["stages"][name] = st
+            if st == "skipped": return st  # 全部跳过的轮次不写盘、不占运行记录
+            if info is not None: last[name] = info
+            if not state["runs"] or state["runs"][-1] is not record:
+                state["runs"] = state["runs"][-(KEEP_RUNS - 1):] + [record]
+            save_state(STATE_NAME, state, base=PIPELINE_STATE_DIR)
+        return st
+
+    def execute(stage):
+        fp = fingerprint(stage, ctx)
+        prev = last.get(stage.name) or {}
+        if not force and prev.get("status") == "ok" and prev.get("fingerprint") == fp \
+                and None not in fp["inputs"].values():
+            if not quiet: print(f"⏭️ [{stage.name}] 输入未变（上次成功 {prev.get('finished')}），跳过")
+            return finish(stage.name, "skipped")
+        print(f"▶️ [{stage.name}] 开始")
+        t0 = time.perf_counter()
+        info = {"fingerprint": fp}
+        try:
+            result = stage.fn(ctx) or {}
+            st = "partial" if result.get("errors") else "ok"
+            info["result"] = result
+        except (Exception, SystemExit) as e:
+            st = "failed"
+            info["error"] = f"{type(e).__name__}: {e}"[:200]
+            telemetry.error(e)
+            print(f"❌ [{stage.name}] 失败: {e}")
+        info.update(status=st, seconds=round(time.perf_counter() - t0, 2), finished=datetime.now(BJ).isoformat(timespec='seconds'))
+        print(f"{'✅' if st == 'ok' else '⚠️' if st == 'partial' else '❌'} [{stage.name}] {st} ({info['seconds']}s)")
+        return finish(stage.name, st, info)
+
+    pending, running = list(targets), {}
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as pool:
+        while pending or running:
+            for name in list(pending):
+                deps = [d for d in STAGES[name].deps if d in targets]  # --no-deps 时上游不在本轮，不等
+                if any(status.get(d) in ("failed", "blocked") for d in deps):
+                    pending.remove(name)
+                    print(f"🚫 [{name}] 上游失败，不执行")
+                    finish(name, "blocked")
+                elif all(d in status for d in deps):
+                    pending.remove(name)
+                    running[pool.submit(execute, STAGES[name])] = name
+            if not running: break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for f in done: status[running.pop(f)] = f.result()
+    # 🏷️ 本轮 GitHub 条件请求命中率与剩余额度，记进运行记录
+    github = etag_cache.report(quiet=quiet and all(st == "skipped" for st in status.values()))
+    if github and state["runs"] and state["runs"][-1] is record:
+        record["github"] = github
+        save_state(STATE_NAME, state, base=PIPELINE_STATE_DIR)
+    return status
+
+# === 🎛️ 4. 命令行 ===
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Pipeline：按依赖并发执行 refinery / factory 各阶段，输入未变的阶段跳过")
+    sub = ap.add_subparsers(dest="command", required=True)
+    r = sub.add_parser("run", help="执行阶段（默认全部）")
+    r.add_argument("stages", nargs="*", help=f"要跑的阶段：{' / '.join(STAGES)}")
+    r.add_argument("--sources", help="逗号分隔，只处理这些源（如 twitter,github），默认全部")
+    r.add_argument("--full-scan", action="store_true", default=os.environ.get("FORCE_FULL_SCAN") == "true",
+                   help="sync 全量补录（默认取 FORCE_FULL_SCAN）")
+    r.add_argument("--force", action="store_true", help="忽略指纹，全部重跑")
+    r.add_argument("--no-deps", action="store_true", help="不自动带上上游阶段")
+    sub.add_parser("status", help="打印各阶段上次的状态")
+    return ap.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "status":
+        state = load_state(STATE_NAME, {}, base=PIPELINE_STATE_DIR) or {}
+        for name in STAGES:
+            s = (state.get("stages") or {}).get(name)
+            print(f"{name:<8} " + (f"{s['status']:<8} {s.get('finished')} {s.get('seconds')}s" if s else "-"))
+        return 0
+    try: targets = select(args.stages, with_deps=not args.no_deps)
+    except ValueError as e: sys.exit(f"❌ {e}")
+    sources = {s.strip() for s in args.sources.split(",") if s.strip()} if args.sources else None
+    groups = {STAGES[n].group for n in targets}
+    telemetry.start(groups.pop() if len(groups) == 1 else "pipeline")
+    try:
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] 🧭 流水线: {' -> '.join(targets)}")
+        status = run(targets, Context(sources, args.full_scan), force=args.force)
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] 🧭 " + " | ".join(f"{n}={status.get(n)}" for n in targets))
+    finally:
+        telemetry.emit()
+    return 1 if {"failed", "blocked"} & set(status.values()) else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
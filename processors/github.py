@@ -1,8 +1,37 @@
 import json
+import math
 from datetime import datetime, timedelta
+import ranking
+from leaderboard import Leaderboard
+from star_series import StarSeries
 
 TABLE_NAME = "github_logs"
 
+# 🏁 滚动 24h 榜单：去重参数与 get_hot_items 一致，refinery 入库后调用 observe()
+BOARD = Leaderboard("github", "repo_name", by="stars")
+# ⭐ 星数时序：入库时增量追加，Trending 按星速排
+_SERIES = None
+VELOCITY_TOP = 30
+
+def series():
+    global _SERIES
+    if _SERIES is None: _SERIES = StarSeries()
+    return _SERIES
+
+def observe(rows):
+    BOARD.observe(rows)
+    return series().update(rows)
+
+def persist():
+    BOARD.save()
+    if _SERIES is not None: _SERIES.save()
+
+def reconcile(db):
+    BOARD.reconcile(db)
+
+def checkpoint():
+    BOARD.checkpoint()
+
 def fmt_k(num):
     if not num: return "-"
     try: n = float(num)
@@ -36,50 +65,71 @@ def process(raw_data, path):
         refined_results.append(row)
     return refined_results
 
+# 🏷️ 入库打分（scoring.annotate）：星数；星速随时间变，取回之后按 StarSeries 再排。话题 = 第一个策略标签
+RANK_COLUMNS = ("stars", "topics")
+
+def rank(row):
+    tags = row.get('topics') or []
+    if isinstance(tags, str):
+        try: tags = json.loads(tags)
+        except: tags = []
+    return row.get('stars') or 0, (tags[0] if tags else None)
+
 # === 2. 战报生成逻辑 (修改版：单榜单模式) ===
 def get_hot_items(supabase, table_name):
     # 只看最近 24 小时
-    yesterday = (datetime.now() - timedelta(hours=24)).isoformat()
-    try:
-        res = supabase.table(table_name).select("*").gt("bj_time", yesterday).execute()
-        all_repos = res.data if res.data else []
-    except Exception as e: return {}
+    all_repos = BOARD.rows(supabase)
+    if all_repos is None:
+        yesterday = (datetime.now() - timedelta(hours=24)).isoformat()
+        try:
+            res = supabase.table(table_name).select("*").gt("bj_time", yesterday).execute()
+            all_repos = res.data if res.data else []
+        except Exception as e: return {}
     
     if not all_repos: return {}
 
     # 1. 去重：同名项目只留 Star 最高的那个记录
-    unique_repos = {}
-    for r in all_repos:
-        name = r.get('repo_name')
-        if not name: continue
-        if name not in unique_repos or r['stars'] > unique_repos[name]['stars']:
-            unique_repos[name] = r
+    repos = ranking.load_frame(all_repos, ["stars", "repo_name"], ranking.dedup(all_repos, "repo_name", by="stars"))
+    repos["stars"] = ranking.num(repos, "stars")
 
     # 2. 排序：直接按 Star 数降序，取 Top 30
-    repo_list = list(unique_repos.values())
-    repo_list.sort(key=lambda x: x['stars'], reverse=True)
-    final_list = repo_list[:30]
+    final_list = ranking.records(ranking.top(repos, "stars", 30), all_repos)
 
-    # 3. 构建单一宽表
-    header = "| Stars | 项目 | 核心标签 | 🔗 |\n| :--- | :--- | :--- | :--- |"
-    rows = []
-    
-    for r in final_list:
-        stars = fmt_k(r['stars'])
-        name = r.get('repo_name', 'Unknown')
-        
+    # 3. 星速榜：按 ⭐/h 排（老牌大项目星数高但不涨，不再霸榜）；还没有历史时不出这个板块
+    vel, acc = series().velocity(list(repos["repo_name"]))
+    repos = repos.assign(_velocity=vel, _accel=acc)
+    rising = repos[repos["_velocity"] > 0]
+    trending = ranking.records(ranking.top(rising, "_velocity", VELOCITY_TOP), all_repos, extra=("_velocity", "_accel"))
+
+    def tag_str(r):
         # 处理标签显示
         raw_tags = r.get('topics', [])
         if isinstance(raw_tags, str):
             try: raw_tags = json.loads(raw_tags)
             except: raw_tags = []
-            
         # 标签美化：只显示前2个，用代码块包裹看起来更像标签
         # e.g. `AI_CORE`, `VIRAL_GIANT`
-        tag_str = " ".join([f"`{t}`" for t in raw_tags[:2]]) if raw_tags else "-"
-        
+        return " ".join([f"`{t}`" for t in raw_tags[:2]]) if raw_tags else "-"
+
+    report = {}
+    if trending:
+        header = "| ⭐/h | 加速 | Stars | 项目 | 核心标签 | 🔗 |\n| :--- | :--- | :--- | :--- | :--- | :--- |"
+        rows = []
+        for r in trending:
+            accel = "-" if math.isnan(r['_accel']) else f"{r['_accel']:+.1f}"
+            rows.append(f"| 🚀 {r['_velocity']:.1f} | {accel} | ⭐ {fmt_k(r['stars'])} | **{r.get('repo_name', 'Unknown')}** | {tag_str(r)} | [🔗]({r.get('url', '#')}) |")
+        report[f"🚀 GitHub Trending (Star Velocity Top {VELOCITY_TOP})"] = {"header": header, "rows": rows}
+
+    # 4. 构建单一宽表
+    header = "| Stars | 项目 | 核心标签 | 🔗 |\n| :--- | :--- | :--- | :--- |"
+    rows = []
+    
+    for r in final_list:
+        stars = fmt_k(r['stars'])
+        name = r.get('repo_name', 'Unknown')
         url = r.get('url', '#')
         
-        rows.append(f"| ⭐ {stars} | **{name}** | {tag_str} | [🔗]({url}) |")
+        rows.append(f"| ⭐ {stars} | **{name}** | {tag_str(r)} | [🔗]({url}) |")
         
-    return {"🏆 GitHub Trending (Global Top 30)": {"header": header, "rows": rows}}
+    report["🏆 GitHub Trending (Global Top 30)"] = {"header": header, "rows": rows}
+    return report
@@ -1,9 +1,27 @@
 import json
 from datetime import datetime, timedelta
+import numpy as np
+import ranking
+from leaderboard import Leaderboard
 
 # 对应 Supabase 里的表名
 TABLE_NAME = "papers_logs"
 
+# 🏁 滚动 24h 榜单：去重参数与 get_hot_items 一致，refinery 入库后调用 observe()
+BOARD = Leaderboard("papers", "title", by="citations", default=0)
+
+def observe(rows):
+    return BOARD.observe(rows)
+
+def persist():
+    BOARD.save()
+
+def reconcile(db):
+    BOARD.reconcile(db)
+
+def checkpoint():
+    BOARD.checkpoint()
+
 def fmt_k(num):
     if not num: return "0"
     try: n = float(num)
@@ -40,55 +58,53 @@ def process(raw_data, path):
         refined_results.append(row)
     return refined_results
 
+# 🏷️ 入库打分（scoring.annotate）：与前沿池同一公式；话题 = 论文类型（signal_type 入库时会被改写成源名，类型只留在这里）
+RANK_COLUMNS = ("signal_type", "strategies", "citations")
+
+def rank(row):
+    kind = str(row.get('signal_type') or "")
+    score = (10000 if "EARLY" in kind else 0) + (5000 if row.get('strategies') else 0) + (row.get('citations') or 0)
+    return score, kind or None
+
 # === 2. 战报生成逻辑 (🔥 修改：3核爆 + 7前沿) ===
 def get_hot_items(supabase, table_name):
     # 获取最近 24 小时数据
-    yesterday = (datetime.now() - timedelta(hours=24)).isoformat()
-    try:
-        res = supabase.table(table_name).select("*").gt("bj_time", yesterday).execute()
-        all_papers = res.data if res.data else []
-    except Exception as e:
-        print(f"Papers DB Error: {e}")
-        return {}
+    all_papers = BOARD.rows(supabase)
+    if all_papers is None:
+        yesterday = (datetime.now() - timedelta(hours=24)).isoformat()
+        try:
+            res = supabase.table(table_name).select("*").gt("bj_time", yesterday).execute()
+            all_papers = res.data if res.data else []
+        except Exception as e:
+            print(f"Papers DB Error: {e}")
+            return {}
     
     if not all_papers: return {}
 
     # A. 去重 (保留引用更高的版本)
-    unique_map = {}
-    for p in all_papers:
-        title = p.get("title")
-        if not title: continue
-        if title not in unique_map or p.get("citations", 0) > unique_map[title].get("citations", 0):
-            unique_map[title] = p
-    papers = list(unique_map.values())
+    papers = ranking.load_frame(all_papers, ["citations", "signal_type", "strategies"],
+                                ranking.dedup(all_papers, "title", by="citations", default=0))
+    papers["citations"] = ranking.num(papers, "citations")
     
     # 🔥 B. 咨询顾问筛选法 (Consultant's Filter)
+    signal_type = papers["signal_type"].fillna("").astype(str)
     
     # 1. ☢️ Nuclear Pool (核爆池) - 只要前 3 个
     # 这些是必须知道的大事件
-    nuclear_pool = [p for p in papers if "NUCLEAR" in p.get("signal_type", "")]
-    nuclear_pool.sort(key=lambda x: x.get("citations", 0), reverse=True)
-    final_nuclear = nuclear_pool[:3]
+    nuclear = ranking.top(papers[signal_type.str.contains("NUCLEAR", regex=False)], "citations", 3)
 
     # 2. ⚡ Frontier Pool (前沿池) - 只要前 7 个
     # 核心逻辑：找 "EARLY" 信号，或者是带有特定策略标签的论文
     # 如果引用数不高但被标记为 EARLY，说明它是潜力股
-    def frontier_score(p):
-        score = 0
-        # 只要是 Early 就给高分，压倒普通的高引用论文
-        if "EARLY" in p.get("signal_type", ""): score += 10000
-        # 有策略标签（如 BIO_REVOLUTION）加分
-        if p.get("strategies"): score += 5000
-        # 最后才看引用数，作为辅助
-        score += p.get("citations", 0)
-        return score
+    # 只要是 Early 就给高分，压倒普通的高引用论文；有策略标签（如 BIO_REVOLUTION）加分；最后才看引用数
+    early = signal_type.str.contains("EARLY", regex=False).to_numpy()
+    has_strategy = np.array([bool(x) for x in papers["strategies"]], dtype=bool)
+    papers = papers.assign(_frontier=np.where(early, 10000, 0) + np.where(has_strategy, 5000, 0) + papers["citations"].to_numpy(dtype=float))
 
     # 排除掉已经选入 Nuclear 的
-    nuclear_ids = {p['title'] for p in final_nuclear}
-    remaining_papers = [p for p in papers if p['title'] not in nuclear_ids]
-    
-    remaining_papers.sort(key=frontier_score, reverse=True)
-    final_frontier = remaining_papers[:7]
+    remaining = papers[~papers[ranking.POS].isin(nuclear[ranking.POS])]
+    final_nuclear = ranking.records(nuclear, all_papers)
+    final_frontier = ranking.records(ranking.top(remaining, "_frontier", 7), all_papers)
 
     # 合并列表
     final_display_list = final_nuclear + final_frontier
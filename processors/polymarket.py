@@ -1,10 +1,48 @@
 import json
 import math
+import re
 from datetime import datetime, timedelta
+from keyword_engine import KeywordMatcher
+import numpy as np
+import pyarrow as pa
+import columnar
+import ranking
+from leaderboard import Leaderboard
+from market_series import MarketSeries, market_key, momentum_boost
 
 TABLE_NAME = "polymarket_logs"
 RADAR_TARGET_TOTAL = 50  
 
+# 🎯 狙击词：命中即 x100（提名类 warsh 新闻不算）
+SNIPERS = ["gold", "bitcoin", "btc", "fed", "federal reserve", "xau"]
+SNIPER_MATCHER = KeywordMatcher({"sniper": SNIPERS, "veto": ["warsh"]})
+
+# 📈 盘口时序：入库时增量更新，打分时乘上动量系数（无历史时 x1，排名不变）
+_SERIES = None
+# 🏁 滚动 24h 榜单：每个市场只留最新快照，与 get_hot_items 的去重一致
+BOARD = Leaderboard("polymarket", market_key, by="bj_time", default='0')
+
+def series():
+    """本进程共用的盘口时序（首次使用时从状态目录加载）"""
+    global _SERIES
+    if _SERIES is None: _SERIES = MarketSeries()
+    return _SERIES
+
+def observe(rows):
+    """refinery 每写一批就喂一次：增量追加到各市场的环形缓冲和 24h 榜单"""
+    BOARD.observe(rows)
+    return series().update(rows)
+
+def persist():
+    BOARD.save()
+    if _SERIES is not None: _SERIES.save()
+
+def reconcile(db):
+    BOARD.reconcile(db)
+
+def checkpoint():
+    BOARD.checkpoint()
+
 # 🎨 美化工具
 def fmt_k(num, prefix=""):
     if not num: return "-"
@@ -29,12 +67,119 @@ def parse_num(val):
     try: return float(s)
     except: return 0
 
+# 💰 价格入库时解析一次：outcomes / outcome_probs（百分点）/ yes_prob，下游只读数字
+_PRICE_PAIR_RE = re.compile(r"([^:|/,{}\[\]'\"]+?)\s*:\s*(-?[\d.]+)\s*(%?)")
+_YES_NAMES = ("yes", "up")
+
+def parse_prices(val, names=None):
+    """prices 的各种形态 -> (outcomes, probs)，probs 统一为百分点；解析不了返回 ([], [])
+    支持 "Yes: 0.5% | No: 99.5%"、{"Yes": 0.55}、[0.55, 0.45]（名字取 names，二元默认 Yes/No）及其 JSON 文本"""
+    if val is None: return [], []
+    pct = False
+    if isinstance(val, str):
+        s = val.strip()
+        if s[:1] in "{[":
+            try: return parse_prices(json.loads(s.replace("'", '"')), names)
+            except ValueError: pass
+        pairs = _PRICE_PAIR_RE.findall(s)
+        if pairs:
+            outcomes, raw, pct = [n.strip() for n, _, _ in pairs], [p for _, p, _ in pairs], any(m for _, _, m in pairs)
+        else:
+            outcomes, raw = ["Yes"], [s]
+    elif isinstance(val, dict):
+        outcomes, raw = [str(k) for k in val], list(val.values())
+    elif isinstance(val, (list, tuple)):
+        raw = list(val)
+        if isinstance(names, str):
+            try: names = json.loads(names)
+            except ValueError: names = None
+        if names and len(names) == len(raw): outcomes = [str(n) for n in names]
+        elif len(raw) == 2: outcomes = ["Yes", "No"]
+        else: outcomes = [f"#{k + 1}" for k in range(len(raw))]
+    else:
+        outcomes, raw = ["Yes"], [val]
+    probs = []
+    for v in raw:
+        try: probs.append(float(str(v).replace('%', '').strip()))
+        except ValueError: return [], []
+    # 没有 % 且全部 <= 1：按小数概率处理
+    if not pct and probs and all(0 <= x <= 1 for x in probs): probs = [round(x * 100, 6) for x in probs]
+    return outcomes, probs
+
+def yes_prob(outcomes, probs):
+    """Yes/Up 那一边的概率；没有 Yes/Up 的多选市场取领先选项"""
+    for n, p in zip(outcomes, probs):
+        if n.lower() in _YES_NAMES: return p
+    return max(probs) if probs else None
+
+def fmt_prices(row):
+    """报表价格列：优先用数值列，老数据回退到原始字符串（'|' 会打断 Markdown 表格）"""
+    outcomes, probs = row.get('outcomes'), row.get('outcome_probs')
+    if outcomes and probs:
+        return " / ".join(f"{n}: {p:.1f}%" for n, p in zip(outcomes, probs))
+    return str(row.get('prices', 'N/A')).replace('|', '/')
+
+def _tags(val):
+    """strategy_tags 一律落成 list（上游偶尔给 JSON 文本或单个字符串）"""
+    if not val: return []
+    if isinstance(val, str):
+        try: val = json.loads(val)
+        except ValueError: return [val]
+    return [str(t) for t in val] if isinstance(val, (list, tuple)) else [str(val)]
+
+# 列式入库 schema：字段与 process() 的 dict 一一对应
+SCHEMA = columnar.schema([
+    ("bj_time", pa.string()), ("title", pa.string()), ("slug", pa.string()), ("ticker", pa.string()),
+    ("question", pa.string()), ("prices", pa.string()),
+    ("outcomes", pa.list_(pa.string())), ("outcome_probs", pa.list_(pa.float64())), ("yes_prob", pa.float64()),
+    ("category", pa.string()),
+    ("volume", pa.float64()), ("liquidity", pa.float64()), ("vol24h", pa.float64()), ("day_change", pa.float64()),
+    ("engine", pa.string()), ("strategy_tags", pa.list_(pa.string())), ("raw_json", pa.string()),
+])
+
+def _items(raw_data):
+    if isinstance(raw_data, dict) and "items" in raw_data: return raw_data["items"]
+    if isinstance(raw_data, list): return raw_data
+    return [raw_data]
+
+def process_batches(raw_data, path, batch_rows=None):
+    """process() 的列式版本：直接填 Arrow 列，每 batch_rows 行产出一张 pa.Table"""
+    engine_type = "sniper" if "sniper" in path.lower() else "radar"
+    force_now_time = (datetime.utcnow() + timedelta(hours=8)).isoformat()
+    builder = columnar.ColumnBuilder(SCHEMA)
+    (bj_time, title, slug, ticker, question, prices, outcomes, outcome_probs, best_yes, category,
+     volume, liquidity, vol24h, day_change, engine, strategy_tags, raw_json) = builder.appenders()
+    dumps = columnar.dumps
+    for batch in columnar.batched(_items(raw_data), batch_rows):
+        for item in batch:
+            raw_time = item.get('updatedAt')
+            bj_time(to_bj_time(raw_time) if raw_time else force_now_time)
+            title(item.get('eventTitle'))
+            slug(item.get('slug'))
+            ticker(item.get('ticker'))
+            question(item.get('question'))
+            prices(str(item.get('prices')))
+            names, probs = parse_prices(item.get('prices'), item.get('outcomes'))
+            outcomes(names)
+            outcome_probs(probs)
+            best_yes(yes_prob(names, probs))
+            category(item.get('category', 'OTHER'))
+            volume(parse_num(item.get('volume')))
+            liquidity(parse_num(item.get('liquidity')))
+            vol24h(parse_num(item.get('vol24h')))
+            day_change(parse_num(item.get('dayChange')))
+            engine(engine_type)
+            strategy_tags(_tags(item.get('strategy_tags')))
+            raw_json(dumps(item))
+        yield builder.flush()
+
+def process_columns(raw_data, path):
+    return columnar.concat(process_batches(raw_data, path))
+
 def process(raw_data, path):
     processed_list = []
     engine_type = "sniper" if "sniper" in path.lower() else "radar"
-    if isinstance(raw_data, dict) and "items" in raw_data: items = raw_data["items"]
-    elif isinstance(raw_data, list): items = raw_data
-    else: items = [raw_data]
+    items = _items(raw_data)
 
     # 1. 备用时间（仅当 JSON 里没时间时使用）
     force_now_time = (datetime.utcnow() + timedelta(hours=8)).isoformat()
@@ -44,6 +189,7 @@ def process(raw_data, path):
         # Polymarket 原始 JSON 通常带有 updatedAt 字段
         raw_time = item.get('updatedAt') 
         bj_time_final = to_bj_time(raw_time) if raw_time else force_now_time
+        names, probs = parse_prices(item.get('prices'), item.get('outcomes'))
         
         entry = {
             "bj_time": bj_time_final, # ✅ 现在它是真实的或者是当时入库的时间
@@ -52,84 +198,83 @@ def process(raw_data, path):
             "ticker": item.get('ticker'),
             "question": item.get('question'),
             "prices": str(item.get('prices')),
+            "outcomes": names,
+            "outcome_probs": probs,
+            "yes_prob": yes_prob(names, probs),
             "category": item.get('category', 'OTHER'),
             "volume": parse_num(item.get('volume')),
             "liquidity": parse_num(item.get('liquidity')),
             "vol24h": parse_num(item.get('vol24h')),
             "day_change": parse_num(item.get('dayChange')),
             "engine": engine_type,
-            "strategy_tags": item.get('strategy_tags', []),
+            "strategy_tags": _tags(item.get('strategy_tags')),
             "raw_json": item
         }
         processed_list.append(entry)
     return processed_list
 
-def calculate_score(item):
+def static_score(item):
+    """与时间无关的部分（入库时写进 rank_score）：vol24h * (|day_change| + 1)，狙击词 x100，TAIL_RISK x50"""
     vol24h = float(item.get('vol24h') or 0)
     day_change = abs(float(item.get('dayChange') or item.get('day_change') or 0))
     score = vol24h * (day_change + 1)
-    text = (str(item.get('title')) + " " + str(item.get('question'))).lower()
-    snipers = ["gold", "bitcoin", "btc", "fed", "federal reserve", "xau"]
-    if any(k in text for k in snipers) and "warsh" not in text: score *= 100
+    text = str(item.get('title')) + " " + str(item.get('question'))
+    hits = SNIPER_MATCHER.match(text)
+    if "sniper" in hits and "veto" not in hits: score *= 100
     tags = item.get('strategy_tags') or []
     if 'TAIL_RISK' in tags: score *= 50
     return score
 
-# 🔥 修复 f-string 报错
-def get_win_rate_str(price_str):
-    try:
-        if "Yes:" in price_str: 
-            val = float(price_str.split('Yes:')[1].split('%')[0])
-            return f"Yes {val:.0f}%"
-        if "Up:" in price_str: 
-            val = float(price_str.split('Up:')[1].split('%')[0])
-            return f"Up {val:.0f}%"
-        if "{" in price_str:
-            clean_json = price_str.replace("'", '"')
-            val = float(json.loads(clean_json)) * 100
-            return f"{val:.0f}%"
-    except: pass
-    return str(price_str)[:15]
+def calculate_score(item):
+    return static_score(item) * float(momentum_boost(series().zscores([market_key(item)])[0]))
+
+# 🏷️ 入库打分（scoring.annotate）：动量随时间变，取回之后再乘
+RANK_COLUMNS = ("vol24h", "day_change", "dayChange", "title", "question", "strategy_tags", "category")
+
+def rank(row):
+    return static_score(row), row.get('category')
+
+def score_frame(df):
+    """calculate_score 的列式版本：vol24h * (|day_change| + 1)，狙击词 x100，TAIL_RISK x50，再乘动量系数"""
+    day_change = ranking.num(df, 'dayChange')
+    dc = day_change.where(day_change != 0, ranking.num(df, 'day_change'))
+    score = ranking.num(df, 'vol24h').to_numpy(dtype=float) * (np.abs(dc.to_numpy(dtype=float)) + 1)
+    texts = [str(t) + " " + str(q) for t, q in zip(df['title'], df['question'])]
+    sniper = np.array([("sniper" in h and "veto" not in h) for h in map(SNIPER_MATCHER.match, texts)], dtype=bool)
+    tail = np.array(['TAIL_RISK' in (t or []) for t in df['strategy_tags']], dtype=bool)
+    score = np.where(sniper, score * 100, score)
+    score = np.where(tail, score * 50, score)
+    keys = [f"{s}_{q}" for s, q in zip(df['slug'], df['question'])]
+    return score * momentum_boost(series().zscores(keys))
 
 def get_hot_items(supabase, table_name):
-    yesterday = (datetime.now() - timedelta(hours=24)).isoformat()
-    try:
-        res = supabase.table(table_name).select("*").gt("bj_time", yesterday).execute()
-        all_data = res.data if res.data else []
-    except Exception as e: return {}
+    all_data = BOARD.rows(supabase)
+    if all_data is None:
+        yesterday = (datetime.now() - timedelta(hours=24)).isoformat()
+        try:
+            res = supabase.table(table_name).select("*").gt("bj_time", yesterday).execute()
+            all_data = res.data if res.data else []
+        except Exception as e: return {}
     if not all_data: return {}
 
-    # 🔥 1. 快照去重：只留最新时间戳
-    def deduplicate_snapshots(items):
-        latest_map = {}
-        for item in items:
-            unique_key = f"{item['slug']}_{item['question']}"
-            if unique_key not in latest_map:
-                latest_map[unique_key] = item
-            else:
-                if item.get('bj_time', '0') > latest_map[unique_key].get('bj_time', '0'):
-                    latest_map[unique_key] = item
-        return list(latest_map.values())
-
-    clean_data = deduplicate_snapshots(all_data)
-    
-    sniper_pool = [i for i in clean_data if i.get('engine') == 'sniper']
-    radar_pool = [i for i in clean_data if i.get('engine') == 'radar']
+    # 🔥 1. 快照去重：只留最新时间戳（列式装载一次，打分一次）
+    latest = ranking.dedup(all_data, market_key, by="bj_time", default='0')
+    clean = ranking.load_frame(all_data, ["slug", "question", "engine", "category", "title",
+                                          "vol24h", "day_change", "dayChange", "strategy_tags"], latest)
+    clean = clean.assign(_temp_score=score_frame(clean))
+
+    sniper_pool = clean[clean["engine"] == 'sniper']
+    radar_pool = clean[clean["engine"] == 'radar']
     sector_matrix = {}
     global_seen_slugs = set()
 
-    def anti_flood_filter(items):
-        grouped = {}
-        for i in items:
-            s = i['slug']
-            if s not in grouped: grouped[s] = []
-            grouped[s].append(i)
-        final = []
-        for s, rows in grouped.items():
-            for r in rows: r['_temp_score'] = calculate_score(r)
-            rows.sort(key=lambda x: x['_temp_score'], reverse=True)
-            final.extend(rows[:2])
-        return final
+    def anti_flood_filter(pool):
+        """同一板块内每个 slug 最多 2 条，再按分数稳定排序（并列按 slug 首次出现顺序）；所有板块一次算完"""
+        pool = pool.assign(_grp=np.arange(len(pool)))
+        pool = pool.assign(_grp=pool.groupby(["_sector", "slug"], sort=False, dropna=False)["_grp"].transform('min').values)
+        pool = pool.sort_values(["_sector", "_grp", "_temp_score"], ascending=[True, True, False], kind='stable')
+        pool = ranking.quota(pool, ["_sector", "slug"], 2)
+        return pool.sort_values(["_sector", "_temp_score"], ascending=[True, False], kind='stable')
 
     # 🔥 2. 构建 8 列宽表
     def build_markdown(items):
@@ -150,21 +295,14 @@ def get_hot_items(supabase, table_name):
             q_text_short = q_text[:50] + "..." # 稍微加长一点
             question = f"[{q_text_short}](https://polymarket.com/event/{i['slug']})"
             
-            # 4. 🔥 核心修改：价格显示
-            # 假设 i['prices'] 是类似 "Yes: 0.5% | No: 99.5%" 的字符串
-            # 必须把中间的 '|' 替换掉，否则 Markdown 表格会崩坏
-            # 方案 A: 用斜杠 (Yes: 0.5% / No: 99.5%)
-            raw_prices = str(i.get('prices', 'N/A'))
-            prices = raw_prices.replace('|', '/') 
-            
-            # 方案 B (可选): 如果支持 HTML，可以用 <br> 换行显示更清晰
-            # prices = raw_prices.replace('|', '<br>') 
+            # 4. 🔥 价格显示：入库时已解析成数值列，这里只做格式化
+            prices = fmt_prices(i)
 
             # 其他数值保持不变
             vol = fmt_k(i.get('volume', 0), '$')
             liq = fmt_k(i.get('liquidity', 0), '$')
             v24 = fmt_k(i.get('vol24h', 0), '$')
-            tags = ", ".join(i.get('strategy_tags', []))[:20] # Tags 也稍微放宽一点
+            tags = ", ".join(_tags(i.get('strategy_tags')))[:20] # Tags 也稍微放宽一点
 
             row = f"| **{signal}** | {title} | {question} | {prices} | {vol} | {liq} | {v24} | {tags} |"
             rows.append(row)
@@ -175,10 +313,9 @@ def get_hot_items(supabase, table_name):
                 
         return {"header": header, "rows": rows}
 
-    if sniper_pool:
-        refined = anti_flood_filter(sniper_pool)
-        refined.sort(key=lambda x: x['_temp_score'], reverse=True)
-        sector_matrix["🎯 SNIPER (核心监控)"] = build_markdown(refined)
+    if not sniper_pool.empty:
+        refined = anti_flood_filter(sniper_pool.assign(_sector=0))
+        sector_matrix["🎯 SNIPER (核心监控)"] = build_markdown(ranking.records(refined, all_data, extra=("_temp_score",)))
 
     # 🔥 3. 顺序：政治压轴
     SECTORS_LIST = [
@@ -193,17 +330,23 @@ def get_hot_items(supabase, table_name):
         'CLIMATE': 'Climate-Science', 'GLOBAL WARMING': 'Climate-Science', 'ENVIRONMENT': 'Climate-Science'
     }
 
-    if radar_pool:
-        for s in SECTORS_LIST:
-            pool = [
-                i for i in radar_pool 
-                if (MAP.get(i.get('category'), 'Other') == s or i.get('category') == s.upper())
-                and i['slug'] not in global_seen_slugs
-            ]
-            if not pool: continue
-            refined = anti_flood_filter(pool)
-            refined.sort(key=lambda x: x['_temp_score'], reverse=True)
-            quota = max(3, math.ceil((len(pool) / len(radar_pool)) * RADAR_TARGET_TOTAL))
-            sector_matrix[s] = build_markdown(refined[:quota])
+    if not radar_pool.empty:
+        # 每个 category 只会落进一个板块：先算出板块序号，所有板块一次性去刷屏排好序
+        # 已展示过的 slug 整组剔除，不改变其余 slug 的相对顺序，所以逐板块时只需再做一次过滤
+        def sector_index(c):
+            for k, s in enumerate(SECTORS_LIST):
+                if MAP.get(c, 'Other') == s or c == s.upper(): return k
+            return -1
+        lookup = {c: sector_index(c) for c in radar_pool["category"].unique()}
+        pool = radar_pool.assign(_sector=radar_pool["category"].map(lookup).values)
+        members = dict(tuple(pool.groupby("_sector", sort=False)))
+        flooded = dict(tuple(anti_flood_filter(pool[pool["_sector"] >= 0]).groupby("_sector", sort=False)))
+        for k, s in enumerate(SECTORS_LIST):
+            if k not in members: continue
+            size = int((~members[k]["slug"].isin(global_seen_slugs)).sum())
+            if not size: continue
+            refined = flooded[k][~flooded[k]["slug"].isin(global_seen_slugs)]
+            quota = max(3, math.ceil((size / len(radar_pool)) * RADAR_TARGET_TOTAL))
+            sector_matrix[s] = build_markdown(ranking.records(refined.head(quota), all_data, extra=("_temp_score",)))
 
     return sector_matrix
@@ -1,10 +1,27 @@
 import json
 from datetime import datetime, timedelta
+import ranking
+from leaderboard import Leaderboard
 
 # === 配置区 ===
 # 对应 Supabase 里的表名 (记得去 Supabase SQL Editor 执行建表语句)
 TABLE_NAME = "reddit_logs"
 
+# 🏁 滚动 24h 榜单：去重参数与 get_hot_items 一致，refinery 入库后调用 observe()
+BOARD = Leaderboard("reddit", "url", by="bj_time")
+
+def observe(rows):
+    return BOARD.observe(rows)
+
+def persist():
+    BOARD.save()
+
+def reconcile(db):
+    BOARD.reconcile(db)
+
+def checkpoint():
+    BOARD.checkpoint()
+
 # 目标金融/科技板块 (用于"市场风向"策略筛选)
 TARGET_MARKET_SUBS = [
     'wallstreetbets', 'stocks', 'economy', 'options', 'bitcoin', 
@@ -56,49 +73,44 @@ def process(raw_data, path):
                 
     return refined_results
 
+# 🏷️ 入库打分（scoring.annotate）：热度按情绪强度放大，话题 = 板块
+RANK_COLUMNS = ("score", "vibe", "subreddit")
+
+def rank(row):
+    return (row.get('score') or 0) * (1 + abs(float(row.get('vibe') or 0))), row.get('subreddit')
+
 # === 2. 战报生成逻辑 (分类独立版) ===
 def get_hot_items(supabase, table_name):
     # A. 获取最近 24 小时的数据
-    yesterday = (datetime.now() - timedelta(hours=24)).isoformat()
-    try:
-        # 查库：按时间倒序
-        res = supabase.table(table_name).select("*").gt("bj_time", yesterday).execute()
-        all_posts = res.data if res.data else []
-    except Exception as e:
-        print(f"Reddit DB Error: {e}")
-        return {}
+    all_posts = BOARD.rows(supabase)
+    if all_posts is None:
+        yesterday = (datetime.now() - timedelta(hours=24)).isoformat()
+        try:
+            # 查库：按时间倒序
+            res = supabase.table(table_name).select("*").gt("bj_time", yesterday).execute()
+            all_posts = res.data if res.data else []
+        except Exception as e:
+            print(f"Reddit DB Error: {e}")
+            return {}
     
     if not all_posts: return {}
 
     # B. 去重逻辑 (Deduplication)
-    # 同一个 URL 可能在不同时间点被抓取多次，我们只保留时间戳最新的那个
-    unique_map = {}
-    for p in all_posts:
-        url = p.get('url')
-        if not url: continue  # 丢弃没有 URL 的脏数据
-        
-        # 如果 URL 已存在，且当前这条的时间更新，则覆盖
-        if url not in unique_map or p['bj_time'] > unique_map[url]['bj_time']:
-            unique_map[url] = p
-            
-    posts = list(unique_map.values())
+    # 同一个 URL 可能在不同时间点被抓取多次，我们只保留时间戳最新的那个（丢弃没有 URL 的脏数据）
+    posts = ranking.load_frame(all_posts, ["subreddit", "score"], ranking.dedup(all_posts, "url", by="bj_time"))
+    posts["score"] = ranking.num(posts, "score")
 
     # C. 分类筛选器 (The Filter Pipeline)
     
     # --- 策略 1: 🚨 全球绝对热点 (Viral Hits) ---
     # 逻辑：不分板块，全网 Score 最高的前 5 名
-    viral_pool = sorted(posts, key=lambda x: x.get('score', 0), reverse=True)[:5]
-    viral_ids = {p['url'] for p in viral_pool}  # 记录 ID 以免后续重复选入
+    viral = ranking.top(posts, "score", 5)
 
     # --- 策略 2: 📉 市场与科技信号 (Market Movers) ---
     # 逻辑：只看特定金融/科技板块，排除已入选 Viral 的
-    market_pool = [
-        p for p in posts 
-        if p.get('subreddit') in TARGET_MARKET_SUBS 
-        and p['url'] not in viral_ids
-    ]
-    market_pool.sort(key=lambda x: x.get('score', 0), reverse=True)
-    market_top = market_pool[:5]  # 取前 5
+    market = posts[posts["subreddit"].isin(TARGET_MARKET_SUBS) & ~posts[ranking.POS].isin(viral[ranking.POS])]
+    viral_pool = ranking.records(viral, all_posts)
+    market_top = ranking.records(ranking.top(market, "score", 5), all_posts)
 
     # D. 构建 Markdown 表格 (分开展示)
     report_sections = {}
@@ -1,6 +1,12 @@
 import json
 import math
 from datetime import datetime, timedelta
+from keyword_engine import KeywordMatcher
+import numpy as np
+import pyarrow as pa
+import columnar
+import ranking
+from leaderboard import Leaderboard
 
 # ==========================================
 # ⚙️ 配置区 (V4.3 - Fix URL & Enhance Macro)
@@ -9,6 +15,26 @@ from datetime import datetime, timedelta
 TABLE_NAME = "twitter_logs"
 TARGET_TOTAL_QUOTA = 30 
 
+def tweet_key(t):
+    """去重键：url 优先，缺失时用 (博主, 正文)"""
+    return t.get('url') or (t.get('user_name'), t.get('full_text'))
+
+# 🏁 滚动 24h 榜单：去重参数与 get_hot_items 一致，refinery 入库后调用 observe()
+# 同一条推文的多次快照留入库分数最高的一条（查库回退按 rank_score 排序取前 N，只能看到高分快照，两条路径同一口径）
+BOARD = Leaderboard("twitter", tweet_key, by="rank_score", default=0.0)
+
+def observe(rows):
+    return BOARD.observe(rows)
+
+def persist():
+    BOARD.save()
+
+def reconcile(db):
+    BOARD.reconcile(db)
+
+def checkpoint():
+    BOARD.checkpoint()
+
 # === 🛑 1. 政治/垃圾噪音词 ===
 NOISE_KEYWORDS = [
     "woke", "libtard", "magatard", "shame", "disgrace", "traitor", 
@@ -94,9 +120,17 @@ VIP_AUTHORS = [
     # --- Politics & Geopolitics (政治与地缘) ---
     "Ian Bremmer", "SentDefender", "Visegrád 24", "Spectator Index", 
     "Disclose.tv", "Defense News", "Council on Foreign Relations", 
-    "The Economist", "RnaudBertrand", "David Fickling", "Balaji Srinivasan"
+    "The Economist", "RnaudBertrand", "David Fickling", "Balaji Srinivasan",
+
+    # --- 简称 / 账号名（原工厂 VIP 名单并入这里，战报与工厂共用一份） ---
+    "Musk", "Vitalik", "LeCun", "Dalio", "Sama", "PaulG"
 ]
 
+# === 🔎 5. 词库编译：话题 / 噪音 / 豁免一次扫描（子串匹配，与逐词 `in` 判断一致） ===
+TOPIC_LABELS = list(TOPIC_RULES)
+TEXT_MATCHER = KeywordMatcher({**TOPIC_RULES, "_noise": NOISE_KEYWORDS, "_immune": MACRO_IMMUNITY})
+VIP_MATCHER = KeywordMatcher({"vip": VIP_AUTHORS})
+
 def fmt_k(num):
     if not num: return "0"
     try: n = float(num)
@@ -111,6 +145,53 @@ def to_iso_bj(date_str):
         return (utc_dt + timedelta(hours=8)).isoformat()
     except: return datetime.now().isoformat()
 
+# 列式入库 schema：字段与 process() 的 dict 一一对应
+SCHEMA = columnar.schema(
+    [("bj_time", pa.string()), ("user_name", pa.string()), ("screen_name", pa.string()), ("followers_count", pa.int64()),
+     ("full_text", pa.string()), ("url", pa.string()), ("tags", pa.string())]
+    + [(c, pa.int64()) for c in ("likes", "retweets", "replies", "quotes", "bookmarks", "views",
+                                 "growth_views", "growth_likes", "growth_retweets", "growth_replies")]
+    + [("raw_json", pa.string())]
+)
+
+def process_batches(raw_data, path, batch_rows=None):
+    """process() 的列式版本：直接填 Arrow 列，每 batch_rows 条原始推文产出一张 pa.Table"""
+    items = raw_data if isinstance(raw_data, list) else [raw_data]
+    builder = columnar.ColumnBuilder(SCHEMA)
+    (bj_time, user_name, screen_name, followers_count, full_text, url, tags,
+     likes, retweets, replies, quotes, bookmarks, views,
+     growth_views, growth_likes, growth_retweets, growth_replies, raw_json) = builder.appenders()
+    dumps = json.dumps
+    for batch in columnar.batched(items, batch_rows):
+        for i in batch:
+            text = i.get('fullText', '')
+            if len(text) < 10 and 'http' not in text:
+                continue
+            user = i.get('user', {})
+            metrics = i.get('metrics', {})
+            bj_time(to_iso_bj(i.get('createdAt')))
+            user_name(user.get('name'))
+            screen_name(user.get('screenName'))
+            followers_count(user.get('followersCount'))
+            full_text(text)
+            url(i.get('tweetUrl'))
+            tags(dumps(i.get('tags', [])))
+            likes(metrics.get('likes', 0))
+            retweets(metrics.get('retweets', 0))
+            replies(metrics.get('replies', 0))
+            quotes(metrics.get('quotes', 0))
+            bookmarks(metrics.get('bookmarks', 0))
+            views(i.get('views', metrics.get('viewCount', 0)))
+            growth_views(i.get('growth_views', 0))
+            growth_likes(i.get('growth_likes', 0))
+            growth_retweets(i.get('growth_retweets', 0))
+            growth_replies(i.get('growth_replies', 0))
+            raw_json(dumps(i))
+        yield builder.flush()
+
+def process_columns(raw_data, path):
+    return columnar.concat(process_batches(raw_data, path))
+
 # ✅ Process: 严格映射到 SQL 的 'url' 列
 def process(raw_data, path):
     items = raw_data if isinstance(raw_data, list) else [raw_data]
@@ -164,19 +245,13 @@ def calculate_score_and_tag(item):
     text = (item.get('full_text') or "").lower()
     user = (item.get('user_name') or "")
     
-    base_score = (item.get('retweets', 0) * 5) + \
-                 (item.get('bookmarks', 0) * 10) + \
-                 item.get('likes', 0)
+    base_score = ((item.get('retweets') or 0) * 5) + \
+                 ((item.get('bookmarks') or 0) * 10) + \
+                 (item.get('likes') or 0)
     
-    detected_topic = "General"
-    max_keyword_len = 0
-    
-    for topic, keywords in TOPIC_RULES.items():
-        for k in keywords:
-            if k in text:
-                if len(k) > max_keyword_len:
-                    detected_topic = topic
-                    max_keyword_len = len(k)
+    hits = TEXT_MATCHER.match(text)
+    topic, _ = TEXT_MATCHER.longest(hits, TOPIC_LABELS)
+    detected_topic = topic or "General"
     
     if detected_topic != "General":
         base_score += 2000
@@ -184,71 +259,92 @@ def calculate_score_and_tag(item):
     else:
         base_score *= 0.5 
 
-    has_noise = False
-    for noise in NOISE_KEYWORDS:
-        if noise in text:
-            has_noise = True
-            break
-            
-    if has_noise:
-        is_immune = False
-        for safe in MACRO_IMMUNITY:
-            if safe in text:
-                is_immune = True
-                break
-        
-        if not is_immune:
-            base_score *= 0.1 
-            detected_topic = "Politics" 
+    # 噪音词命中且没有宏观豁免词 -> 降权并归入 Politics
+    if "_noise" in hits and "_immune" not in hits:
+        base_score *= 0.1 
+        detected_topic = "Politics" 
             
-    for vip in VIP_AUTHORS:
-        if vip.lower() in user.lower():
-            base_score += 5000
-            break
+    if VIP_MATCHER.contains(user):
+        base_score += 5000
             
     return base_score, detected_topic
 
+# 🏷️ 入库打分（scoring.annotate）：写 rank_score / topic 两列，战报与工厂都按它排
+RANK_COLUMNS = ("full_text", "user_name", "retweets", "bookmarks", "likes")
+
+def rank(row):
+    return calculate_score_and_tag(row)
+
+def engagement_frame(df):
+    """(基础热度, 是否 VIP)：纯算术 + 按博主去重后的一次匹配"""
+    base = (ranking.num(df, "retweets") * 5 + ranking.num(df, "bookmarks") * 10 + ranking.num(df, "likes")).to_numpy()
+    cache = {}
+    for u in df["user_name"]:
+        if u not in cache: cache[u] = VIP_MATCHER.contains(u or "")
+    vip = np.array([cache[u] for u in df["user_name"]], dtype=bool)
+    return base, vip
+
+def score_upper_bound(df):
+    """calculate_score_and_tag 在不看正文时的分数上界（话题/噪音分支取最大）"""
+    base, vip = engagement_frame(df)
+    tagged, general = (base + 2000) * 1.5, base * 0.5
+    ub = np.maximum(np.maximum(tagged, general), np.maximum(tagged * 0.1, general * 0.1))
+    return np.where(vip, ub + 5000, ub)
+
+def score_and_tag_frame(df):
+    """calculate_score_and_tag 的列式版本：关键词逐行扫描一次，其余算术全部向量化（结果逐位一致）"""
+    hits = [TEXT_MATCHER.match((t or "").lower()) for t in df["full_text"]]
+    topics = np.array([TEXT_MATCHER.longest(h, TOPIC_LABELS)[0] or "General" for h in hits], dtype=object)
+    noisy = np.array([("_noise" in h and "_immune" not in h) for h in hits], dtype=bool)
+    base, vip = engagement_frame(df)
+
+    tagged = topics != "General"
+    score = np.where(tagged, (base + 2000) * 1.5, base * 0.5)
+    score = np.where(noisy, score * 0.1, score)
+    topics = np.where(noisy, "Politics", topics)
+    score = np.where(vip, score + 5000, score)
+    return score, topics
+
+def rank_window(all_tweets):
+    """窗口行 -> 去重 + 排序 + 每位博主最多 3 条后的 Top 30"""
+    # 1. 装载窗口 + 去重：url 优先，缺失时用 (博主, 正文)，保留 rank_score 最高的快照（并列 / 老数据缺分时保留第一次出现）
+    unique = ranking.dedup(all_tweets, tweet_key, by="rank_score", default=0.0)
+    df = ranking.load_frame(all_tweets, ["user_name", "retweets", "bookmarks", "likes", "rank_score", "topic"], unique)
+
+    # 2. 排序 + 每位博主最多 3 条
+    if df["rank_score"].notna().all() and df["topic"].notna().all():
+        # 入库时算好的分数（与下面的现算逐位一致）：直接排
+        df = df.assign(_score=ranking.num(df, "rank_score").to_numpy(dtype=float), _topic=df["topic"])
+        return ranking.quota(ranking.top(df, "_score"), "user_name", 3).head(TARGET_TOTAL_QUOTA)
+    # 老数据没有 rank_score：向量化现算。关键词扫描是唯一的逐行开销，先用互动数算上界，只扫描可能进 Top 30 的推文
+    def scorer(sub):
+        score, topic = score_and_tag_frame(ranking.attach(sub, all_tweets, ["full_text"]))
+        return {"_score": score, "_topic": topic}
+    return ranking.bounded_top(df, score_upper_bound(df), scorer, "_score", TARGET_TOTAL_QUOTA, group="user_name", limit=3)
+
 def get_hot_items(supabase, table_name):
-    yesterday = (datetime.now() - timedelta(hours=24)).isoformat()
-    try:
-        res = supabase.table(table_name).select("*").gt("bj_time", yesterday).execute()
-        all_tweets = res.data if res.data else []
-    except Exception as e:
-        print(f"Database error: {e}")
-        return {}
-
-    if not all_tweets: return {}
-
-    unique_map = {}
-    for t in all_tweets:
-        # 🔥 读取修正：从 'url' 读取
-        key = t.get('url') or (t.get('user_name'), t.get('full_text'))
-        if key not in unique_map:
-            unique_map[key] = t
-    tweets = list(unique_map.values())
-
-    scored_tweets = []
-    for t in tweets:
-        score, topic = calculate_score_and_tag(t)
-        t['_score'] = score
-        t['_topic'] = topic
-        scored_tweets.append(t)
-        
-    scored_tweets.sort(key=lambda x: x['_score'], reverse=True)
-    
-    final_list = []
-    author_counts = {}
-    
-    for t in scored_tweets:
-        if len(final_list) >= TARGET_TOTAL_QUOTA:
-            break
-            
-        author = t['user_name']
-        if author_counts.get(author, 0) >= 3:
-            continue
-            
-        final_list.append(t)
-        author_counts[author] = author_counts.get(author, 0) + 1
+    all_tweets = BOARD.rows(supabase)
+    if all_tweets is not None:
+        if not all_tweets: return {}
+        ranked = rank_window(all_tweets)
+    else:
+        yesterday = (datetime.now() - timedelta(hours=24)).isoformat()
+        # 入库时已打好分：只取分数最高的一段；去重 / 博主配额后凑不满 30 条且库里还有，就放大 4 倍再取
+        limit = TARGET_TOTAL_QUOTA * 10
+        while True:
+            try:
+                res = supabase.table(table_name).select("*").gt("bj_time", yesterday) \
+                    .order("rank_score", desc=True, nullsfirst=False).limit(limit).execute()
+                all_tweets = res.data if res.data else []
+            except Exception as e:
+                print(f"Database error: {e}")
+                return {}
+            if not all_tweets: return {}
+            ranked = rank_window(all_tweets)
+            if len(ranked) >= TARGET_TOTAL_QUOTA or len(all_tweets) < limit: break
+            limit *= 4
+
+    final_list = ranking.records(ranked, all_tweets, extra=("_score", "_topic"))
         
     header = "| 信号 | 🏷️ 标签 | 热度 | 博主 | 摘要 | 🔗 |\n| :--- | :--- | :--- | :--- | :--- | :--- |"
     rows = []
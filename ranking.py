@@ -0,0 +1,94 @@
+import numpy as np
+
+# ==========================================
+# 📊 列式排名层：去重后的窗口装载一次，打分 / 选取全部向量化
+# ==========================================
+# 语义与各 processor 原来的 Python 循环逐条对齐：
+#   - 去重结果按"键第一次出现"的顺序排列（dict 插入序）
+#   - 取最大/最新时严格大于才替换（并列保留先出现的那条）
+#   - 排序一律稳定（并列保持原顺序，与 list.sort(reverse=True) 一致）
+# 窗口里大多是同一条目的重复快照：去重只在原始 dict 上走一遍哈希，
+# 只有留下来的行才装进 DataFrame（晚物化），需要的列按需 attach()。
+# pandas 只在出报告时用到，按需导入：processor 被 sync 加载时不付 pandas 的冷启动。
+
+POS = "_pos"
+
+def dedup(rows, key, by=None, default=None):
+    """去重后留下的行号（键第一次出现的顺序）
+    key: 列名或 row -> 键；by 为空时保留第一次出现，否则保留 by 列最大的一条（缺列或 NULL 按 default）；键为假值的行丢弃"""
+    keys = list(map(key, rows)) if callable(key) else [r.get(key) for r in rows]
+    winner = {}
+    if by is None:
+        for i, k in enumerate(keys):
+            if k and k not in winner: winner[k] = i
+        return list(winner.values())
+    best = {}
+    for i, k, v in zip(range(len(rows)), keys, [r.get(by) for r in rows]):
+        if not k: continue
+        # 数据库返回整行：别的源没有的列是 NULL 而不是缺键
+        if v is None: v = default
+        if k not in winner or v > best[k]:
+            winner[k], best[k] = i, v
+    return list(winner.values())
+
+def load_frame(rows, columns, positions=None):
+    """只抽取需要的列建表；_pos 指回原始 dict，渲染时再取整行
+    原始列一律保持 object（None 不会被推断成 NaN），数值列用 num() 显式转换"""
+    import pandas as pd
+    picked = rows if positions is None else [rows[p] for p in positions]
+    data = {c: pd.Series([r.get(c) for r in picked], dtype=object) for c in columns}
+    data[POS] = np.arange(len(rows)) if positions is None else np.asarray(positions, dtype=np.int64)
+    return pd.DataFrame(data, copy=False)
+
+def attach(df, rows, columns):
+    """只给留下来的行补装其余列"""
+    import pandas as pd
+    picked = [rows[p] for p in df[POS]]
+    return df.assign(**{c: pd.Series([r.get(c) for r in picked], index=df.index, dtype=object) for c in columns})
+
+def num(df, col, default=0):
+    """数值列：缺列/空值按 default 处理（对应 row.get(col) or default）"""
+    import pandas as pd
+    if col not in df: return pd.Series(default, index=df.index)
+    return pd.to_numeric(df[col], errors='coerce').fillna(default)
+
+def top(df, by, n=None):
+    """按 by 降序取前 n（稳定）"""
+    if n is not None: return df.nlargest(n, by, keep='first')
+    return df.sort_values(by, ascending=False, kind='stable')
+
+def quota(df, group, limit):
+    """df 已排好序：每组最多保留 limit 条（对应逐条计数跳过的配额循环）"""
+    if df.empty: return df
+    rank = df.groupby(group, sort=False, dropna=False).cumcount().to_numpy()
+    return df[rank < limit]
+
+def bounded_top(df, upper, scorer, by, n, group=None, limit=None):
+    """只为"可能进前 n"的行计算精确分数（关键词扫描这类逐行开销）
+    upper: 每行精确分数的上界（向量化算出）；scorer(sub) -> {列名: 数组}，其中必须包含 by
+    按上界从高到低分批打分；当已选第 n 名的分数严格大于剩余行的最大上界时停止，结果与全量打分逐位一致"""
+    import pandas as pd
+    if df.empty: return df
+    ub = np.asarray(upper, dtype=float)
+    order = np.argsort(-ub, kind='stable')
+    df = df.assign(_row=np.arange(len(df)))
+    done, size, parts = 0, max(4 * n, 256), []
+    while True:
+        sub = df.iloc[order[done:done + size]]
+        parts.append(sub.assign(**scorer(sub)))
+        done += len(sub); size *= 2
+        scored = pd.concat(parts).sort_values([by, '_row'], ascending=[False, True], kind='stable')
+        if group is not None: scored = quota(scored, group, limit)
+        picked = scored.head(n)
+        if done >= len(df): break
+        if len(picked) == n and picked[by].iloc[-1] > ub[order[done]]: break
+    return picked.drop(columns='_row')
+
+def records(df, rows, extra=()):
+    """把选中的行还原成原始 dict，并把打分等附加列写回（如 _score / _topic）"""
+    out = []
+    for pos, *vals in zip(df[POS], *(df[c] for c in extra)):
+        r = rows[pos]
+        for c, v in zip(extra, vals): r[c] = v.item() if hasattr(v, 'item') else v
+        out.append(r)
+    return out
@@ -1,9 +1,16 @@
-import os, json, base64, requests, importlib.util, sys
-import pandas as pd
+import os, json, base64, importlib.util, sys, argparse, threading
+from collections import OrderedDict
 import io
 from datetime import datetime, timedelta, timezone
-from supabase import create_client
-from github import Github, Auth
+import telemetry
+import cassette
+import etag_cache
+import storage
+import scoring
+from isotime import parse_iso
+
+# 📼 录制 / 回放要赶在建客户端、拉仓库之前装上
+cassette.install("refinery")
 
 # === 🛡️ 1. 核心配置 ===
 PRIVATE_BANK_ID = "wenfp108/Central-Bank" 
@@ -11,22 +18,65 @@ GITHUB_TOKEN = os.environ.get("GH_PAT")
 SUPABASE_URL = os.environ.get("SUPABASE_URL")
 SUPABASE_KEY = os.environ.get("SUPABASE_KEY")
 
-if not all([GITHUB_TOKEN, SUPABASE_URL, SUPABASE_KEY]):
-    sys.exit("❌ [审计异常] 环境变量缺失。")
+# 客户端按需创建：只跑 harvest / report 的任务不用为没用到的东西付冷启动
+# （PyGithub / supabase / pandas / pyarrow 都在第一次用到时才导入）
+_clients = {}
+_client_lock = threading.Lock()
+# 🏦 pipeline 会并发跑 report 和 harvest：同一分支上的两次提交要排队，否则后到的一方 409
+_bank_lock = threading.Lock()
+# 🧷 本进程内已登记过的文件 sha：常驻模式（daemon.py）下轮询不再为同一批文件反复查 processed_files
+# LRU，最多 SENTINEL_CACHE_SIZE 个：常驻进程里只有最近巡检窗口内的文件会被反复看到，更早的淘汰掉也只是多查一次库
+SENTINEL_CACHE_SIZE = int(os.environ.get("REFINERY_SENTINEL_CACHE_SIZE", 20000))
+_sentinels = OrderedDict()
+_sentinel_lock = threading.Lock()
+
+def _sentinel_seen(sha):
+    with _sentinel_lock:
+        if sha not in _sentinels: return False
+        _sentinels.move_to_end(sha)
+        return True
+
+def _sentinel_add(sha):
+    with _sentinel_lock:
+        _sentinels[sha] = None
+        _sentinels.move_to_end(sha)
+        while len(_sentinels) > SENTINEL_CACHE_SIZE: _sentinels.popitem(last=False)
+
+def db():
+    """🗃️ 存储后端（STORAGE_BACKEND=sqlite 时写本地嵌入式库，查询链与 Supabase 完全一致）"""
+    with _client_lock:
+        if "db" in _clients: return _clients["db"]
+        if storage.BACKEND == "supabase" and not all([SUPABASE_URL, SUPABASE_KEY]):
+            sys.exit("❌ [审计异常] 环境变量缺失。")
+        _clients["db"] = storage.connect(url=SUPABASE_URL, key=SUPABASE_KEY)
+        return _clients["db"]
+
+def repo():
+    """中央银行仓库；lazy=True 不为拿元数据单独请求一次 /repos"""
+    with _client_lock:
+        if "repo" in _clients: return _clients["repo"]
+        if not GITHUB_TOKEN: sys.exit("❌ [审计异常] 环境变量缺失。")
+        etag_cache.install()  # 🏷️ 没变的内容回 304，不扣额度
+        from github import Github, Auth
+        _clients["repo"] = Github(auth=Auth.Token(GITHUB_TOKEN)).get_repo(PRIVATE_BANK_ID, lazy=True)
+        return _clients["repo"]
 
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
-auth = Auth.Token(GITHUB_TOKEN)
-gh_client = Github(auth=auth)
-private_repo = gh_client.get_repo(PRIVATE_BANK_ID)
+def __getattr__(name):
+    # 兼容外部的 refinery.supabase / refinery.private_repo
+    if name == "supabase": return db()
+    if name == "private_repo": return repo()
+    raise AttributeError(name)
 
 # === 🧩 2. 插件发现系统 (强制指向 raw_signals) ===
-def get_all_processors():
+def get_all_processors(sources=None):
+    """sources：只加载这些源（None = 全部），没选中的 processor 模块不导入"""
     procs = {}
     proc_dir = "./processors"
     if not os.path.exists(proc_dir): return procs
     for filename in os.listdir(proc_dir):
         if filename.endswith(".py") and not filename.startswith("__"):
             name = filename[:-3]
+            if sources and name not in sources: continue
             try:
                 spec = importlib.util.spec_from_file_location(f"mod_{name}", os.path.join(proc_dir, filename))
                 mod = importlib.util.module_from_spec(spec)
@@ -42,24 +92,21 @@ def get_all_processors():
 # === ⏱️ 辅助：检查数据新鲜度 ===
 def get_data_freshness(table_name, source_name=None):
     try:
-        query = supabase.table(table_name).select("created_at").neq("created_at", "null")
+        query = db().table(table_name).select("created_at")
         
         # 如果是 raw_signals，需要按 signal_type 过滤
         if table_name == "raw_signals" and source_name:
             query = query.eq("signal_type", source_name)
             
-        res = query.order("created_at", desc=True).limit(1).execute()
+        res = query.order("created_at", desc=True, nullsfirst=False).limit(1).execute()
         
         if not res.data: return (False, 9999, "无数据")
         
         last_time_str = res.data[0]['created_at']
         if not last_time_str: return (False, 9999, "无时间戳")
 
-        try:
-            last_time_str = last_time_str.replace('Z', '+00:00')
-            last_time = datetime.fromisoformat(last_time_str)
-        except:
-            return (False, 9999, last_time_str)
+        last_time = parse_iso(last_time_str)
+        if last_time is None: return (False, 9999, last_time_str)
         
         now = datetime.now(timezone(timedelta(hours=8)))
         if last_time.tzinfo is None:
@@ -73,6 +120,7 @@ def get_data_freshness(table_name, source_name=None):
         return (True, 0, "CheckError")
 
 # === 🔥 3. 战报工厂 (辅助生成) ===
+@telemetry.timed("reports")
 def generate_hot_reports(processors_config):
     # 注意：Factory.py 是主战场，Refinery 里的这个函数主要用于简单的 Markdown 归档
     bj_now = datetime.now(timezone(timedelta(hours=8)))
@@ -89,54 +137,105 @@ def generate_hot_reports(processors_config):
     md_report += "> **机制说明**：全源智能去重 | 资金流向优先 | 自动归档\n\n"
 
     has_content = False
+    errors = 0
 
     for source_name, config in processors_config.items():
         if hasattr(config["module"], "get_hot_items"):
-            try:
-                table = config["table_name"]
-                is_fresh, mins_ago, _ = get_data_freshness(table, source_name)
-                
-                # 如果数据太老 (超过12小时) 就不写进简报了
-                if not is_fresh and mins_ago > 720: 
-                    continue 
+            with telemetry.span(f"get_hot_items.{source_name}") as sp:
+                try:
+                    table = config["table_name"]
+                    is_fresh, mins_ago, _ = get_data_freshness(table, source_name)
+                    
+                    # 如果数据太老 (超过12小时) 就不写进简报了
+                    if not is_fresh and mins_ago > 720: 
+                        continue 
 
-                sector_data = config["module"].get_hot_items(supabase, table)
-                if not sector_data: continue
+                    sector_data = config["module"].get_hot_items(db(), table)
+                    if not sector_data: continue
+                    sp.add("rows", sum(len(d.get("rows", [])) if isinstance(d, dict) else len(d) for d in sector_data.values()))
 
-                has_content = True
-                
-                freshness_tag = "" if is_fresh else f" (⚠️ 数据滞后 {int(mins_ago/60)}h)"
-                md_report += f"## 📡 来源：{source_name.upper()}{freshness_tag}\n"
-                
-                for sector, data in sector_data.items():
-                    md_report += f"### 🏷️ 板块：{sector}\n"
-                    if isinstance(data, dict):
-                        if "header" in data: md_report += data["header"] + "\n"
-                        if "rows" in data and isinstance(data["rows"], list):
-                            for row in data["rows"]: md_report += row + "\n"
-                    elif isinstance(data, list):
-                        md_report += "| 信号 | 内容 | 🔗 |\n| :--- | :--- | :--- |\n"
-                        for item in data:
-                            md_report += f"| {item.get('score','-')} | {item.get('full_text','-')} | [🔗]({item.get('url','#')}) |\n"
-                    md_report += "\n"
-            except Exception as e:
-                pass 
+                    has_content = True
+                    
+                    freshness_tag = "" if is_fresh else f" (⚠️ 数据滞后 {int(mins_ago/60)}h)"
+                    md_report += f"## 📡 来源：{source_name.upper()}{freshness_tag}\n"
+                    
+                    for sector, data in sector_data.items():
+                        md_report += f"### 🏷️ 板块：{sector}\n"
+                        if isinstance(data, dict):
+                            if "header" in data: md_report += data["header"] + "\n"
+                            if "rows" in data and isinstance(data["rows"], list):
+                                for row in data["rows"]: md_report += row + "\n"
+                        elif isinstance(data, list):
+                            md_report += "| 信号 | 内容 | 🔗 |\n| :--- | :--- | :--- |\n"
+                            for item in data:
+                                md_report += f"| {item.get('score','-')} | {item.get('full_text','-')} | [🔗]({item.get('url','#')}) |\n"
+                        md_report += "\n"
+                except Exception as e:
+                    # 单个源失败不影响整份战报，但要留下记录
+                    sp.error(e)
+                    errors += 1
+                    print(f"⚠️ {source_name} 战报生成失败: {e}")
 
     if not has_content:
         md_report += "\n\n**🛑 本轮扫描全域静默，请查阅历史归档。**"
 
-    try:
+    with telemetry.span("upload") as sp:
+        sp.add("bytes", len(md_report.encode('utf-8')))
         try:
-            old = private_repo.get_contents(report_path)
-            private_repo.update_file(old.path, f"📊 Update: {file_name}", md_report, old.sha)
-            print(f"📝 战报更新：{report_path}")
-        except:
-            private_repo.create_file(report_path, f"🚀 New: {file_name}", md_report)
-            print(f"📝 战报创建：{report_path}")
-    except Exception as e: 
-        print(f"❌ 写入失败: {e}")
+            with _bank_lock:
+                try:
+                    old = repo().get_contents(report_path)
+                    repo().update_file(old.path, f"📊 Update: {file_name}", md_report, old.sha)
+                    sp.add("api_calls", 2)
+                    print(f"📝 战报更新：{report_path}")
+                except:
+                    repo().create_file(report_path, f"🚀 New: {file_name}", md_report)
+                    sp.add("api_calls", 2)
+                    print(f"📝 战报创建：{report_path}")
+        except Exception as e: 
+            sp.error(e)
+            errors += 1
+            print(f"❌ 写入失败: {e}")
+    return {"errors": errors}
 
 # === 🚜 4. 滚动收割 (✅ 修正版：只清理 raw_signals) ===
+def export_expired(table, cutoff_str):
+    """过期数据 -> (Parquet 字节, id 列表)；没有数据返回 (None, [])"""
+    import columnar
+    if columnar.COLUMNAR_ENABLED:
+        # 🧱 列式通道：CSV 直接读成 Arrow 表写 Parquet，嵌套列天然是 JSON 文本，不经过逐行 dict
+        with telemetry.span("read") as sp:
+            arrow = db().fetch_table(table, {"created_at": f"lt.{cutoff_str}"})
+            sp.add("api_calls")
+            sp.add("rows", arrow.num_rows)
+        if not arrow.num_rows: return None, []
+        ids = arrow.column("id").to_pylist() if "id" in arrow.column_names else []
+        with telemetry.span("encode") as sp:
+            parquet_bytes = columnar.to_parquet(arrow)
+            sp.add("bytes", len(parquet_bytes))
+        return parquet_bytes, [i for i in ids if i is not None]
+
+    with telemetry.span("read") as sp:
+        res = db().table(table).select("*").lt("created_at", cutoff_str).execute()
+        data = res.data
+        sp.add("api_calls")
+        sp.add("rows", len(data or []))
+    if not data: return None, []
+    # 转换为 Parquet 上传 GitHub
+    with telemetry.span("encode") as sp:
+        import pandas as pd
+        df = pd.DataFrame(data)
+
+        # 🔥🔥 [新增修复] 强制统一 raw_json 列类型为字符串，解决 pyarrow 混合类型报错 🔥🔥
+        if 'raw_json' in df.columns:
+            df['raw_json'] = df['raw_json'].apply(lambda x: json.dumps(x, ensure_ascii=False) if isinstance(x, (dict, list)) else str(x))
+        
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, index=False, engine='pyarrow', compression='snappy')
+        sp.add("bytes", buffer.tell())
+    return buffer.getvalue(), [item['id'] for item in data if 'id' in item]
+
+@telemetry.timed("harvest")
 def perform_grand_harvest(processors_config):
     print("⏰ 触发每日滚动收割 (Archive & Purge)...")
     cutoff_date = (datetime.now() - timedelta(days=7)).replace(hour=23, minute=59, second=59)
@@ -145,75 +244,125 @@ def perform_grand_harvest(processors_config):
 
     # ✅ 修正：列表里只有 raw_signals，彻底删除旧表引用
     target_tables = ["raw_signals"] 
+    errors = 0
 
     for table in target_tables:
         try:
             # 1. 归档逻辑 (将7天前的数据打包上传 GitHub)
-            res = supabase.table(table).select("*").lt("created_at", cutoff_str).execute()
-            data = res.data
+            parquet_bytes, ids = export_expired(table, cutoff_str)
             
-            if data:
-                # 转换为 Parquet 上传 GitHub
-                df = pd.DataFrame(data)
-
-                # 🔥🔥 [新增修复] 强制统一 raw_json 列类型为字符串，解决 pyarrow 混合类型报错 🔥🔥
-                if 'raw_json' in df.columns:
-                    df['raw_json'] = df['raw_json'].apply(lambda x: json.dumps(x, ensure_ascii=False) if isinstance(x, (dict, list)) else str(x))
-                
-                buffer = io.BytesIO()
-                df.to_parquet(buffer, index=False, engine='pyarrow', compression='snappy')
-                
+            if parquet_bytes:
                 year_month = cutoff_date.strftime('%Y/%m')
                 # 🔥 修改开始：使用当前时间（精确到秒）作为文件名后缀
                 current_run_tag = datetime.now().strftime('%Y%m%d_%H%M%S')
                 archive_path = f"archive/{year_month}/{table}_{current_run_tag}.parquet"
                 # 🔥 修改结束
                 
-                try:
-                    private_repo.create_file(
-                        path=archive_path,
-                        message=f"🏛️ Archive: {table} batch",
-                        content=buffer.getvalue(),
-                        branch="main" 
-                    )
-                except Exception as upload_e:
-                    print(f"   ⚠️ 归档文件上传失败 (可能已存在): {upload_e}")
-                    # 🔥 修改开始：添加刹车逻辑
-                    print("   🛑以此停止：为防止数据丢失，跳过删除步骤！")
-                    return 
-                    # 🔥 修改结束
+                with telemetry.span("upload") as sp:
+                    sp.add("bytes", len(parquet_bytes))
+                    sp.add("api_calls")
+                    try:
+                        with _bank_lock:
+                            repo().create_file(
+                                path=archive_path,
+                                message=f"🏛️ Archive: {table} batch",
+                                content=parquet_bytes,
+                                branch="main" 
+                            )
+                    except Exception as upload_e:
+                        sp.error(upload_e)
+                        print(f"   ⚠️ 归档文件上传失败 (可能已存在): {upload_e}")
+                        # 🔥 修改开始：添加刹车逻辑
+                        print("   🛑以此停止：为防止数据丢失，跳过删除步骤！")
+                        return {"errors": errors + 1}
+                        # 🔥 修改结束
                 
                 # 2. 清理逻辑 (删除已归档的数据)
                 # 使用循环分批删除，防止超时
-                ids = [item['id'] for item in data if 'id' in item]
                 if ids:
                     batch_size = 500
-                    for i in range(0, len(ids), batch_size):
-                        batch = ids[i : i + batch_size]
-                        supabase.table(table).delete().in_("id", batch).execute()
+                    with telemetry.span("delete") as sp:
+                        for i in range(0, len(ids), batch_size):
+                            batch = ids[i : i + batch_size]
+                            db().table(table).delete().in_("id", batch).execute()
+                            sp.add("api_calls")
+                            sp.add("rows", len(batch))
                     print(f"   🗑️ {table}: 已清理 {len(ids)} 条过期数据")
             else:
                 pass # 没有过期数据
                 
         except Exception as e:
             # 只有 raw_signals 会走到这里，旧表根本不会报错
+            telemetry.error(e)
+            errors += 1
             print(f"   ⚠️ [{table}] 收割任务跳过: {e}")
+    return {"errors": errors}
 
 # === 🏦 5. 搬运逻辑 (核心：JSON -> Supabase) ===
 def process_and_upload(path, sha, config):
-    # 检查哨兵：文件是否处理过
-    check = supabase.table("processed_files").select("file_sha").eq("file_sha", sha).execute()
-    if check.data: return 0
+    # 📡 每个文件一个 span：check / fetch / decode / process / insert 分段计时
+    with telemetry.span("file") as sp:
+        count = _process_and_upload(path, sha, config, sp)
+        sp.add("rows", count or 0)
+        return count
+
+def _process_and_upload(path, sha, config, sp):
+    # 检查哨兵：文件是否处理过（先看进程内缓存）
+    if _sentinel_seen(sha):
+        sp.add("skipped")
+        return 0
+    with telemetry.span("check"):
+        check = db().table("processed_files").select("file_sha").eq("file_sha", sha).execute()
+    sp.add("api_calls")
+    if check.data:
+        _sentinel_add(sha)
+        sp.add("skipped")
+        return 0
     
     try:
-        content_file = private_repo.get_contents(path)
-        raw_data = json.loads(base64.b64decode(content_file.content).decode('utf-8'))
+        with telemetry.span("fetch") as fs:
+            content_file = repo().get_contents(path)
+            fs.add("bytes", content_file.size or 0)
+        sp.add("api_calls")
+        with telemetry.span("decode"):
+            raw_data = json.loads(base64.b64decode(content_file.content).decode('utf-8'))
         
-        # 调用 Processor 清洗数据
-        items = config["module"].process(raw_data, path)
+        mod = config["module"]
+        import columnar
+        # 🧱 列式通道：processor 按批产出 Arrow 列，每批一个 CSV 请求写库（边产出边写，不留整份 dict）
+        if columnar.COLUMNAR_ENABLED and hasattr(mod, "process_batches"):
+            count = 0
+            for batch in telemetry.iterate(mod.process_batches(raw_data, path), "process"):
+                if not batch.num_rows: continue
+                with telemetry.span("rank"): batch = scoring.annotate_table(mod, batch)
+                batch = columnar.with_constant(batch, "signal_type", config["source_name"])
+                with telemetry.span("insert") as ins:
+                    db().insert_table("raw_signals", batch)
+                    ins.add("rows", batch.num_rows)
+                    ins.add("api_calls", -(-batch.num_rows // columnar.BULK_ROWS))
+                if hasattr(mod, "observe"):
+                    with telemetry.span("observe"): mod.observe(batch)
+                count += batch.num_rows
+            if count:
+                db().table("processed_files").upsert({
+                    "file_sha": sha,
+                    "file_path": path,
+                    "engine": config["source_name"],
+                    "item_count": count
+                }).execute()
+                sp.add("api_calls")
+                _sentinel_add(sha)
+                if hasattr(mod, "checkpoint"): mod.checkpoint()
+            return count
+
+        # 调用 Processor 清洗数据（dict 兼容路径）
+        with telemetry.span("process"):
+            items = mod.process(raw_data, path)
         count = len(items) if items else 0
         
         if items:
+            # 🏷️ 入库打分：rank_score / topic（papers 的 topic 取自 processor 写的 signal_type，所以要在注入之前）
+            with telemetry.span("rank"): scoring.annotate(mod, items)
             # 🔥 注入核心字段 signal_type
             for item in items:
                 item['signal_type'] = config["source_name"]
@@ -223,61 +372,121 @@ def process_and_upload(path, sha, config):
                     item['raw_json'] = item.copy()
 
             # 分批写入 raw_signals
-            for i in range(0, len(items), 500):
-                supabase.table("raw_signals").insert(items[i : i+500]).execute()
+            with telemetry.span("insert") as ins:
+                for i in range(0, len(items), 500):
+                    db().table("raw_signals").insert(items[i : i+500]).execute()
+                    ins.add("api_calls")
+                ins.add("rows", count)
+            # 📈 写库成功后再喂给增量状态（24h 榜单、polymarket 的盘口时序）
+            if hasattr(mod, "observe"):
+                with telemetry.span("observe"): mod.observe(items)
             
             # 登记哨兵
-            supabase.table("processed_files").upsert({
+            db().table("processed_files").upsert({
                 "file_sha": sha, 
                 "file_path": path,
                 "engine": config["source_name"],
                 "item_count": count
             }).execute()
+            sp.add("api_calls")
+            _sentinel_add(sha)
+            if hasattr(mod, "checkpoint"): mod.checkpoint()
             return count
     except Exception as e: 
+        sp.error(e)
         print(f"❌ 处理文件 {path} 失败: {e}")
+        return None  # 与“没有新行”区分开，sync 据此统计失败文件数
     return 0
 
-def sync_bank_to_sql(processors_config, full_scan=False):
+@telemetry.timed("sync")
+def sync_bank_to_sql(processors_config, full_scan=False, since=None):
     current_time = datetime.now().strftime('%H:%M:%S')
     mode_str = "全量补录" if full_scan else "1小时增量"
     print(f"[{current_time}] 🏦 巡检开始: {mode_str}提取")
     stats = {name: 0 for name in processors_config.keys()}
+    errors = 0
+
+    # 🏁 增量状态先对一次水位：上一轮入库后没落盘的文件哨兵已登记、不会再被 observe，对不上的榜单作废重来
+    for config in processors_config.values():
+        if hasattr(config["module"], "reconcile"): config["module"].reconcile(db())
     
     if full_scan:
         try:
-            contents = private_repo.get_contents("")
+            contents = repo().get_contents("")
             while contents:
                 file_content = contents.pop(0)
                 if file_content.type == "dir":
-                    contents.extend(private_repo.get_contents(file_content.path))
+                    contents.extend(repo().get_contents(file_content.path))
                 elif file_content.name.endswith(".json"):
                     source_key = file_content.path.split('/')[0]
                     if source_key in processors_config:
                         added = process_and_upload(file_content.path, file_content.sha, processors_config[source_key])
-                        stats[source_key] += added
-        except Exception as e: print(f"❌ Scan Error: {e}")
+                        if added is None: errors += 1
+                        else: stats[source_key] += added
+        except Exception as e:
+            telemetry.error(e)
+            errors += 1
+            print(f"❌ Scan Error: {e}")
     else:
-        # 增量模式：只检查最近 24 小时以内的 Commit
-        since = datetime.now(timezone.utc) - timedelta(hours=24)
-        commits = private_repo.get_commits(since=since)
-        for commit in commits:
-            for f in commit.files:
-                if f.filename.endswith('.json'):
-                    source_key = f.filename.split('/')[0]
-                    if source_key in processors_config:
-                        added = process_and_upload(f.filename, f.sha, processors_config[source_key])
-                        stats[source_key] += added
+        # 增量模式：只检查最近 24 小时以内的 Commit（常驻模式传入上次巡检的时间）
+        since = since or datetime.now(timezone.utc) - timedelta(hours=24)
+        try:
+            commits = repo().get_commits(since=since)
+            for commit in commits:
+                for f in commit.files:
+                    if f.filename.endswith('.json'):
+                        source_key = f.filename.split('/')[0]
+                        if source_key in processors_config:
+                            added = process_and_upload(f.filename, f.sha, processors_config[source_key])
+                            if added is None: errors += 1
+                            else: stats[source_key] += added
+        except Exception as e:
+            # 翻页出错：已入库的部分照常落盘（下面的 persist），本轮记失败
+            telemetry.error(e)
+            errors += 1
+            print(f"❌ Commit Scan Error: {e}")
 
     for source, count in stats.items():
         if count > 0: print(f"✅ {source} (+{count}) -> raw_signals")
 
+    # 增量状态一轮只落盘一次
+    with telemetry.span("persist") as sp:
+        for name, config in processors_config.items():
+            if hasattr(config["module"], "persist"):
+                try: config["module"].persist()
+                except Exception as e:
+                    sp.error(e)
+                    errors += 1
+                    print(f"⚠️ {name} 状态落盘失败: {e}")
+    return {"rows": stats, "errors": errors}
+
+# === 🎛️ 6. 命令行：按阶段运行 ===
+STAGES = ("sync", "report", "harvest")
+
+def parse_args(argv=None):
+    ap = argparse.ArgumentParser(description="Refinery：sync（银行 -> raw_signals）/ report（战报）/ harvest（归档 + 清理）")
+    ap.add_argument("command", nargs="?", default="all", choices=STAGES + ("all",), help="要跑的阶段，默认 all（三段依次执行）")
+    ap.add_argument("--sources", help="逗号分隔，只处理这些源（如 twitter,github），默认全部")
+    ap.add_argument("--full-scan", action="store_true", default=os.environ.get("FORCE_FULL_SCAN") == "true",
+                    help="sync 全量补录（默认取 FORCE_FULL_SCAN）")
+    return ap.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    stages = STAGES if args.command == "all" else (args.command,)
+    sources = {s.strip() for s in args.sources.split(",") if s.strip()} if args.sources else None
+    telemetry.start("refinery")
+    try:
+        # harvest 不需要 processor 模块
+        all_procs = get_all_processors(sources) if {"sync", "report"} & set(stages) else {}
+        if "sync" in stages: sync_bank_to_sql(all_procs, full_scan=args.full_scan)
+        if "report" in stages: generate_hot_reports(all_procs)
+        if "harvest" in stages: perform_grand_harvest(all_procs)
+        
+        print(f"[{datetime.now().strftime('%H:%M:%S')}] ✅ 审计任务圆满完成。")
+    finally:
+        etag_cache.report()
+        telemetry.emit()
+
 if __name__ == "__main__":
-    all_procs = get_all_processors()
-    is_full_scan = (os.environ.get("FORCE_FULL_SCAN") == "true")
-    
-    sync_bank_to_sql(all_procs, full_scan=is_full_scan)
-    generate_hot_reports(all_procs)
-    perform_grand_harvest(all_procs)
-    
-    print(f"[{datetime.now().strftime('%H:%M:%S')}] ✅ 审计任务圆满完成。")
+    main()
@@ -1,6 +1,8 @@
 import os
 import sys
 from factory import UniversalFactory
+import telemetry
+import cassette
 
 # ==========================================
 # 🚀 启动器：run_factory.py (适配 V3 新架构)
@@ -8,12 +10,14 @@ from factory import UniversalFactory
 
 def main():
     print("🔥 正在启动 Architect's Alpha 认知加工厂...")
+    cassette.install("factory")
     
     # 1. 检查环境变量
     if not os.environ.get("SILICON_FLOW_KEY"):
         print("❌ 错误: 未检测到 SILICON_FLOW_KEY 环境变量")
         return
 
+    telemetry.start("factory")
     try:
         # 2. 实例化工厂 (它会自动加载 masters 目录下的插件)
         factory = UniversalFactory(masters_path="masters")
@@ -27,6 +31,8 @@ def main():
         print(f"❌ 运行期间发生未捕获异常: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        telemetry.emit()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,86 @@
+import argparse, math, sys
+from datetime import datetime, timezone
+
+from isotime import parse_iso
+
+# ==========================================
+# 🏷️ 入库打分：每个源的 processor 声明 rank(row) -> (rank_score, topic)，refinery 写库前调用一次
+# ==========================================
+# 分数只算与时间无关的部分（互动数、关键词、标签），落到 raw_signals.rank_score / topic 两列（sql/002）。
+# 战报和工厂直接 order("rank_score", desc=True).limit(N) 取候选，不再各拉几百行回来重算；
+# 与时间有关的部分（新鲜度衰减、盘口动量）取回之后再乘，只作用于那 N 行。
+# processor 用 RANK_COLUMNS 声明 rank() 读哪些列：列式通道只把这几列转成 dict，不碰 raw_json。
+
+def annotate(mod, rows):
+    """dict 行：原地写入 rank_score / topic（processor 没有 rank() 时什么都不做）"""
+    if not hasattr(mod, "rank"): return rows
+    for r in rows:
+        score, topic = mod.rank(r)
+        r["rank_score"], r["topic"] = float(score), topic
+    return rows
+
+def annotate_table(mod, table):
+    """Arrow 批：只转 RANK_COLUMNS 这几列，追加 rank_score / topic 两列"""
+    if not hasattr(mod, "rank") or not table.num_rows: return table
+    import pyarrow as pa
+    cols = [c for c in getattr(mod, "RANK_COLUMNS", table.column_names) if c in table.column_names]
+    ranked = [mod.rank(r) for r in table.select(cols).to_pylist()]
+    table = table.append_column("rank_score", pa.array([float(s) for s, _ in ranked], type=pa.float64()))
+    return table.append_column("topic", pa.array([t for _, t in ranked], type=pa.string()))
+
+def _epoch(ts):
+    dt = parse_iso(ts)
+    if dt is None: return None
+    if dt.tzinfo is None: dt = dt.replace(tzinfo=timezone.utc)
+    return dt.timestamp()
+
+def decayed(rows, half_life_hours, now=None, col="created_at"):
+    """取回之后的时间衰减：rank_score x 0.5^(年龄/半衰期)，写进 _rank；时间戳缺失或解析不了按不衰减"""
+    now = now or datetime.now(timezone.utc).timestamp()
+    for r in rows:
+        t = _epoch(r.get(col))
+        age = max(now - t, 0) / 3600 if t else 0
+        r["_rank"] = float(r.get("rank_score") or 0) * (math.pow(0.5, age / half_life_hours) if half_life_hours > 0 else 1)
+    return rows
+
+# === 🧮 老数据回填：sql/002 只能回填与关键词无关的源，twitter / polymarket 的关键词 / VIP 加成走这里 ===
+# python scoring.py backfill [--sources twitter,polymarket]
+# 分批取 rank_score 为 NULL 的行（只取 id + RANK_COLUMNS），用各 processor 的 rank() 算好，按 id update 回去
+# （upsert 只带三列会走插入路径、撞 NOT NULL 约束；分数 / 话题相同的行合成一条 update ... in id）。
+BACKFILL_SOURCES = ("twitter", "polymarket")  # papers 的论文类型入库时被改写成源名，只能按 sql/002 从 raw_json 回填
+BACKFILL_BATCH = 500
+
+def backfill(sources=BACKFILL_SOURCES, batch=BACKFILL_BATCH):
+    import refinery
+    procs, db, total = refinery.get_all_processors(set(sources)), refinery.db(), {}
+    for source, cfg in sorted(procs.items()):
+        mod = cfg["module"]
+        if not hasattr(mod, "rank"): continue
+        cols = ", ".join(("id",) + tuple(getattr(mod, "RANK_COLUMNS", ())))
+        done, last = 0, None
+        while True:
+            rows = db.table("raw_signals").select(cols).eq("signal_type", source).is_("rank_score", "null") \
+                .order("id").limit(batch).execute().data or []
+            ids = [r["id"] for r in rows]
+            if not rows or ids == last: break  # 写不进去时别原地打转
+            last = ids
+            annotate(mod, rows)
+            groups = {}
+            for r in rows: groups.setdefault((r["rank_score"], r["topic"]), []).append(r["id"])
+            for (score, topic), group in groups.items():
+                db.table("raw_signals").update({"rank_score": score, "topic": topic}).in_("id", group).execute()
+            done += len(rows)
+        total[source] = done
+        print(f"🧮 {source}: 回填 {done} 行 rank_score / topic")
+    return total
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="rank_score / topic 老数据回填（完整的 processor 公式）")
+    ap.add_argument("command", choices=("backfill",))
+    ap.add_argument("--sources", default=",".join(BACKFILL_SOURCES), help="逗号分隔，默认 twitter,polymarket")
+    args = ap.parse_args(argv)
+    backfill([s.strip() for s in args.sources.split(",") if s.strip()])
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
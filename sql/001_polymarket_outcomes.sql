@@ -0,0 +1,34 @@
+-- ==========================================
+-- 💰 Polymarket 价格结构化：入库时解析一次，下游只读数字
+-- ==========================================
+-- 在 Supabase SQL Editor 里执行一次（可重复执行）。
+-- outcomes / outcome_probs：选项名与概率（百分点），顺序一一对应
+-- yes_prob：Yes/Up 的概率；没有 Yes/Up 的多选市场取领先选项
+-- strategy_tags：jsonb -> text[]（JSON 数组照常可写，列式通道写 {"a","b"} 数组字面量）
+
+alter table raw_signals
+    add column if not exists outcomes text[],
+    add column if not exists outcome_probs double precision[],
+    add column if not exists yes_prob double precision;
+
+create or replace function pg_temp.jsonb_to_text_array(j jsonb) returns text[] language sql immutable as $$
+    select case
+        when j is null then null
+        when jsonb_typeof(j) = 'array' then array(select jsonb_array_elements_text(j))
+        when jsonb_typeof(j) = 'string' and left(j #>> '{}', 1) = '[' then array(select jsonb_array_elements_text((j #>> '{}')::jsonb))
+        else array[j #>> '{}']
+    end
+$$;
+
+do $$
+begin
+    if (select data_type from information_schema.columns
+        where table_name = 'raw_signals' and column_name = 'strategy_tags') = 'jsonb' then
+        alter table raw_signals alter column strategy_tags type text[] using pg_temp.jsonb_to_text_array(strategy_tags);
+    end if;
+end $$;
+
+-- 老数据回填：prices 形如 "Yes: 12.5% | No: 87.5%"
+update raw_signals
+set yes_prob = substring(prices from '(?:Yes|Up)\s*:\s*([0-9.]+)\s*%')::double precision
+where signal_type = 'polymarket' and yes_prob is null and prices ~ '(?:Yes|Up)\s*:\s*[0-9.]+\s*%';
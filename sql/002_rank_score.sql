@@ -0,0 +1,34 @@
+-- ==========================================
+-- 🏷️ 入库打分：rank_score / topic 由 refinery 写库前算好（scoring.annotate），战报与工厂按它排
+-- ==========================================
+-- 在 Supabase SQL Editor 里执行一次（可重复执行）。
+-- rank_score：与时间无关的分数（互动数 / 关键词 / 标签）；新鲜度衰减、盘口动量取回之后再乘
+-- topic：twitter 话题标签 / reddit 板块 / polymarket 分类 / github 第一个策略标签 / papers 论文类型
+
+alter table raw_signals
+    add column if not exists rank_score double precision,
+    add column if not exists topic text;
+
+-- 战报 / 工厂的取数形状：where signal_type = ? [and 时间窗] order by rank_score desc nulls last limit N
+create index if not exists raw_signals_type_rank_idx on raw_signals (signal_type, rank_score desc nulls last);
+
+-- 老数据回填：与 processors/*.rank() 逐项一致的源在这里回填。
+-- twitter（话题 / 噪音词 / VIP）与 polymarket（狙击词）依赖关键词匹配，SQL 里重放不了，
+-- 执行完本文件后跑一次 `python scoring.py backfill`，用完整的 processor 公式补齐。
+
+update raw_signals
+set rank_score = coalesce(score, 0) * (1 + abs(coalesce(vibe, 0))),
+    topic = coalesce(topic, subreddit)
+where signal_type = 'reddit' and rank_score is null;
+
+update raw_signals
+set rank_score = coalesce(stars, 0),
+    topic = coalesce(topic, topics->>0)
+where signal_type = 'github' and rank_score is null;
+
+update raw_signals
+set rank_score = (case when raw_json->>'type' like '%EARLY%' then 10000 else 0 end)
+               + (case when coalesce(raw_json->'strategies', '[]'::jsonb) <> '[]'::jsonb then 5000 else 0 end)
+               + coalesce(citations, 0),
+    topic = coalesce(topic, raw_json->>'type')
+where signal_type = 'papers' and rank_score is null;
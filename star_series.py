@@ -0,0 +1,39 @@
+import os
+import numpy as np
+
+from market_series import RingSeries, to_epoch
+
+# ==========================================
+# ⭐ GitHub 星数时序：每个 repo 一圈定长数组，入库时增量追加
+# ==========================================
+# 与 polymarket 的盘口时序共用 RingSeries（同一状态目录，.npz 落盘）。
+# 星速 = 最近 VELOCITY_HOURS 小时两端快照的星数差 / 实际时间差；
+# 加速度 = 本段星速 - 上一段星速（再除以段长，单位 ⭐/h²）。每个 repo 只做两次定长二分，不回扫 24h 快照。
+
+VELOCITY_HOURS = float(os.environ.get("STAR_VELOCITY_HOURS", 6))
+
+class StarSeries(RingSeries):
+    FIELDS = ("stars",)
+    STATE_NAME = "star_series.npz"
+    CAPACITY = int(os.environ.get("STAR_SERIES_CAPACITY", 96))
+
+    def update(self, rows):
+        """入库的一批 github 行（dict 或 Arrow 表），返回写入的快照数"""
+        if hasattr(rows, "column_names"): rows = rows.select(["repo_name", "bj_time", "stars"]).to_pylist()
+        added = 0
+        for r in rows:
+            name = r.get('repo_name')
+            if name: added += self.append(name, to_epoch(r.get('bj_time')), r.get('stars'))
+        return added
+
+    def velocity(self, names, hours=None):
+        """[(⭐/h, ⭐/h²)]，历史不够时对应位置为 nan"""
+        hours = hours or VELOCITY_HOURS
+        vel, acc = np.full(len(names), np.nan), np.full(len(names), np.nan)
+        for k, name in enumerate(names):
+            v = self.rate(name, 0, hours)
+            if v is None: continue
+            vel[k] = v
+            prev = self.rate(name, 0, hours, offset=hours)
+            if prev is not None: acc[k] = (v - prev) / hours
+        return vel, acc
@@ -0,0 +1,42 @@
+import gzip, json, os
+from pathlib import Path
+
+# ==========================================
+# 💾 轻量状态持久化：JSON / JSON.gz / .npz（数组字典）原子写入
+# ==========================================
+# refinery 侧默认写到 REFINERY_STATE_DIR（Actions 里用 cache 保留）；
+# factory 侧写到 vault/factory_state/，随认知资产一起入库。
+
+STATE_DIR = Path(os.environ.get("REFINERY_STATE_DIR", ".state"))
+
+def state_path(name, base=None):
+    return Path(base) / name if base else STATE_DIR / name
+
+def load_state(name, default=None, base=None):
+    path = state_path(name, base)
+    if not path.exists(): return default
+    try:
+        if path.suffix == ".npz":
+            import numpy as np  # 只有时序状态用得到，不让每个导入方都付 numpy 的冷启动
+            with np.load(path, allow_pickle=False) as z: return {k: z[k] for k in z.files}
+        opener = gzip.open if path.suffix == ".gz" else open
+        with opener(path, 'rt', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        print(f"⚠️ 状态文件 {path} 损坏，已忽略: {e}")
+        return default
+
+def save_state(name, data, base=None):
+    path = state_path(name, base)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    if path.suffix == ".npz":
+        import numpy as np
+        with open(tmp, 'wb') as f: np.savez_compressed(f, **data)
+        os.replace(tmp, path)
+        return path
+    opener = gzip.open if path.suffix == ".gz" else open
+    with opener(tmp, 'wt', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, separators=(',', ':'))
+    os.replace(tmp, path)
+    return path
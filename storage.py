@@ -0,0 +1,335 @@
+import json, os, sqlite3, threading
+from datetime import datetime, timezone
+
+from state_store import STATE_DIR
+
+# ==========================================
+# 🗃️ 存储后端：Supabase（线上）/ SQLite（本地嵌入式），对外同一套接口
+# ==========================================
+# 接口 = 本仓库今天实际用到的操作，不多不少：
+#   table(name).select(cols).eq/neq/gt/gte/lt/lte/in_().order(col, desc, nullsfirst).limit(n).execute().data
+#   table(name).insert(rows) / upsert(rows, on_conflict) / delete().in_(...)  .execute()
+#   insert_table(name, arrow)：列式通道整批写库；fetch_table(name, {"col": "op.value"})：按 PostgREST 过滤条件整表拉成 Arrow
+# STORAGE_BACKEND=sqlite 时整条流水线不连 Supabase：列在第一次写入时按值类型自动建（dict / list 存 JSON 文本，读出时还原），
+# 报告与精锐筛选的查询走 (signal_type, created_at) / bj_time 索引，本地一次扫描即可。
+# 时间列按 ISO 文本比较（与入库时写的格式一致即可）；排序的 NULL 位置与 Postgres 相同（升序在后，降序在前）。
+# 一致性检查见 bench/conformance_storage.py。
+
+BACKEND = os.environ.get("STORAGE_BACKEND", "supabase").lower()
+SQLITE_PATH = os.environ.get("STORAGE_SQLITE_PATH") or str(STATE_DIR / "pipeline.sqlite")
+
+# Supabase 里是 jsonb 的列：列式通道传来的是 JSON 文本，原样存
+JSON_COLUMNS = {"raw_json"}
+PRIMARY_KEYS = {"processed_files": "file_sha"}
+INDEXES = {
+    "raw_signals": [("signal_type", "created_at"), ("bj_time",), ("created_at",)],
+}
+
+class Result:
+    def __init__(self, data, count=None):
+        self.data = data
+        self.count = count
+
+# ---------- Supabase ----------
+class SupabaseStorage:
+    """线上后端：查询链直接交给 supabase-py，整表读写走 PostgREST CSV"""
+
+    def __init__(self, url=None, key=None):
+        from supabase import create_client
+        self.url = url or os.environ.get("SUPABASE_URL")
+        self.key = key or os.environ.get("SUPABASE_KEY")
+        self.client = create_client(self.url, self.key)
+
+    def table(self, name):
+        return self.client.table(name)
+
+    def insert_table(self, name, table):
+        import columnar
+        return columnar.insert_table(self.url, self.key, name, table)
+
+    def fetch_table(self, name, params):
+        import columnar
+        return columnar.fetch_table(self.url, self.key, name, params)
+
+# ---------- SQLite ----------
+_OPS = {"eq": "=", "neq": "!=", "gt": ">", "gte": ">=", "lt": "<", "lte": "<="}
+_IS = {"null": "NULL", None: "NULL", "true": "1", True: "1", "false": "0", False: "0"}
+_TYPES = {"bool": "INTEGER", "int": "INTEGER", "real": "REAL", "text": "TEXT", "json": "TEXT"}
+
+def _kind(val):
+    if isinstance(val, bool): return "bool"
+    if isinstance(val, int): return "int"
+    if isinstance(val, float): return "real"
+    if isinstance(val, (dict, list, tuple)): return "json"
+    return "text"
+
+def _q(name):
+    return '"' + str(name).replace('"', '""') + '"'
+
+class _Query:
+    def __init__(self, store, name):
+        self.store, self.name = store, name
+        self.action, self.columns, self.payload, self.on_conflict = "select", "*", None, None
+        self.filters, self._order, self._limit, self.count = [], None, None, None
+
+    # --- 动作 ---
+    def select(self, columns="*", count=None):
+        self.action, self.columns, self.count = "select", columns, count
+        return self
+
+    def insert(self, rows):
+        self.action, self.payload = "insert", rows
+        return self
+
+    def upsert(self, rows, on_conflict=None):
+        self.action, self.payload, self.on_conflict = "upsert", rows, on_conflict
+        return self
+
+    def update(self, values):
+        self.action, self.payload = "update", values
+        return self
+
+    def delete(self):
+        self.action = "delete"
+        return self
+
+    # --- 过滤 ---
+    def _f(self, op, col, val):
+        self.filters.append((op, col, val))
+        return self
+
+    def eq(self, col, val): return self._f("eq", col, val)
+    def neq(self, col, val): return self._f("neq", col, val)
+    def gt(self, col, val): return self._f("gt", col, val)
+    def gte(self, col, val): return self._f("gte", col, val)
+    def lt(self, col, val): return self._f("lt", col, val)
+    def lte(self, col, val): return self._f("lte", col, val)
+    def in_(self, col, vals): return self._f("in", col, list(vals))
+    def is_(self, col, val): return self._f("is", col, val)
+
+    def order(self, col, desc=False, nullsfirst=None):
+        self._order = (col, desc, desc if nullsfirst is None else nullsfirst)
+        return self
+
+    def limit(self, n):
+        self._limit = n
+        return self
+
+    def execute(self):
+        store = self.store
+        with store.lock:
+            if self.action in ("insert", "upsert"):
+                rows = self.payload if isinstance(self.payload, list) else [self.payload]
+                return Result(store._write(self.name, rows, upsert=self.action == "upsert", key=self.on_conflict))
+            if self.action == "update": return Result(store._update(self.name, self.payload, self.filters))
+            if self.action == "delete": return Result(store._delete(self.name, self.filters))
+            data = store._select(self.name, self.columns, self.filters, self._order, self._limit)
+            # count="exact"：与 PostgREST 一致，是过滤后、limit 之前的总行数
+            return Result(data, store._count(self.name, self.filters) if self.count else None)
+
+class SQLiteStorage:
+    """本地嵌入式后端：一个 SQLite 文件（WAL 模式），单连接 + 锁，线程安全；
+    多进程（backfill 的 worker）同写一个文件时靠 busy timeout 排队，补列前按 _columns 刷新"""
+
+    def __init__(self, path=None):
+        self.path = path or SQLITE_PATH
+        if self.path != ":memory:": os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None, timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS _columns (tbl TEXT, col TEXT, kind TEXT, PRIMARY KEY (tbl, col))")
+        self.lock = threading.RLock()
+        self.schema = {}  # 表 -> {列: kind}
+        for tbl, col, kind in self.conn.execute("SELECT tbl, col, kind FROM _columns"):
+            self.schema.setdefault(tbl, {})[col] = kind
+
+    def table(self, name):
+        return _Query(self, name)
+
+    def close(self):
+        self.conn.close()
+
+    # ---------- 表结构 ----------
+    def _ensure(self, name, rows):
+        """建表 / 补列：新列的类型取第一次出现的非空值"""
+        cols = self.schema.get(name)
+        if cols is None:
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS {_q(name)} (id INTEGER PRIMARY KEY, created_at TEXT)")
+            cols = self.schema[name] = {}
+            for col, kind in (("id", "int"), ("created_at", "text")):
+                self.conn.execute("INSERT OR IGNORE INTO _columns VALUES (?, ?, ?)", (name, col, kind))
+                cols[col] = kind
+        new = {}
+        for r in rows:
+            for col, val in r.items():
+                if col in cols or val is None: continue
+                new.setdefault(col, "json" if col in JSON_COLUMNS else _kind(val))
+        # 整列都是空值的新列按文本建
+        for r in rows:
+            for col in r:
+                if col not in cols: new.setdefault(col, "json" if col in JSON_COLUMNS else "text")
+        if new:
+            # 别的进程可能已经补过这些列
+            for col, kind in self.conn.execute("SELECT col, kind FROM _columns WHERE tbl = ?", (name,)):
+                cols.setdefault(col, kind)
+            new = {col: kind for col, kind in new.items() if col not in cols}
+        for col, kind in new.items():
+            try: self.conn.execute(f"ALTER TABLE {_q(name)} ADD COLUMN {_q(col)} {_TYPES[kind]}")
+            except sqlite3.OperationalError as e:
+                if "duplicate column" not in str(e): raise
+            self.conn.execute("INSERT OR REPLACE INTO _columns VALUES (?, ?, ?)", (name, col, kind))
+            cols[col] = kind
+        if new:
+            for idx in INDEXES.get(name, []):
+                if all(c in cols for c in idx):
+                    self.conn.execute(f"CREATE INDEX IF NOT EXISTS {_q('ix_' + name + '_' + '_'.join(idx))} "
+                                      f"ON {_q(name)} ({', '.join(_q(c) for c in idx)})")
+        return cols
+
+    def _encode(self, kind, val, raw=False):
+        if val is None: return None
+        if kind == "json":
+            # raw：列式通道里嵌套列已经是 JSON 文本
+            if raw and isinstance(val, str): return val
+            return json.dumps(val, ensure_ascii=False, default=str)
+        if isinstance(val, bool): return int(val)
+        if isinstance(val, (dict, list, tuple)): return json.dumps(val, ensure_ascii=False, default=str)
+        return val
+
+    def _decode(self, kind, val):
+        if val is None: return None
+        if kind == "json":
+            try: return json.loads(val)
+            except (TypeError, ValueError): return val
+        if kind == "bool": return bool(val)
+        return val
+
+    # ---------- 写 ----------
+    def _write(self, name, rows, upsert=False, key=None, raw=False):
+        if not rows: return []
+        rows = [dict(r) for r in rows]
+        now = datetime.now(timezone.utc).isoformat()
+        for r in rows: r.setdefault("created_at", now)
+        cols = self._ensure(name, rows)
+        key = key or PRIMARY_KEYS.get(name) or "id"
+        if upsert and key != "id":
+            self.conn.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS {_q('ux_' + name + '_' + key)} ON {_q(name)} ({_q(key)})")
+        # IMMEDIATE：一开始就拿写锁（多进程时读完 MAX(id) 再升级写锁会直接 busy，且 id 会撞）
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            next_id = self.conn.execute(f"SELECT COALESCE(MAX(id), 0) FROM {_q(name)}").fetchone()[0]
+            # 按列集合分组，每组一条 executemany
+            groups = {}
+            for r in rows:
+                if r.get("id") is None and not (upsert and key != "id" and r.get(key) is not None and self._exists(name, key, r[key])):
+                    next_id += 1
+                    r["id"] = next_id
+                groups.setdefault(tuple(r), []).append(r)
+            for names, group in groups.items():
+                values = [tuple(self._encode(cols[c], r[c], raw) for c in names) for r in group]
+                sql = f"INSERT INTO {_q(name)} ({', '.join(_q(c) for c in names)}) VALUES ({', '.join('?' * len(names))})"
+                if upsert:
+                    # 冲突时只更新这次给出的列（与 PostgREST 的 merge-duplicates 一致），id / created_at 保持原值
+                    sets = [f"{_q(c)} = excluded.{_q(c)}" for c in names if c not in (key, "id", "created_at")]
+                    sql += f" ON CONFLICT ({_q(key)}) DO " + (f"UPDATE SET {', '.join(sets)}" if sets else "NOTHING")
+                self.conn.executemany(sql, values)
+            self.conn.execute("COMMIT")
+        except Exception:
+            self.conn.execute("ROLLBACK")
+            raise
+        if raw: return []
+        return self._select(name, "*", [("in", key, [r[key] for r in rows])], None, None)
+
+    def _exists(self, name, col, val):
+        return self.conn.execute(f"SELECT 1 FROM {_q(name)} WHERE {_q(col)} = ? LIMIT 1",
+                                 (self._encode(self.schema[name].get(col, "text"), val),)).fetchone() is not None
+
+    def insert_table(self, name, table):
+        """列式通道：Arrow 批 -> 一个事务里的 executemany（嵌套列是 JSON 文本，原样存）"""
+        if not table.num_rows: return 0
+        with self.lock: self._write(name, table.to_pylist(), raw=True)
+        return table.num_rows
+
+    # ---------- 读 / 删 ----------
+    def _where(self, name, filters):
+        cols = self.schema.get(name, {})
+        clauses, params = [], []
+        for op, col, val in filters:
+            kind = cols.get(col)
+            # 表里还没有这一列：当作全是 NULL
+            ref = _q(col) if kind else "NULL"
+            if op == "is":
+                # PostgREST 的 is.null / is.true / is.false；eq / neq 的 "null" 只是字符串，与线上一致
+                if val not in _IS: raise ValueError(f"is_ 只支持 null / true / false: {val!r}")
+                clauses.append(f"{ref} IS {_IS[val]}")
+            elif op == "in":
+                if not val:
+                    clauses.append("0")
+                    continue
+                clauses.append(f"{ref} IN ({', '.join('?' * len(val))})")
+                params.extend(self._encode(kind or "text", v) for v in val)
+            else:
+                clauses.append(f"{ref} {_OPS[op]} ?")
+                params.append(self._encode(kind or "text", val))
+        return (" WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+    def _select(self, name, columns, filters, order=None, limit=None, decode=True):
+        cols = self.schema.get(name)
+        if cols is None: return []
+        wanted = list(cols) if not columns or columns.strip() == "*" else [c.strip() for c in columns.split(",")]
+        exprs = [_q(c) if c in cols else "NULL" for c in wanted]
+        where, params = self._where(name, filters)
+        sql = f"SELECT {', '.join(exprs)} FROM {_q(name)}{where}"
+        if order:
+            col, desc, nullsfirst = order
+            if col in cols:
+                # Postgres：默认升序 NULL 在后、降序 NULL 在前；nullsfirst 显式指定时照办
+                d = " DESC" if desc else ""
+                sql += f" ORDER BY ({_q(col)} IS NULL){' DESC' if nullsfirst else ''}, {_q(col)}{d}, id"
+        if limit is not None: sql += f" LIMIT {int(limit)}"
+        kinds = [cols.get(c, "text") for c in wanted]
+        out = []
+        for row in self.conn.execute(sql, params):
+            if decode: out.append({c: self._decode(k, v) for c, k, v in zip(wanted, kinds, row)})
+            else: out.append({c: (bool(v) if k == "bool" and v is not None else v) for c, k, v in zip(wanted, kinds, row)})
+        return out
+
+    def _count(self, name, filters):
+        if name not in self.schema: return 0
+        where, params = self._where(name, filters)
+        return self.conn.execute(f"SELECT COUNT(*) FROM {_q(name)}{where}", params).fetchone()[0]
+
+    def _update(self, name, values, filters):
+        if name not in self.schema or not values: return []
+        cols = self._ensure(name, [values])
+        names = [c for c in values if c != "id"]
+        where, params = self._where(name, filters)
+        hit = self._select(name, "id", filters)
+        self.conn.execute(f"UPDATE {_q(name)} SET {', '.join(f'{_q(c)} = ?' for c in names)}{where}",
+                          [self._encode(cols[c], values[c]) for c in names] + params)
+        return self._select(name, "*", [("in", "id", [r["id"] for r in hit])])
+
+    def _delete(self, name, filters):
+        if name not in self.schema: return []
+        gone = self._select(name, "*", filters)
+        where, params = self._where(name, filters)
+        self.conn.execute(f"DELETE FROM {_q(name)}{where}", params)
+        return gone
+
+    def fetch_table(self, name, params):
+        """与 columnar.fetch_table 同一约定：{"col": "op.value"} 过滤，嵌套列保持 JSON 文本"""
+        filters = []
+        for col, cond in params.items():
+            op, _, val = str(cond).partition(".")
+            if op == "in": filters.append(("in", col, val.strip("()").split(",")))
+            else: filters.append((op, col, val))
+        import columnar
+        with self.lock: rows = self._select(name, "*", filters, decode=False)
+        return columnar.from_rows(rows)
+
+def connect(backend=None, url=None, key=None):
+    """按 STORAGE_BACKEND 返回存储后端"""
+    backend = (backend or BACKEND).lower()
+    if backend == "sqlite": return SQLiteStorage()
+    if backend == "supabase": return SupabaseStorage(url, key)
+    raise ValueError(f"未知的存储后端: {backend}")
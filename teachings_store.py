@@ -0,0 +1,127 @@
+import json, os
+from pathlib import Path
+from datetime import datetime
+
+try:
+    import zstandard as zstd
+except ImportError:  # 没装 zstandard 时退回纯 JSONL 导出
+    zstd = None
+
+# ==========================================
+# 🗜️ 认知资产压缩仓：zstd 分段 + 旁路索引
+# ==========================================
+# 目录结构: instructions/segments/teachings_<day>_<hour>_<part>.zst
+#          instructions/segments/teachings_<day>_<hour>_<part>.idx   (每行一个 JSON 索引项)
+# 每次追加写入一个独立的 zstd frame，索引记录 frame 的 offset/length 和帧内行号，读取时直接 seek。
+
+SEGMENT_DIR = "segments"
+SEGMENT_MAX_BYTES = int(os.environ.get("TEACHINGS_SEGMENT_MAX_BYTES", 8 * 1024 * 1024))
+FRAME_MAX_RECORDS = 256
+ZSTD_LEVEL = 10
+
+def jsonl_export_enabled():
+    """纯 JSONL 导出开关：TEACHINGS_JSONL=true 或 zstd 不可用时保持旧格式"""
+    return os.environ.get("TEACHINGS_JSONL") == "true" or zstd is None
+
+class TeachingsStore:
+    """写端：按小时滚动的压缩分段，超过 SEGMENT_MAX_BYTES 再切新段"""
+
+    def __init__(self, instructions_dir, level=ZSTD_LEVEL):
+        self.root = Path(instructions_dir) / SEGMENT_DIR
+        self.level = level
+        self._segment = None
+
+    def _current_segment(self, now=None):
+        now = now or datetime.now()
+        prefix = f"teachings_{now.strftime('%Y%m%d')}_{now.strftime('%H')}"
+        if self._segment and self._segment.name.startswith(prefix) and self._segment.stat().st_size < SEGMENT_MAX_BYTES:
+            return self._segment
+        self.root.mkdir(parents=True, exist_ok=True)
+        part = 0
+        while True:
+            seg = self.root / f"{prefix}_{part:03d}.zst"
+            if not seg.exists() or seg.stat().st_size < SEGMENT_MAX_BYTES: break
+            part += 1
+        self._segment = seg
+        return seg
+
+    def append(self, lines, now=None):
+        """追加一批 JSON 行，返回写过的文件路径（用于 git 暂存）"""
+        if not lines or zstd is None: return []
+        seg = self._current_segment(now)
+        idx_path = seg.with_suffix(".idx")
+        cctx = zstd.ZstdCompressor(level=self.level)
+        index_lines = []
+        with open(seg, 'ab') as f_seg:
+            for start in range(0, len(lines), FRAME_MAX_RECORDS):
+                block = lines[start : start + FRAME_MAX_RECORDS]
+                frame = cctx.compress(('\n'.join(block) + '\n').encode('utf-8'))
+                offset = f_seg.tell()
+                f_seg.write(frame)
+                for i, line in enumerate(block):
+                    try: data = json.loads(line)
+                    except: data = {}
+                    index_lines.append(json.dumps({
+                        "t": data.get('topic_id'), "m": data.get('master'), "r": data.get('ref_id'),
+                        "d": bool(data.get('drift')), "o": offset, "l": len(frame), "i": i
+                    }, ensure_ascii=False))
+        with open(idx_path, 'a', encoding='utf-8') as f_idx:
+            f_idx.write('\n'.join(index_lines) + '\n')
+        return [seg, idx_path]
+
+class TeachingsReader:
+    """读端：只加载小体积的 .idx，按 topic / drift 直接 seek 到对应 frame 解压"""
+
+    def __init__(self, instructions_dir):
+        self.root = Path(instructions_dir) / SEGMENT_DIR
+        self._frames = {}
+
+    def segments(self, day=None):
+        """day 可以是单个 'YYYYMMDD'，也可以是多天列表（如本周）"""
+        if not self.root.exists(): return []
+        if day is None: return sorted(self.root.glob("teachings_*.zst"))
+        days = [day] if isinstance(day, str) else day
+        return sorted(seg for d in days for seg in self.root.glob(f"teachings_{d}_*.zst"))
+
+    def index(self, day=None):
+        """逐条产出 (segment, 索引项)"""
+        for seg in self.segments(day):
+            idx_path = seg.with_suffix(".idx")
+            if not idx_path.exists(): continue
+            with open(idx_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    try: yield seg, json.loads(line)
+                    except: continue
+
+    def _read_frame(self, seg, offset, length):
+        key = (seg, offset)
+        if key not in self._frames:
+            with open(seg, 'rb') as f:
+                f.seek(offset)
+                raw = zstd.ZstdDecompressor().decompress(f.read(length))
+            self._frames = {key: raw.decode('utf-8').splitlines()}  # 只缓存最近一帧，顺序读取时命中
+        return self._frames[key]
+
+    def _load(self, seg, entry):
+        return json.loads(self._read_frame(seg, entry["o"], entry["l"])[entry["i"]])
+
+    def topic_history(self, topic_id, day=None, master=None):
+        """某个 topic 的全部审计记录（按写入顺序）"""
+        return [self._load(seg, e) for seg, e in self.index(day)
+                if e.get("t") == topic_id and (master is None or e.get("m") == master)]
+
+    def drift_events(self, day=None):
+        return [self._load(seg, e) for seg, e in self.index(day) if e.get("d")]
+
+    def iter_records(self, day=None):
+        for seg in self.segments(day):
+            with open(seg, 'rb') as f:
+                reader = zstd.ZstdDecompressor().stream_reader(f, read_across_frames=True)
+                buf = b""
+                while True:
+                    chunk = reader.read(1 << 20)
+                    if not chunk: break
+                    buf += chunk
+                    *lines, buf = buf.split(b"\n")
+                    for line in lines:
+                        if line.strip(): yield json.loads(line)
@@ -0,0 +1,166 @@
+import functools, json, os, threading, time
+from pathlib import Path
+
+from state_store import STATE_DIR
+
+# ==========================================
+# 📡 运行遥测：嵌套计时 span + 计数器，结束时输出 JSON 摘要和 Prometheus textfile
+# ==========================================
+# with telemetry.span("fetch") as sp: sp.add("bytes", n)    或    @telemetry.timed("sync")
+# span 按路径聚合（"sync/file/insert"），同一路径的多次调用只累加：次数、总耗时、最大耗时、错误数、各计数器。
+# 每个线程一条 span 栈；parent= 只在当前线程没有打开的 span 时生效（线程池里的 span 挂到发起方下面）。
+# 关闭时（默认）span() 返回共享的空对象，只多一次函数调用。
+
+ENABLED = os.environ.get("TELEMETRY_ENABLED", "false").lower() == "true"
+TELEMETRY_DIR = Path(os.environ.get("TELEMETRY_DIR") or STATE_DIR / "telemetry")
+PREFIX = "pipeline"
+
+_local = threading.local()
+_lock = threading.Lock()
+_stats = {}  # path -> {"calls", "seconds", "max_s", "errors", "last_error", "counters"}
+_run = {"name": None, "t0": None, "started": None}
+
+def _stack():
+    stack = getattr(_local, "stack", None)
+    if stack is None: stack = _local.stack = []
+    return stack
+
+class _Null:
+    path = ""
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+    def add(self, name, n=1): pass
+    def error(self, exc=None): pass
+
+_NULL = _Null()
+
+class Span:
+    __slots__ = ("path", "counters", "errors", "last_error", "t0")
+
+    def __init__(self, name, parent=None):
+        stack = _stack()
+        if stack: parent = stack[-1]
+        elif parent is None: parent = _NULL
+        self.path = f"{parent.path}/{name}" if parent.path else name
+        self.counters, self.errors, self.last_error = {}, 0, None
+
+    def __enter__(self):
+        _stack().append(self)
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.t0
+        stack = _stack()
+        if stack and stack[-1] is self: stack.pop()
+        if exc_type is not None: self.error(exc)
+        with _lock:
+            s = _stats.setdefault(self.path, {"calls": 0, "seconds": 0.0, "max_s": 0.0, "errors": 0,
+                                              "last_error": None, "counters": {}})
+            s["calls"] += 1
+            s["seconds"] += elapsed
+            s["max_s"] = max(s["max_s"], elapsed)
+            s["errors"] += self.errors
+            if self.last_error: s["last_error"] = self.last_error
+            for k, v in self.counters.items(): s["counters"][k] = s["counters"].get(k, 0) + v
+        return False
+
+    def add(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def error(self, exc=None):
+        """记一次错误（被吞掉的异常也要调用它，否则摘要里看不到）"""
+        self.errors += 1
+        if exc is not None: self.last_error = f"{type(exc).__name__}: {exc}"[:200]
+
+def span(name, parent=None):
+    return Span(name, parent) if ENABLED else _NULL
+
+def current():
+    stack = _stack() if ENABLED else None
+    return stack[-1] if stack else _NULL
+
+def count(name, n=1):
+    """给当前 span 加计数（rows / bytes / api_calls ...）"""
+    if ENABLED: current().add(name, n)
+
+def error(exc=None):
+    if ENABLED: current().error(exc)
+
+def timed(name):
+    """装饰器：整个函数一个 span（关闭时直接调用原函数）"""
+    def deco(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not ENABLED: return fn(*args, **kwargs)
+            with Span(name): return fn(*args, **kwargs)
+        return wrapper
+    return deco
+
+def iterate(items, name):
+    """逐个 next() 计时：生成器（如 process_batches）的耗时算进 name 这个 span"""
+    if not ENABLED: return items
+    def gen():
+        it = iter(items)
+        while True:
+            with span(name):
+                try: item = next(it)
+                except StopIteration: return
+            yield item
+    return gen()
+
+def start(run_name):
+    with _lock:
+        _stats.clear()
+        _run.update(name=run_name, t0=time.perf_counter(), started=time.time())
+
+def summary():
+    with _lock:
+        spans = [{"span": path, **{k: (round(v, 4) if isinstance(v, float) else v) for k, v in s.items()}}
+                 for path, s in sorted(_stats.items())]
+    wall = time.perf_counter() - _run["t0"] if _run["t0"] else None
+    return {"run": _run["name"], "started": _run["started"], "wall_s": round(wall, 3) if wall else None, "spans": spans}
+
+def _label(v):
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def to_prometheus(data):
+    run = _label(data["run"])
+    lines = []
+    def metric(name, kind, help_text, samples):
+        lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+        for labels, value in samples:
+            lab = ",".join([f'run="{run}"'] + [f'{k}="{_label(v)}"' for k, v in labels])
+            lines.append(f"{PREFIX}_{name}{{{lab}}} {value}")
+    spans = data["spans"]
+    metric("run_seconds", "gauge", "Wall time of the last run", [((), data["wall_s"] or 0)])
+    metric("run_timestamp_seconds", "gauge", "Start time of the last run", [((), data["started"] or 0)])
+    metric("span_calls_total", "counter", "Span invocations", [((("span", s["span"]),), s["calls"]) for s in spans])
+    metric("span_seconds_total", "counter", "Wall time spent in span", [((("span", s["span"]),), s["seconds"]) for s in spans])
+    metric("span_max_seconds", "gauge", "Slowest single invocation", [((("span", s["span"]),), s["max_s"]) for s in spans])
+    metric("span_errors_total", "counter", "Errors inside span", [((("span", s["span"]),), s["errors"]) for s in spans])
+    metric("span_counter_total", "counter", "Span counters (rows, bytes, api_calls ...)",
+           [((("span", s["span"]), ("counter", k)), v) for s in spans for k, v in sorted(s["counters"].items())])
+    return "\n".join(lines) + "\n"
+
+def _write(path, text):
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(text, encoding='utf-8')
+    os.replace(tmp, path)
+
+def emit():
+    """写 <run>_summary.json 和 <run>.prom（node_exporter textfile collector 格式），打印顶层 span 摘要"""
+    if not ENABLED or not _run["name"]: return None
+    data = summary()
+    try:
+        TELEMETRY_DIR.mkdir(parents=True, exist_ok=True)
+        _write(TELEMETRY_DIR / f"{data['run']}_summary.json", json.dumps(data, ensure_ascii=False, indent=2))
+        _write(TELEMETRY_DIR / f"{data['run']}.prom", to_prometheus(data))
+    except OSError as e:
+        print(f"⚠️ 遥测写入失败: {e}")
+    for s in data["spans"]:
+        if "/" in s["span"]: continue
+        extra = " ".join(f"{k}={v}" for k, v in sorted(s["counters"].items()))
+        print(f"📡 {s['span']}: {s['calls']} 次 {s['seconds']:.2f}s 错误 {s['errors']} {extra}".rstrip())
+    return data
@@ -0,0 +1,103 @@
+import json, os, re, time
+from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+
+from state_store import load_state, save_state
+
+# ==========================================
+# 🪜 两级级联：小模型批量初筛 -> V3 大师精审
+# ==========================================
+# 小模型一次给一批信号打 relevance / novelty 分（0-10），
+# 只有过线的、以及每个来源的前 N 名保底，才进入大师审计。决策按 ref_id 缓存。
+
+CASCADE_ENABLED = os.environ.get("FACTORY_CASCADE") == "true"
+TRIAGE_MODEL = os.environ.get("TRIAGE_MODEL", "Qwen/Qwen2.5-7B-Instruct")
+TRIAGE_THRESHOLD = float(os.environ.get("TRIAGE_THRESHOLD", 0.55))  # 归一化到 0-1
+TRIAGE_TOP_N = int(os.environ.get("TRIAGE_TOP_N", 5))                # 每个来源保底条数
+TRIAGE_BATCH = int(os.environ.get("TRIAGE_BATCH", 20))
+CACHE_NAME = "triage_cache.json"
+CACHE_DAYS = 3
+
+TRIAGE_SYSTEM = (
+    "你是情报初筛员。对每条信号按 0-10 打两个分：relevance（对宏观/科技/市场决策的价值）、"
+    "novelty（相对常识与噪音的新增信息量）。只输出 JSON 数组，例如 "
+    '[{"i": 0, "relevance": 7, "novelty": 4}]，不要任何解释。'
+)
+
+_JSON_RE = re.compile(r"\[.*\]", re.S)
+
+def parse_scores(text, n):
+    """解析小模型输出，返回 {i: 0-1 分数}；解析失败的条目缺省（视为放行）"""
+    m = _JSON_RE.search(text or "")
+    if not m: return {}
+    try: items = json.loads(m.group(0))
+    except: return {}
+    scores = {}
+    for it in items:
+        try:
+            i = int(it["i"])
+            if 0 <= i < n: scores[i] = (float(it.get("relevance", 0)) + float(it.get("novelty", 0))) / 20
+        except: continue
+    return scores
+
+class Triage:
+    def __init__(self, call_ai, base=None, model=TRIAGE_MODEL, threshold=TRIAGE_THRESHOLD, top_n=TRIAGE_TOP_N):
+        self.call_ai = call_ai
+        self.base = base
+        self.model = model
+        self.threshold = threshold
+        self.top_n = top_n
+        self.cache = load_state(CACHE_NAME, {}, base) or {}
+        self.stats = {"signals": 0, "cached": 0, "calls": 0, "seconds": 0.0, "kept": 0, "dropped": 0, "failed": 0}
+
+    def _score_batch(self, batch):
+        """batch: [(ref_id, content)] -> ({ref_id: score or None}, 耗时秒数)"""
+        prompt = "\n\n".join(f"[{i}] {content[:600]}" for i, (_, content) in enumerate(batch))
+        t0 = time.perf_counter()
+        st, text = self.call_ai(self.model, TRIAGE_SYSTEM, prompt, temperature=0)
+        scores = parse_scores(text, len(batch)) if st == "SUCCESS" else {}
+        return {rid: scores.get(i) for i, (rid, _) in enumerate(batch)}, time.perf_counter() - t0
+
+    def run(self, items):
+        """items: [(row, ref_id, topic_id, source, content)] -> (保留的 row 列表, 决策日志)"""
+        self.stats["signals"] += len(items)
+        today = datetime.now().strftime('%Y%m%d')
+        todo = [(rid, content) for _, rid, _, _, content in items if rid not in self.cache]
+        self.stats["cached"] += len(items) - len(todo)
+
+        batches = [todo[i : i + TRIAGE_BATCH] for i in range(0, len(todo), TRIAGE_BATCH)]
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            for result, seconds in executor.map(self._score_batch, batches):
+                self.stats["calls"] += 1
+                self.stats["seconds"] += seconds
+                for rid, score in result.items():
+                    if score is None: self.stats["failed"] += 1
+                    else: self.cache[rid] = {"score": score, "model": self.model, "day": today}
+
+        # 每个来源按分数排序，前 N 名保底；无分数（初筛失败）一律放行
+        by_source = {}
+        for it in items: by_source.setdefault(it[3], []).append(it)
+        kept, log = [], []
+        for source, group in by_source.items():
+            ranked = sorted(group, key=lambda it: (self.cache.get(it[1]) or {}).get("score", 1.0), reverse=True)
+            for rank, (row, rid, tid, _, _) in enumerate(ranked):
+                score = (self.cache.get(rid) or {}).get("score")
+                if score is None: reason = "unscored"
+                elif score >= self.threshold: reason = "threshold"
+                elif rank < self.top_n: reason = "top_n"
+                else: reason = None
+                if reason: kept.append(row)
+                log.append({"ref_id": rid, "topic_id": tid, "source": source, "score": score, "kept": bool(reason), "reason": reason or "below_threshold"})
+        self.stats["kept"] += len(kept)
+        self.stats["dropped"] += len(items) - len(kept)
+        return kept, log
+
+    def report(self, masters_per_signal=1):
+        s = self.stats
+        return (f"初筛 {s['signals']} 条 (缓存命中 {s['cached']}, {s['calls']} 次 {self.model} 调用, {s['seconds']:.1f}s) | "
+                f"保留 {s['kept']} / 过滤 {s['dropped']} | 预计节省 V3 调用约 {s['dropped'] * masters_per_signal} 次")
+
+    def save(self):
+        cutoff = (datetime.now() - timedelta(days=CACHE_DAYS)).strftime('%Y%m%d')
+        self.cache = {k: v for k, v in self.cache.items() if v.get("day", "") >= cutoff}
+        return save_state(CACHE_NAME, self.cache, self.base)
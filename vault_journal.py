@@ -0,0 +1,153 @@
+import json, os, subprocess, threading, time, shutil
+from pathlib import Path
+from datetime import datetime
+
+# ==========================================
+# 📒 预写日志 (WAL) + 后台刷盘：审计线程永不等待 git
+# ==========================================
+
+class VaultJournal:
+    """审计结果先追加到本地 WAL，后台线程按时间/体积落盘并本地 commit，收尾时只做一次 rebase+push"""
+
+    def __init__(self, vault_path, wal_path=None, flush_interval=None, flush_bytes=None, push_retries=None, store=None, export_jsonl=True):
+        self.vault_path = Path(vault_path)
+        self.store = store                # TeachingsStore：压缩分段落盘
+        self.export_jsonl = export_jsonl  # 旧版纯 JSONL 是否继续写
+        self.wal_path = Path(wal_path or os.environ.get("FACTORY_WAL_PATH", ".factory_wal.jsonl"))
+        self.flush_interval = float(flush_interval or os.environ.get("FACTORY_FLUSH_SECONDS", 120))
+        self.flush_bytes = int(flush_bytes or os.environ.get("FACTORY_FLUSH_BYTES", 256 * 1024))
+        self.push_retries = int(push_retries or os.environ.get("FACTORY_PUSH_RETRIES", 3))
+        self.is_repo = (self.vault_path / ".git").exists()
+        self.written_paths = set()  # 本轮写过的 vault 相对路径，git 只暂存这些
+        self.extra_paths = set()    # 其他需要随本轮一起入库的状态文件
+        self._lock = threading.Lock()
+        self._pending_bytes = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {"appended": 0, "flushes": 0, "commits": 0, "push_attempts": 0, "git_seconds": 0.0}
+
+    # === 1. 生命周期 ===
+    def start(self):
+        self._prepare_repo()
+        # 上一轮崩溃遗留的 WAL：先回放，避免丢数据
+        if self.wal_path.exists() and self.wal_path.stat().st_size > 0:
+            print(f"🩹 发现遗留 WAL ({self.wal_path})，正在回放...")
+            self.flush()
+        self._thread = threading.Thread(target=self._run, name="vault-flusher", daemon=True)
+        self._thread.start()
+        return self
+
+    def close(self):
+        """停止后台线程 -> 最终刷盘 -> 一次 rebase+push"""
+        self._stop.set()
+        self._wake.set()
+        if self._thread: self._thread.join()
+        self.flush()
+        return self.publish()
+
+    # === 2. 审计侧：只写本地 WAL ===
+    def append(self, rel_path, lines):
+        if not lines: return
+        rel_path = str(rel_path)
+        payload = "".join(json.dumps({"path": rel_path, "line": l}, ensure_ascii=False) + "\n" for l in lines)
+        with self._lock:
+            with open(self.wal_path, 'a', encoding='utf-8') as f:
+                f.write(payload)
+            self._pending_bytes += len(payload)
+            self.stats["appended"] += len(lines)
+        if self._pending_bytes >= self.flush_bytes: self._wake.set()
+
+    def track(self, rel_path):
+        """登记一个非 WAL 写入的 vault 文件（如持久化状态），随下一次 commit 一起暂存"""
+        with self._lock: self.extra_paths.add(str(rel_path))
+
+    # === 3. 后台刷盘：WAL -> vault 文件 -> 本地 commit ===
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            if self._stop.is_set(): break
+            try: self.flush()
+            except Exception as e: print(f"⚠️ 后台刷盘失败: {e}")
+
+    def flush(self):
+        with self._lock:
+            if not self.wal_path.exists(): entries = []
+            else:
+                with open(self.wal_path, 'r', encoding='utf-8') as f:
+                    entries = [json.loads(l) for l in f if l.strip()]
+            grouped = {}
+            for e in entries: grouped.setdefault(e["path"], []).append(e["line"])
+            for rel, lines in grouped.items():
+                if self.store:
+                    for p in self.store.append(lines):
+                        self.written_paths.add(str(Path(p).relative_to(self.vault_path)))
+                if self.export_jsonl or not self.store:
+                    target = self.vault_path / rel
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    with open(target, 'a', encoding='utf-8') as f:
+                        f.write('\n'.join(lines) + '\n')
+                    self.written_paths.add(rel)
+            # 落盘完成后再清空 WAL，中途崩溃最多重复追加，不会丢
+            if entries: open(self.wal_path, 'w').close()
+            self._pending_bytes = 0
+            paths = sorted(self.written_paths | self.extra_paths)
+        if entries: self.stats["flushes"] += 1
+        if paths: self._commit(paths)
+
+    def _commit(self, paths):
+        if not self.is_repo: return
+        self._git("add", "--", *paths)
+        if self._git("diff", "--cached", "--quiet").returncode == 0: return
+        self._git("commit", "-m", f"🧠 Cognitive Audit: {datetime.now().strftime('%H:%M:%S')}")
+        self.stats["commits"] += 1
+
+    # === 4. 收尾：有界重试的 rebase + push ===
+    def publish(self):
+        if not self.is_repo: return False
+        if self.stats["commits"] == 0 and not self._ahead_of_remote():
+            print("💤 没有发现新资产，跳过同步。")
+            return True
+        for attempt in range(1, self.push_retries + 1):
+            self.stats["push_attempts"] += 1
+            print(f"🔄 正在通过 rebase 同步远程仓库 (第 {attempt}/{self.push_retries} 次)...")
+            pull = self._git("pull", "origin", "main", "--rebase")
+            if pull.returncode != 0:
+                self._heal_rebase()
+            else:
+                push = self._git("push", "origin", "main")
+                if push.returncode == 0:
+                    print(f"🚀 认知资产已成功同步至中央银行 ({self.stats['commits']} 次本地提交, git 耗时 {self.stats['git_seconds']:.1f}s)。")
+                    return True
+                print(f"⚠️ 推送被拒绝: {push.stderr.strip()[:200]}")
+            time.sleep(min(2 ** attempt, 30))
+        print("❌ 最终推送失败：本地提交已保留，等待下一轮补推。")
+        return False
+
+    # === 🛡️ git 辅助 ===
+    def _git(self, *args):
+        t0 = time.perf_counter()
+        res = subprocess.run(["git", *args], cwd=self.vault_path, capture_output=True, text=True)
+        self.stats["git_seconds"] += time.perf_counter() - t0
+        return res
+
+    def _ahead_of_remote(self):
+        res = self._git("rev-list", "--count", "origin/main..HEAD")
+        return res.returncode == 0 and res.stdout.strip() not in ("", "0")
+
+    def _heal_rebase(self):
+        # 检查是否存在僵尸 rebase 锁，如果有，先杀掉
+        rebase_dir = self.vault_path / ".git" / "rebase-merge"
+        if rebase_dir.exists():
+            print("🚑 检测到僵尸 Rebase 锁，正在执行战地急救...")
+            self._git("rebase", "--abort")
+            if rebase_dir.exists(): shutil.rmtree(rebase_dir)
+
+    def _prepare_repo(self):
+        if not self.is_repo: return
+        self._heal_rebase()
+        # 强制注入身份（整轮只做一次）
+        self._git("config", "user.email", "bot@factory.com")
+        self._git("config", "user.name", "Cognitive Bot")
+        self._git("config", "pull.rebase", "true")